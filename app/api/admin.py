@@ -3,7 +3,8 @@ from django.contrib.auth.admin import UserAdmin
 from .models import (
     Organization, City, User, PurchaserProfile, 
     Product, AlcoholProduct, Supplier, SupplierToken, 
-    Price, PriceAlcohol, PriceRequest
+    Price, PriceAlcohol, PriceRequest, Job, SupplierItemMapping,
+    SupplierNotification
 )
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.forms import UserChangeForm, UserCreationForm
@@ -208,6 +209,28 @@ class PriceRequestAdmin(admin.ModelAdmin):
         )
     cancel_requests.short_description = "Отменить выбранные запросы (ожидающие)"
 
+# Админка для фоновых задач
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'progress', 'total', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'name')
+    readonly_fields = [field.name for field in Job._meta.fields]
+    list_per_page = 20
+
+# Админка для подтверждённых сопоставлений названий поставщиков с каталогом
+class SupplierItemMappingAdmin(admin.ModelAdmin):
+    list_display = ('name', 'supplier', 'product', 'alcohol', 'confirmed_by', 'confirmed_at')
+    list_filter = ('supplier',)
+    search_fields = ('name', 'product__name', 'alcohol__name')
+    raw_id_fields = ('supplier', 'product', 'alcohol', 'confirmed_by')
+    list_per_page = 20
+
+# Админка для очереди уведомлений поставщиков
+class SupplierNotificationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'supplier', 'price_request', 'created_at', 'sent_at')
+    list_filter = ('supplier',)
+    raw_id_fields = ('supplier', 'price_request')
+    list_per_page = 20
+
 # Регистрация всех моделей
 admin.site.register(Organization)
 admin.site.register(City)
@@ -219,4 +242,7 @@ admin.site.register(Supplier, SupplierAdmin)
 admin.site.register(SupplierToken, SupplierTokenAdmin)
 admin.site.register(Price, PriceAdmin)
 admin.site.register(PriceAlcohol, PriceAlcoholAdmin)
-admin.site.register(PriceRequest, PriceRequestAdmin)
\ No newline at end of file
+admin.site.register(PriceRequest, PriceRequestAdmin)
+admin.site.register(Job, JobAdmin)
+admin.site.register(SupplierItemMapping, SupplierItemMappingAdmin)
+admin.site.register(SupplierNotification, SupplierNotificationAdmin)
@@ -0,0 +1,175 @@
+import time
+
+import numpy as np
+
+from .models import CurrentPrice, CurrentPriceAlcohol, Supplier
+
+
+class SupplierAllocation:
+    """
+    Распределение месячной потребности (quantity) по поставщикам с минимальной
+    общей стоимостью по актуальным предложениям.
+
+    Задача сводится к матрице стоимостей cost[товар, поставщик] = quantity * цена
+    (inf, если предложения нет). Без ограничения числа поставщиков оптимум — минимум
+    по строкам. С ограничением max_suppliers выбирается набор поставщиков жадным
+    добавлением с последующими обменами (1-swap); все оценки считаются
+    векторно по всей матрице сразу.
+
+    scope (AccessScope) ограничивает предложения поставщиками городов закупщика.
+    """
+    def __init__(self, current_model, organization_ids=None, max_suppliers=None,
+                 city_id=None, supplier_type=None, scope=None, max_swaps=50, time_limit=0.3):
+        self.current_model = current_model
+        self.item_field = current_model.item_field
+        self.organization_ids = organization_ids
+        self.scope = scope
+        self.max_suppliers = max_suppliers
+        self.city_id = city_id
+        self.supplier_type = supplier_type
+        self.max_swaps = max_swaps
+        # Ограничение времени на этап обменов, секунд: результат улучшается, пока есть время
+        self.time_limit = time_limit
+
+    def items(self):
+        item_model = self.current_model._meta.get_field(self.item_field).related_model
+        queryset = item_model.objects.all()
+        if self.organization_ids is not None:
+            queryset = queryset.filter(organization_id__in=self.organization_ids)
+        return list(queryset.order_by('name', 'pk').values_list('pk', 'name', 'unit', 'quantity'))
+
+    def offers(self, item_ids):
+        queryset = self.current_model.objects.filter(
+            **{f'{self.item_field}_id__in': item_ids}, price__isnull=False
+        )
+        if self.scope is not None:
+            queryset = self.scope.filter_suppliers(queryset)
+        if self.city_id is not None:
+            queryset = queryset.filter(supplier__city_id=self.city_id)
+        if self.supplier_type is not None:
+            queryset = queryset.filter(supplier__type=self.supplier_type)
+        return list(queryset.values_list(f'{self.item_field}_id', 'supplier_id', 'price'))
+
+    def cost_matrix(self, items, offers):
+        item_index = {pk: i for i, (pk, *_) in enumerate(items)}
+        supplier_ids = np.unique(np.fromiter((supplier_id for _, supplier_id, _ in offers), dtype=np.int64))
+        rows = np.fromiter((item_index[item_id] for item_id, _, _ in offers), dtype=np.int64, count=len(offers))
+        columns = np.searchsorted(supplier_ids, np.fromiter(
+            (supplier_id for _, supplier_id, _ in offers), dtype=np.int64, count=len(offers)))
+        prices = np.full((len(items), len(supplier_ids)), np.inf)
+        prices[rows, columns] = np.fromiter((price for _, _, price in offers), dtype=np.float64, count=len(offers))
+        quantities = np.fromiter((quantity for *_, quantity in items), dtype=np.float64, count=len(items))
+        # 0 * inf даёт nan — умножаются только имеющиеся предложения, остальные остаются бесконечными
+        cost = np.multiply(prices, quantities[:, None], out=np.full_like(prices, np.inf), where=~np.isinf(prices))
+        return supplier_ids, prices, cost
+
+    def choose(self, prices, cost):
+        """
+        Набор столбцов (поставщиков) размером не больше max_suppliers.
+        """
+        # Штраф за товар без поставщика больше стоимости любой закупки целиком:
+        # покрыть ещё один товар всегда выгоднее любой экономии. Штраф не делается
+        # «бесконечно» большим, чтобы суммы не теряли точность
+        finite_cost = np.where(np.isinf(cost), 0.0, cost)
+        penalty = finite_cost.max(axis=1).sum() + 1.0 if cost.size else 1.0
+        finite = np.where(np.isinf(cost), penalty, cost)
+        n_suppliers = cost.shape[1]
+        offered = ~np.isinf(prices).all(axis=1)
+        unconstrained = np.unique(prices[offered].argmin(axis=1))
+        if self.max_suppliers is None or len(unconstrained) <= self.max_suppliers:
+            return unconstrained, True
+
+        # Жадное добавление: на каждом шаге поставщик, сильнее всего снижающий стоимость
+        chosen = []
+        current = np.full(cost.shape[0], penalty)
+        for _ in range(min(self.max_suppliers, n_suppliers)):
+            totals = np.minimum(current[:, None], finite).sum(axis=0)
+            totals[chosen] = np.inf
+            best = int(totals.argmin())
+            chosen.append(best)
+            current = np.minimum(current, finite[:, best])
+
+        # Обмены: заменяем поставщика из набора на внешнего, пока это выгодно.
+        # Стоимость обмена p -> s для всех пар сразу:
+        #   sum_i min(first_i, c_is) + sum_{i: лучший у p} [min(second_i, c_is) - min(first_i, c_is)],
+        # вторая сумма — произведение матрицы принадлежности (k x P) на матрицу поправок (P x S)
+        chosen = np.array(chosen)
+        rows = np.arange(cost.shape[0])
+        deadline = time.monotonic() + self.time_limit
+        for _ in range(self.max_swaps):
+            if time.monotonic() > deadline:
+                break
+            base = finite[:, chosen]
+            order = np.argsort(base, axis=1)
+            first = base[rows, order[:, 0]]
+            if len(chosen) > 1:
+                second = base[rows, order[:, 1]]
+            else:
+                second = np.full(len(rows), penalty)
+            with_first = np.minimum(first[:, None], finite)
+            correction = np.minimum(second[:, None], finite) - with_first
+            owners = np.zeros((len(chosen), len(rows)))
+            owners[order[:, 0], rows] = 1.0
+            totals = with_first.sum(axis=0)[None, :] + owners @ correction
+            totals[:, chosen] = np.inf
+            position, supplier = np.unravel_index(totals.argmin(), totals.shape)
+            if totals[position, supplier] >= first.sum() * (1 - 1e-12) - 1e-9:
+                break
+            chosen[position] = supplier
+        return np.sort(chosen), False
+
+    def solve(self):
+        items = self.items()
+        offers = self.offers([pk for pk, *_ in items]) if items else []
+        if not offers:
+            return self.response(items, np.empty(0, dtype=np.int64), None, np.empty(0, dtype=np.int64), True)
+        supplier_ids, prices, cost = self.cost_matrix(items, offers)
+        chosen, optimal = self.choose(prices, cost)
+        return self.response(items, supplier_ids, prices, chosen, optimal)
+
+    def response(self, items, supplier_ids, prices, chosen, optimal):
+        if len(chosen):
+            # Каждый товар — у самого дешёвого из выбранных поставщиков
+            sub = prices[:, chosen]
+            pick = sub.argmin(axis=1)
+            picked_prices = sub[np.arange(len(sub)), pick]
+            covered = ~np.isinf(picked_prices)
+            picked_suppliers = supplier_ids[chosen][pick]
+        else:
+            covered = np.zeros(len(items), dtype=bool)
+        names = dict(Supplier.objects.filter(pk__in=supplier_ids[chosen].tolist()).values_list('pk', 'name')) if len(chosen) else {}
+
+        allocation, uncovered, per_supplier = [], [], {}
+        for index, (pk, name, unit, quantity) in enumerate(items):
+            if not covered[index]:
+                uncovered.append({'id': pk, 'name': name})
+                continue
+            supplier_id = int(picked_suppliers[index])
+            price = float(picked_prices[index])
+            line_cost = round(price * quantity, 2)
+            allocation.append({
+                'id': pk, 'name': name, 'unit': unit, 'quantity': quantity,
+                'supplier_id': supplier_id, 'supplier_name': names.get(supplier_id, ''),
+                'price': price, 'cost': line_cost,
+            })
+            summary = per_supplier.setdefault(supplier_id, {
+                'id': supplier_id, 'name': names.get(supplier_id, ''), 'items': 0, 'cost': 0.0,
+            })
+            summary['items'] += 1
+            summary['cost'] = round(summary['cost'] + line_cost, 2)
+
+        return {
+            'total_cost': round(sum(line['cost'] for line in allocation), 2),
+            'optimal': optimal,
+            'suppliers': sorted(per_supplier.values(), key=lambda row: -row['cost']),
+            'items': allocation,
+            'uncovered': uncovered,
+        }
+
+
+def allocate_products(**kwargs):
+    return SupplierAllocation(CurrentPrice, **kwargs).solve()
+
+
+def allocate_alcohol(**kwargs):
+    return SupplierAllocation(CurrentPriceAlcohol, **kwargs).solve()
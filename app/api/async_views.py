@@ -0,0 +1,176 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.renderers import BrowsableAPIRenderer
+
+from . import views
+from .models import AlcoholProduct, PriceAlcohol, Product, Price
+from .pagination import apaginate_queryset
+from .permissions import aaccess_scope, aauthenticate, access_scope
+from .readers import ValuesReader
+from .serializers import AlcoholProductWithPricesSerializer, ProductWithPricesSerializer
+
+
+class ResolvedAuthentication(BaseAuthentication):
+    """
+    Пользователь, уже найденный aauthenticate: DRF получает его без обращения к БД,
+    а ответ 401 и заголовок WWW-Authenticate остаются как у TokenAuthentication.
+    """
+    def __init__(self, user):
+        self.user = user
+
+    def authenticate(self, request):
+        return (self.user, None) if self.user is not None else None
+
+    def authenticate_header(self, request):
+        return 'Token'
+
+
+class AsyncReadView(View):
+    """
+    Асинхронный вариант действия чтения ViewSet для запуска под ASGI: пока запрос
+    ждёт БД, поток не занят. Аутентификация, права и данные читаются через async
+    ORM; выборка, фильтры (?search, ?ordering), поля ответа (?fields, ?include),
+    пагинация и рендереры — те же, что у viewset_class, поэтому ответ совпадает
+    с синхронным. Кэш ответов и ETag (CachedResponseMixin, ConditionalResponseMixin)
+    здесь не применяются.
+    """
+    viewset_class = None
+    action = 'list'
+
+    async def get(self, request, *args, **kwargs):
+        viewset = self.initialize_viewset(request, kwargs)
+        user = await aauthenticate(request)
+        viewset.request.authenticators = (ResolvedAuthentication(user),)
+        try:
+            if user is not None:
+                await aaccess_scope(user)
+            viewset.check_permissions(viewset.request)
+            response = await self.read(viewset)
+        except exceptions.APIException as exc:
+            response = viewset.handle_exception(exc)
+        return self.render(viewset, response)
+
+    def initialize_viewset(self, request, kwargs):
+        viewset = self.viewset_class(
+            action_map={'get': self.action}, args=(), kwargs=kwargs, format_kwarg=None, headers={},
+        )
+        # Browsable API строит формы синхронно — в async view только JSON и MessagePack
+        viewset.renderer_classes = [
+            renderer for renderer in viewset.renderer_classes if not issubclass(renderer, BrowsableAPIRenderer)
+        ]
+        viewset.request = viewset.initialize_request(request)
+        return viewset
+
+    def render(self, viewset, response):
+        """
+        Рендерит Response DRF здесь же: отложенный render() Django вызвал бы в потоке.
+        """
+        response = viewset.finalize_response(viewset.request, response)
+        response.render()
+        rendered = HttpResponse(response.content, status=response.status_code)
+        for header, value in response.items():
+            rendered[header] = value
+        return rendered
+
+    async def build(self, viewset, func):
+        """
+        Выборка, построенная синхронным кодом ViewSet. Без ?search она ленивая и строится
+        сразу; полнотекстовый поиск читает индекс обычным курсором — тогда в потоке.
+        """
+        if viewset.request.query_params.get('search'):
+            return await sync_to_async(func)()
+        return func()
+
+    async def paginated(self, viewset, queryset, represent):
+        page = await apaginate_queryset(viewset.paginator, queryset, viewset.request, viewset)
+        if page is None:
+            return viewset.get_paginated_response(represent([row async for row in queryset]))
+        return viewset.get_paginated_response(represent(page))
+
+    async def get_queryset(self, viewset):
+        return viewset.get_queryset()
+
+    async def read(self, viewset):
+        """
+        Действие list: строки через ValuesReader, как в readers.ValuesListMixin, а если
+        поля так прочитать нельзя (?include) — экземпляры и сериализатор.
+        """
+        base = await self.get_queryset(viewset)
+        queryset = await self.build(viewset, lambda: viewset.filter_queryset(base))
+        reader = ValuesReader.for_serializer(viewset.get_serializer())
+        if reader is None:
+            return await self.paginated(
+                viewset, queryset, lambda rows: viewset.get_serializer(rows, many=True).data,
+            )
+        queryset = reader.values(queryset, extra=getattr(viewset, 'keyset_fields', ()))
+        return await self.paginated(viewset, queryset, reader.represent)
+
+
+class ProductListView(AsyncReadView):
+    viewset_class = views.ProductViewSet
+
+
+class AlcoholProductListView(AsyncReadView):
+    viewset_class = views.AlcoholProductViewSet
+
+
+class PriceRequestListView(AsyncReadView):
+    viewset_class = views.PriceRequestViewSet
+
+
+class WithPricesView(AsyncReadView):
+    """
+    with-prices: товары страницы и их цены (prefetch) читаются одним обращением
+    к async ORM, сериализатор работает с уже загруженными данными.
+    """
+    action = 'with_prices'
+    serializer_class = None
+
+    async def read(self, viewset):
+        queryset = await self.build(viewset, viewset.with_prices_queryset)
+        context = viewset.get_serializer_context()
+        return await self.paginated(
+            viewset, queryset, lambda rows: self.serializer_class(rows, many=True, context=context).data,
+        )
+
+
+class ProductWithPricesView(WithPricesView):
+    viewset_class = views.ProductViewSet
+    serializer_class = ProductWithPricesSerializer
+
+
+class AlcoholProductWithPricesView(WithPricesView):
+    viewset_class = views.AlcoholProductViewSet
+    serializer_class = AlcoholProductWithPricesSerializer
+
+
+class ItemPricesView(AsyncReadView):
+    """
+    Цены товара (вложенный маршрут): товар и проверка его организации — через async ORM.
+    """
+    item_model = None
+    item_kwarg = None
+    price_model = None
+
+    async def get_queryset(self, viewset):
+        item = await self.item_model.objects.filter(pk=viewset.kwargs[self.item_kwarg]).afirst()
+        if item is None or not access_scope(viewset.request.user).allows_organization(item.organization_id):
+            return self.price_model.objects.none()
+        return viewset.prices_for(item)
+
+
+class ProductPricesView(ItemPricesView):
+    viewset_class = views.ProductPriceViewSet
+    item_model = Product
+    item_kwarg = 'product_pk'
+    price_model = Price
+
+
+class AlcoholPricesView(ItemPricesView):
+    viewset_class = views.AlcoholPriceViewSet
+    item_model = AlcoholProduct
+    item_kwarg = 'alcohol_pk'
+    price_model = PriceAlcohol
@@ -0,0 +1,220 @@
+import threading
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+
+from .stemmer import tokenize
+
+LIMIT = 10
+# Сколько совпадений просматривается для ранжирования (начало названия выше)
+SCAN_LIMIT = 200
+
+
+def normalize(text):
+    return ' '.join(tokenize(text))
+
+
+class PrefixIndex:
+    """
+    Отсортированный массив ключей (название с каждого слова, id) одной организации:
+    поиск по префиксу — bisect и просмотр соседних ключей, изменение — вставка
+    и удаление по bisect без перестроения.
+
+    Состояние — пара (ключи, записи), которая не меняется после публикации:
+    изменение собирает новую пару из копий и подменяет её одним присваиванием,
+    поэтому lookup из других потоков без блокировки видит целиком старое или
+    новое состояние. Изменения выполняются под блокировкой Autocomplete.
+    """
+    def __init__(self, items=()):
+        entries = {}  # id -> (название, id города, ключи)
+        keys = []
+        for pk, name, city_id in items:
+            item_keys = self._keys(pk, name)
+            entries[pk] = (name, city_id, item_keys)
+            keys.extend(item_keys)
+        keys.sort()
+        self.state = (keys, entries)
+
+    @staticmethod
+    def _keys(pk, name):
+        words = normalize(name).split(' ')
+        return tuple(dict.fromkeys((' '.join(words[i:]), pk) for i in range(len(words))))
+
+    @staticmethod
+    def _remove(keys, entries, pk):
+        item = entries.pop(pk, None)
+        if item is None:
+            return
+        for key in item[2]:
+            position = bisect_left(keys, key)
+            if position < len(keys) and keys[position] == key:
+                del keys[position]
+
+    def add(self, pk, name, city_id=None):
+        keys, entries = self.state
+        keys, entries = list(keys), dict(entries)
+        self._remove(keys, entries, pk)
+        item_keys = self._keys(pk, name)
+        for key in item_keys:
+            insort(keys, key)
+        entries[pk] = (name, city_id, item_keys)
+        self.state = (keys, entries)
+
+    def discard(self, pk):
+        keys, entries = self.state
+        if pk not in entries:
+            return
+        keys, entries = list(keys), dict(entries)
+        self._remove(keys, entries, pk)
+        self.state = (keys, entries)
+
+    def lookup(self, prefix, limit=LIMIT, city_ids=None):
+        """
+        [(ранг, название, id)] по префиксу любого слова названия; ранг 0 —
+        совпадение с начала названия. city_ids — города закупщика (для поставщиков).
+        """
+        prefix = normalize(prefix)
+        keys, entries = self.state
+        found = {}
+        position = bisect_left(keys, (prefix,))
+        for key, pk in keys[position:position + SCAN_LIMIT]:
+            if not key.startswith(prefix):
+                break
+            if pk in found:
+                continue
+            name, city_id, item_keys = entries[pk]
+            if city_ids is not None and city_id is not None and city_id not in city_ids:
+                continue
+            found[pk] = (0 if item_keys[0][0] == key else 1, name, pk)
+        return sorted(found.values())[:limit]
+
+
+class Autocomplete:
+    """
+    Индексы подсказок в памяти процесса по (вид, организация), загружаются при
+    первом запросе. Изменения из сигналов применяются к загруженным индексам после
+    фиксации транзакции; общий счётчик поколений в кэше сообщает другим процессам,
+    что их индексы этого вида устарели и будут загружены заново.
+
+    Счётчик в кэше процесса (settings.CACHE_SHARED ложно) о чужих изменениях
+    не узнает, поэтому тогда индекс сверяется с БД при каждом запросе, как
+    matching.MatcherCache: число записей, последний id и время изменения.
+    """
+    def __init__(self, sources, stamps):
+        # sources: вид -> функция (id организации) -> [(id, название, id города)]
+        # stamps: вид -> функция (id организации) -> отметка состояния каталога в БД
+        self.sources = sources
+        self.stamps = stamps
+        self.indexes = {}
+        self.generations = {}
+        self.checked = {}  # (вид, организация) -> (отметка, индекс)
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def generation_key(kind):
+        return f'autocomplete:generation:{kind}'
+
+    def index(self, kind, organization_id):
+        if not settings.CACHE_SHARED:
+            return self.checked_index(kind, organization_id)
+        generation = cache.get(self.generation_key(kind), 0)
+        with self.lock:
+            if self.generations.get(kind) != generation:
+                self.indexes = {key: index for key, index in self.indexes.items() if key[0] != kind}
+                self.generations[kind] = generation
+            index = self.indexes.get((kind, organization_id))
+        if index is None:
+            index = PrefixIndex(self.sources[kind](organization_id))
+            with self.lock:
+                if self.generations.get(kind) == generation:
+                    index = self.indexes.setdefault((kind, organization_id), index)
+        return index
+
+    def checked_index(self, kind, organization_id):
+        stamp = self.stamps[kind](organization_id)
+        key = (kind, organization_id)
+        with self.lock:
+            cached = self.checked.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        index = PrefixIndex(self.sources[kind](organization_id))
+        with self.lock:
+            self.checked[key] = (stamp, index)
+        return index
+
+    def lookup(self, kind, organization_ids, prefix, limit=LIMIT, city_ids=None):
+        found = []
+        for organization_id in organization_ids:
+            found.extend(
+                (rank, name, pk, organization_id)
+                for rank, name, pk in self.index(kind, organization_id).lookup(prefix, limit, city_ids)
+            )
+        return sorted(found)[:limit]
+
+    def changed(self, kind, pk, organization_id=None, name=None, city_id=None):
+        """
+        Запись изменена (name задано) или удалена; применяется после фиксации транзакции.
+        """
+        transaction.on_commit(lambda: self.apply(kind, pk, organization_id, name, city_id))
+
+    def invalidate(self, kind):
+        transaction.on_commit(lambda: self.apply(kind))
+
+    def apply(self, kind, pk=None, organization_id=None, name=None, city_id=None):
+        generation_key = self.generation_key(kind)
+        cache.add(generation_key, 0, timeout=None)
+        try:
+            generation = cache.incr(generation_key)
+        except ValueError:
+            generation = None
+        with self.lock:
+            if pk is None or generation is None or self.generations.get(kind, 0) != generation - 1:
+                # Были изменения в других процессах (или сброс вида целиком) — загрузить заново
+                self.indexes = {key: index for key, index in self.indexes.items() if key[0] != kind}
+                self.generations.pop(kind, None)
+                return
+            for (index_kind, index_organization), index in self.indexes.items():
+                if index_kind == kind:
+                    index.discard(pk)
+                    if name is not None and index_organization == organization_id:
+                        index.add(pk, name, city_id)
+            self.generations[kind] = generation
+
+
+def load_products(organization_id):
+    from .models import Product
+    names = Product.objects.filter(organization_id=organization_id).values_list('pk', 'name')
+    return [(pk, name, None) for pk, name in names]
+
+
+def load_alcohol(organization_id):
+    from .models import AlcoholProduct
+    names = AlcoholProduct.objects.filter(organization_id=organization_id).values_list('pk', 'name')
+    return [(pk, name, None) for pk, name in names]
+
+
+def load_suppliers(organization_id):
+    from .models import Supplier
+    return Supplier.objects.filter(organization_id=organization_id).values_list('pk', 'name', 'city_id')
+
+
+def catalogue_stamp(model_name):
+    def stamp(organization_id):
+        from . import models
+        catalogue = getattr(models, model_name).objects.filter(organization_id=organization_id)
+        return tuple(catalogue.aggregate(count=Count('pk'), last_id=Max('pk'), updated=Max('last_updated')).values())
+    return stamp
+
+
+autocomplete = Autocomplete({
+    'product': load_products,
+    'alcohol': load_alcohol,
+    'supplier': load_suppliers,
+}, {
+    'product': catalogue_stamp('Product'),
+    'alcohol': catalogue_stamp('AlcoholProduct'),
+    'supplier': catalogue_stamp('Supplier'),
+})
@@ -0,0 +1,66 @@
+from django.db import connections, models, router
+from django.db.models.constants import OnConflict
+
+
+def _converter(field, connection):
+    """
+    Преобразование значения поля в параметр запроса. Даты кэшируются:
+    в пачке они, как правило, совпадают (время загрузки прайс-листа).
+    """
+    if isinstance(field, models.DateTimeField):
+        adapt = connection.ops.adapt_datetimefield_value
+    elif isinstance(field, models.DateField):
+        adapt = connection.ops.adapt_datefield_value
+    else:
+        return None
+    cache = {}
+
+    def convert(value):
+        if value not in cache:
+            cache[value] = adapt(value)
+        return cache[value]
+    return convert
+
+
+def insert_rows(model, fields, rows, unique_fields=(), update_fields=(), using=None):
+    """
+    Вставляет кортежи значений одним executemany, не создавая экземпляры моделей.
+
+    fields — имена полей модели (для ForeignKey передаются id), rows — кортежи
+    значений в том же порядке. Если заданы unique_fields и update_fields,
+    конфликтующие строки обновляются (INSERT ... ON CONFLICT DO UPDATE).
+    Сигналы и save() не вызываются — вызывающий код отвечает за побочные эффекты.
+    """
+    using = using or router.db_for_write(model)
+    connection = connections[using]
+    opts = model._meta
+    model_fields = [opts.get_field(name) for name in fields]
+    quote = connection.ops.quote_name
+
+    sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+        quote(opts.db_table),
+        ', '.join(quote(field.column) for field in model_fields),
+        ', '.join(['%s'] * len(model_fields)),
+    )
+    if update_fields:
+        sql += ' ' + connection.ops.on_conflict_suffix_sql(
+            model_fields,
+            OnConflict.UPDATE,
+            [opts.get_field(name).column for name in update_fields],
+            [opts.get_field(name).column for name in unique_fields],
+        )
+
+    converters = [_converter(field, connection) for field in model_fields]
+    if any(converters):
+        rows = [
+            tuple(value if convert is None or value is None else convert(value)
+                  for convert, value in zip(converters, row))
+            for row in rows
+        ]
+    else:
+        rows = list(rows)
+    if not rows:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+    return len(rows)
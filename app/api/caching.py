@@ -0,0 +1,245 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from .permissions import access_scope
+
+CACHE_ALIAS = 'default'
+CACHE_TIMEOUT = 60 * 5
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def version_key(model):
+    return f'api-cache:version:{model._meta.label_lower}'
+
+
+def bump_version(model):
+    """
+    Инвалидирует все закэшированные ответы, зависящие от модели: меняется
+    версия модели, входящая в ключ. Выполняется после фиксации транзакции,
+    чтобы параллельный запрос не закэшировал данные до коммита.
+    """
+    def bump():
+        cache = get_cache()
+        try:
+            cache.incr(version_key(model))
+        except ValueError:
+            # Версия вытеснена из кэша — начинаем с заведомо новой, а не с одной
+            # из прежних, под которой могли остаться устаревшие ответы
+            cache.set(version_key(model), time.time_ns(), timeout=None)
+    transaction.on_commit(bump)
+
+
+def count(basename, outcome):
+    cache = get_cache()
+    key = f'api-cache:stats:{basename}:{outcome}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def stats(basenames):
+    """
+    Счётчики попаданий и промахов по эндпоинтам.
+    """
+    cache = get_cache()
+    keys = {
+        (basename, outcome): f'api-cache:stats:{basename}:{outcome}'
+        for basename in basenames for outcome in ('hit', 'miss')
+    }
+    values = cache.get_many(keys.values())
+    result = {}
+    for (basename, outcome), key in keys.items():
+        result.setdefault(basename, {'hit': 0, 'miss': 0})[outcome] = values.get(key, 0)
+    for row in result.values():
+        total = row['hit'] + row['miss']
+        row['hit_ratio'] = round(row['hit'] / total, 3) if total else None
+    return result
+
+
+def scope_key(user):
+    """
+    Права пользователя в ключе: организации и города (от них зависит выборка).
+    """
+    scope = access_scope(user)
+    if scope.unrestricted:
+        return 'all'
+    return '%s/%s' % (','.join(map(str, sorted(scope.organization_ids))), ','.join(map(str, sorted(scope.city_ids))))
+
+
+def cache_key(view, request, kwargs):
+    """
+    Ключ ответа: эндпоинт и действие, параметры URL и запроса, права
+    пользователя и текущие версии моделей, от которых зависит ответ.
+    """
+    models = view.cache_models
+    versions = get_cache().get_many([version_key(model) for model in models])
+    parts = [
+        view.basename, view.action,
+        repr(sorted(kwargs.items())),
+        repr(sorted((key, sorted(values)) for key, values in request.query_params.lists())),
+        ','.join(str(versions.get(version_key(model), 1)) for model in models),
+    ]
+    if view.cache_scoped:
+        parts.append(scope_key(request.user))
+    digest = hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
+    return f'api-cache:response:{view.basename}:{digest}'
+
+
+def cache_response(method):
+    """
+    Кэширует данные успешного GET-ответа действия ViewSet'а. Сериализация
+    при попадании не выполняется; заголовок X-Cache показывает HIT или MISS.
+    """
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        if request.method != 'GET' or not settings.CACHE_SHARED:
+            # Кэш процесса (locmem) не узнает о записях в других процессах
+            return method(self, request, *args, **kwargs)
+        cache = get_cache()
+        key = cache_key(self, request, kwargs)
+        data = cache.get(key)
+        if data is not None:
+            count(self.basename, 'hit')
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        count(self.basename, 'miss')
+        response = method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, self.cache_timeout)
+        response['X-Cache'] = 'MISS'
+        return response
+    return wrapper
+
+
+class CachedResponseMixin:
+    """
+    Кэш ответов list/retrieve для справочных ViewSet'ов.
+
+    cache_models — модели, изменение которых инвалидирует ответы (см. signals.py);
+    cache_scoped — ответ зависит от организаций пользователя.
+    """
+    cache_models = ()
+    cache_scoped = True
+    cache_timeout = CACHE_TIMEOUT
+
+    @cache_response
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+
+def validators(view, request, kwargs, related=None):
+    """
+    ETag и Last-Modified для ответа: максимальная дата изменения и число строк
+    выборки одним агрегирующим запросом. related — обратная связь с ценами
+    (для with-prices): учитываются и их дата изменения и количество.
+    view.modified_related — даты изменения связанных записей, данные которых
+    есть в ответе (например, название поставщика в списке цен).
+    """
+    queryset = view.filter_queryset(view.get_queryset())
+    lookup = view.lookup_url_kwarg or view.lookup_field
+    if lookup in kwargs:
+        queryset = queryset.filter(**{view.lookup_field: kwargs[lookup]})
+    aggregates = {'modified': Max(view.modified_field), 'rows': Count('pk', distinct=True)}
+    for field in response_related(view, getattr(view, 'modified_related', ())):
+        aggregates[f'{field}_modified'] = Max(field)
+    if related:
+        aggregates['related_modified'] = Max(f'{related}__date_updated')
+        aggregates['related_supplier_modified'] = Max(f'{related}__supplier__last_updated')
+        aggregates['related_rows'] = Count(related)
+    values = queryset.order_by().aggregate(**aggregates)
+
+    modified = [value for key, value in values.items() if key.endswith('modified') and value is not None]
+    last_modified = max(modified) if modified else None
+    parts = [
+        view.basename, view.action, repr(sorted(kwargs.items())),
+        repr(sorted((key, sorted(items)) for key, items in request.query_params.lists())),
+        repr(sorted(values.items())),
+    ]
+    if view.cache_models and settings.CACHE_SHARED:
+        # Версии моделей учитывают изменения, не видимые по датам (например, удаление
+        # связанных записей). Версии в кэше процесса не узнают о записях других процессов —
+        # тогда ETag строится только по состоянию БД (даты изменения и число строк)
+        versions = get_cache().get_many([version_key(model) for model in view.cache_models])
+        parts.append(','.join(str(versions.get(version_key(model), 1)) for model in view.cache_models))
+    if view.cache_scoped:
+        parts.append(scope_key(request.user))
+    etag = quote_etag(hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest())
+    return etag, last_modified
+
+
+def response_related(view, fields):
+    """
+    Даты изменения связей из fields, которые читают поля ответа list/retrieve
+    (при ?fields без названия организации её таблица в агрегат не добавляется).
+    """
+    if view.action not in ('list', 'retrieve'):
+        return fields
+    serializer = view.get_serializer()
+    if not hasattr(serializer, 'related_lookups'):
+        return fields
+    lookups = serializer.related_lookups()
+    return [field for field in fields if field.rsplit('__', 1)[0] in lookups]
+
+
+def conditional_response(method=None, related=None):
+    """
+    Условный GET: по If-None-Match / If-Modified-Since возвращает 304 Not Modified,
+    не выполняя действие (и сериализацию); иначе добавляет к ответу ETag и Last-Modified.
+    """
+    if method is None:
+        return lambda method: conditional_response(method, related=related)
+
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return method(self, request, *args, **kwargs)
+        etag, last_modified = validators(self, request, kwargs, related)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request._request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = method(self, request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        return response
+    return wrapper
+
+
+class ConditionalResponseMixin:
+    """
+    ETag / Last-Modified для list/retrieve. modified_field — поле даты изменения
+    модели ViewSet'а, modified_related — даты изменения связанных моделей в ответе;
+    ставится перед CachedResponseMixin, чтобы 304 не обращался к кэшу.
+    """
+    modified_field = 'last_updated'
+    modified_related = ()
+    cache_models = ()
+    cache_scoped = True
+
+    @conditional_response
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_response
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
@@ -0,0 +1,155 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import CurrentPrice, CurrentPriceAlcohol, Supplier
+
+CACHE_TIMEOUT = 60 * 10
+GENERATION_KEY = 'price-comparison:generation'
+
+
+def generation():
+    """
+    Поколение данных о ценах: меняется при любой записи цен, входит в ключ кэша.
+    """
+    return cache.get_or_set(GENERATION_KEY, 1, timeout=None)
+
+
+def invalidate():
+    """
+    Сбрасывает кэш сравнения после фиксации транзакции, записавшей цены.
+    """
+    def bump():
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            # Поколение вытеснено из кэша — новое не должно совпасть с прежним
+            cache.set(GENERATION_KEY, time.time_ns(), timeout=None)
+    transaction.on_commit(bump)
+
+
+def rank_offers(item_ids, supplier_ids, prices):
+    """
+    Ранжирует предложения по каждому товару за один проход по отсортированным массивам.
+
+    Возвращает массивы по уникальным товарам: id товара, минимальная цена,
+    вторая цена (nan, если предложение одно), максимальная цена, разброс (max - min),
+    число предложений и id самого дешёвого поставщика.
+    """
+    order = np.lexsort((supplier_ids, prices, item_ids))
+    item_ids, supplier_ids, prices = item_ids[order], supplier_ids[order], prices[order]
+
+    items, first, counts = np.unique(item_ids, return_index=True, return_counts=True)
+    last = first + counts - 1
+    best = prices[first]
+    second = np.full(len(items), np.nan)
+    has_second = counts > 1
+    second[has_second] = prices[first[has_second] + 1]
+    worst = prices[last]
+    return {
+        'item_ids': items,
+        'min': best,
+        'second': second,
+        'max': worst,
+        'spread': worst - best,
+        'offers': counts,
+        'supplier_ids': supplier_ids[first],
+    }
+
+
+class PriceComparison:
+    """
+    Сравнение актуальных предложений поставщиков по товарам доступных организаций.
+    scope (AccessScope) ограничивает предложения поставщиками городов закупщика.
+    """
+    def __init__(self, current_model, organization_ids=None, scope=None):
+        self.current_model = current_model
+        self.item_field = current_model.item_field
+        self.organization_ids = None if organization_ids is None else sorted(set(organization_ids))
+        self.scope = scope
+
+    def cache_key(self):
+        organizations = 'all' if self.organization_ids is None else ','.join(map(str, self.organization_ids))
+        restricted = self.scope is not None and not self.scope.unrestricted and self.scope.city_ids
+        cities = ','.join(map(str, sorted(self.scope.city_ids))) if restricted else 'all'
+        return f'price-comparison:{self.item_field}:{generation()}:{organizations}:{cities}'
+
+    def offers(self):
+        queryset = self.current_model.objects.filter(price__isnull=False)
+        if self.organization_ids is not None:
+            queryset = queryset.filter(**{f'{self.item_field}__organization_id__in': self.organization_ids})
+        if self.scope is not None:
+            queryset = self.scope.filter_suppliers(queryset)
+        rows = list(queryset.values_list(f'{self.item_field}_id', 'supplier_id', 'price'))
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+        item_ids, supplier_ids, prices = zip(*rows)
+        return (
+            np.fromiter(item_ids, dtype=np.int64, count=len(rows)),
+            np.fromiter(supplier_ids, dtype=np.int64, count=len(rows)),
+            np.fromiter(prices, dtype=np.float64, count=len(rows)),
+        )
+
+    def compute(self):
+        item_ids, supplier_ids, prices = self.offers()
+        if not len(item_ids):
+            return []
+        ranked = rank_offers(item_ids, supplier_ids, prices)
+
+        item_model = self.current_model._meta.get_field(self.item_field).related_model
+        items = dict(
+            (pk, (name, unit)) for pk, name, unit in
+            item_model.objects.filter(pk__in=ranked['item_ids'].tolist()).values_list('pk', 'name', 'unit')
+        )
+        suppliers = dict(
+            Supplier.objects.filter(pk__in=np.unique(ranked['supplier_ids']).tolist()).values_list('pk', 'name')
+        )
+
+        result = []
+        columns = zip(
+            ranked['item_ids'].tolist(), ranked['min'].tolist(), ranked['second'].tolist(),
+            ranked['max'].tolist(), ranked['spread'].tolist(), ranked['offers'].tolist(),
+            ranked['supplier_ids'].tolist(),
+        )
+        for item_id, best, second, worst, spread, offers, supplier_id in columns:
+            name, unit = items.get(item_id, ('', ''))
+            result.append({
+                'id': item_id,
+                'name': name,
+                'unit': unit,
+                'offers': offers,
+                'min_price': round(best, 2),
+                'second_price': None if second != second else round(second, 2),
+                'max_price': round(worst, 2),
+                'spread': round(spread, 2),
+                'best_supplier_id': supplier_id,
+                'best_supplier_name': suppliers.get(supplier_id, ''),
+            })
+        result.sort(key=lambda row: (row['name'], row['id']))
+        return result
+
+    def get(self):
+        """
+        Результат сравнения из кэша (на набор организаций и городов) или свежий расчёт.
+        Кэш процесса (settings.CACHE_SHARED ложно) не узнаёт о ценах, записанных
+        другими процессами, поэтому тогда сравнение всегда считается заново.
+        """
+        if not settings.CACHE_SHARED:
+            return self.compute()
+        key = self.cache_key()
+        result = cache.get(key)
+        if result is None:
+            result = self.compute()
+            cache.set(key, result, CACHE_TIMEOUT)
+        return result
+
+
+def compare_product_prices(organization_ids=None, scope=None):
+    return PriceComparison(CurrentPrice, organization_ids, scope).get()
+
+
+def compare_alcohol_prices(organization_ids=None, scope=None):
+    return PriceComparison(CurrentPriceAlcohol, organization_ids, scope).get()
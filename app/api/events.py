@@ -0,0 +1,197 @@
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+
+import orjson
+
+# Сколько последних событий хранится для переподключения с Last-Event-ID
+HISTORY = 1000
+# Сколько неотправленных событий может накопиться у одного подписчика;
+# при переполнении очередь сбрасывается и клиент получает событие reset
+MAX_PENDING = 1000
+# Интервал комментариев-пингов: держит соединение через прокси и выявляет отключение
+KEEPALIVE = 15
+# Django 4.2 не сообщает потоковому ответу об отключении клиента, поэтому соединение
+# закрывается через MAX_AGE секунд; EventSource переподключается сам с Last-Event-ID
+MAX_AGE = 600
+RETRY_MS = 3000
+
+
+class Event:
+    """
+    Событие для подписчиков организации; сообщение SSE сериализуется один раз
+    при публикации и отправляется всем подписчикам как есть. purchaser_id — событие
+    только для этого закупщика (и администраторов), city_id — город поставщика
+    (видно закупщикам этого города); None — без ограничения.
+    """
+    __slots__ = ('id', 'organization_id', 'purchaser_id', 'city_id', 'message')
+
+    def __init__(self, event_id, event_type, organization_id, data, purchaser_id=None, city_id=None):
+        self.id = event_id
+        self.organization_id = organization_id
+        self.purchaser_id = purchaser_id
+        self.city_id = city_id
+        self.message = b''.join((
+            f'id: {event_id}\nevent: {event_type}\ndata: '.encode(), orjson.dumps(data), b'\n\n',
+        ))
+
+
+RESET = b'event: reset\ndata: {}\n\n'
+
+
+class Subscription:
+    """
+    Подписка одного соединения: очередь сообщений, которую заполняет цикл событий
+    соединения. organization_ids None — все организации (администратор); user_id —
+    закупщик (None — администратор, видит события всех закупщиков); city_ids —
+    города закупщика (пусто или None — без ограничения, как AccessScope.filter_suppliers).
+    """
+    __slots__ = ('organization_ids', 'user_id', 'city_ids', 'loop', 'pending', 'ready')
+
+    def __init__(self, organization_ids, loop, user_id=None, city_ids=None):
+        self.organization_ids = organization_ids
+        self.user_id = user_id
+        self.city_ids = city_ids
+        self.loop = loop
+        self.pending = deque()
+        self.ready = asyncio.Event()
+
+    def accepts(self, event):
+        """
+        Видно ли событие подписчику (организация уже учтена индексом подписок).
+        """
+        if event.purchaser_id is not None and self.user_id is not None and event.purchaser_id != self.user_id:
+            return False
+        return event.city_id is None or not self.city_ids or event.city_id in self.city_ids
+
+    def push(self, message):
+        if len(self.pending) >= MAX_PENDING:
+            self.pending.clear()
+            message = RESET
+        self.pending.append(message)
+        self.ready.set()
+
+    async def messages(self, timeout=KEEPALIVE):
+        """
+        Накопившиеся сообщения; пустой список — за timeout секунд событий не было.
+        """
+        if not self.pending:
+            try:
+                await asyncio.wait_for(self.ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self.ready.clear()
+        messages = list(self.pending)
+        self.pending.clear()
+        return messages
+
+
+class EventBroker:
+    """
+    Публикация событий подписчикам в памяти процесса. Подписки индексируются по
+    организации, поэтому событие затрагивает только её подписчиков; доставка — один
+    call_soon_threadsafe на цикл событий, а не на соединение, так что публиковать
+    можно из любого потока (сигналы синхронных view и фоновых задач).
+    """
+    def __init__(self, history=HISTORY):
+        self.lock = threading.Lock()
+        self.subscriptions = {}  # id организации (None — все) -> set(Subscription)
+        self.history = deque(maxlen=history)
+        # id событий растут и между перезапусками процесса (начало — время запуска в мс),
+        # чтобы Last-Event-ID клиента не оказался больше новых id
+        self.sequence = itertools.count(int(time.time() * 1000))
+
+    @property
+    def active(self):
+        return bool(self.subscriptions)
+
+    def subscribe(self, organization_ids=None, last_event_id=None, user_id=None, city_ids=None):
+        """
+        Подписка для текущего цикла событий. last_event_id — повторить пропущенные
+        события из истории (заголовок Last-Event-ID при переподключении); user_id
+        и city_ids — ограничения закупщика (см. Subscription).
+        """
+        subscription = Subscription(
+            frozenset(organization_ids) if organization_ids is not None else None, asyncio.get_running_loop(),
+            user_id, frozenset(city_ids) if city_ids is not None else None,
+        )
+        with self.lock:
+            for key in (subscription.organization_ids if organization_ids is not None else [None]):
+                self.subscriptions.setdefault(key, set()).add(subscription)
+            if last_event_id is not None:
+                missed = [event for event in self.history if event.id > last_event_id]
+                if missed and missed[0].id > last_event_id + 1:
+                    # Часть событий уже вытеснена из истории — клиенту нужно перечитать данные
+                    subscription.push(RESET)
+                for event in missed:
+                    if organization_ids is not None and event.organization_id not in subscription.organization_ids:
+                        continue
+                    if subscription.accepts(event):
+                        subscription.push(event.message)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for key in (subscription.organization_ids if subscription.organization_ids is not None else [None]):
+                subscribers = self.subscriptions.get(key)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self.subscriptions[key]
+
+    def publish(self, events):
+        """
+        Публикует события [(тип, id организации, данные JSON[, id закупщика[, id города]])].
+        """
+        by_loop = {}
+        with self.lock:
+            for event_type, organization_id, data, *audience in events:
+                event = Event(next(self.sequence), event_type, organization_id, data, *audience)
+                self.history.append(event)
+                for key in (organization_id, None):
+                    for subscription in self.subscriptions.get(key, ()):
+                        if subscription.accepts(event):
+                            by_loop.setdefault(subscription.loop, []).append((subscription, event.message))
+        for loop, deliveries in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(deliver, deliveries)
+            except RuntimeError:
+                # Цикл событий уже закрыт — соединения его подписок больше не существуют
+                for subscription, _ in deliveries:
+                    self.unsubscribe(subscription)
+
+
+def deliver(deliveries):
+    for subscription, message in deliveries:
+        subscription.push(message)
+
+
+broker = EventBroker()
+
+
+class EventStream:
+    """
+    Тело ответа text/event-stream: сообщения подписки и пинги во время простоя.
+    Подписка снимается при закрытии ответа (StreamingHttpResponse.close) или
+    завершении итерации.
+    """
+    def __init__(self, subscription, keepalive=KEEPALIVE, max_age=MAX_AGE):
+        self.subscription = subscription
+        self.keepalive = keepalive
+        self.max_age = max_age
+
+    async def __aiter__(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_age
+        try:
+            yield f'retry: {RETRY_MS}\n\n'.encode()
+            while loop.time() < deadline:
+                messages = await self.subscription.messages(min(self.keepalive, max(deadline - loop.time(), 0)))
+                yield b''.join(messages) if messages else b': ping\n\n'
+        finally:
+            self.close()
+
+    def close(self):
+        broker.unsubscribe(self.subscription)
@@ -0,0 +1,113 @@
+import csv
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.db.models import FilteredRelation, Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Supplier
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson; charset=utf-8', 'ndjson'),
+}
+
+# Общие колонки выгрузки: товар + одно предложение поставщика на строку
+PRICE_COLUMNS = ('supplier_id', 'supplier_name', 'price', 'manufacturer', 'date_added', 'date_updated')
+
+
+class Echo:
+    """
+    Псевдофайл для csv.writer: возвращает записанную строку, ничего не накапливая.
+    """
+    def write(self, value):
+        return value
+
+
+class CatalogueExport:
+    """
+    Потоковая выгрузка каталога с предложениями поставщиков.
+
+    Одна строка — товар и одно предложение (LEFT JOIN: товары без цен выгружаются
+    с пустыми колонками цены). Строки читаются курсором пачками по chunk_size
+    через values_list, поэтому память не зависит от размера каталога.
+    prices — обратная связь с ценами (price / pricealcohol) или current_prices
+    для выгрузки только актуальных предложений. scope (AccessScope) оставляет
+    в соединении только предложения поставщиков городов закупщика.
+    """
+    def __init__(self, queryset, item_columns, prices, chunk_size=2000, scope=None):
+        self.queryset = queryset
+        self.item_columns = item_columns
+        self.prices = prices
+        self.chunk_size = chunk_size
+        self.scope = scope
+
+    @property
+    def columns(self):
+        return self.item_columns + ('organization_name',) + PRICE_COLUMNS
+
+    def rows(self):
+        queryset, prices = self.queryset, self.prices
+        if self.scope is not None and not self.scope.unrestricted and self.scope.city_ids:
+            # Условие в ON соединения: товар без видимых предложений остаётся с пустыми колонками
+            suppliers = self.scope.filter_suppliers(Supplier.objects.all(), field=None).values('pk')
+            queryset = queryset.alias(visible_prices=FilteredRelation(
+                prices, condition=Q(**{f'{prices}__supplier_id__in': suppliers})))
+            prices = 'visible_prices'
+        lookups = self.item_columns + ('organization__name', f'{prices}__supplier_id',
+                                       f'{prices}__supplier__name') + tuple(
+            f'{prices}__{column}' for column in PRICE_COLUMNS[2:])
+        queryset = queryset.order_by('pk', f'{prices}__supplier_id', f'{prices}__date_added')
+        return queryset.values_list(*lookups).iterator(chunk_size=self.chunk_size)
+
+    def csv_lines(self):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.columns)
+        for row in self.rows():
+            yield writer.writerow([format_value(value, blank='') for value in row])
+
+    def ndjson_lines(self):
+        columns = self.columns
+        for row in self.rows():
+            record = dict(zip(columns, (format_value(value) for value in row)))
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+
+    def response(self, export_format, basename, asynchronous=False):
+        """
+        asynchronous — запрос пришёл через ASGI: синхронный итератор Django 4.2
+        под ASGI вычитывает целиком до отправки, поэтому строки отдаются
+        асинхронным итератором (aiterate). Под WSGI — обычный генератор.
+        """
+        content_type, extension = EXPORT_FORMATS[export_format]
+        lines = self.csv_lines() if export_format == 'csv' else self.ndjson_lines()
+        if asynchronous:
+            lines = aiterate(lines, self.chunk_size)
+        response = StreamingHttpResponse(lines, content_type=content_type)
+        filename = f"{basename}-{timezone.localdate().isoformat()}.{extension}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+async def aiterate(lines, chunk_size):
+    """
+    Асинхронный итератор поверх генератора строк: пачки по chunk_size строк
+    читаются в потоке запроса (thread_sensitive), где открыт курсор выборки.
+    """
+    take = sync_to_async(lambda: ''.join(islice(lines, chunk_size)), thread_sensitive=True)
+    while chunk := await take():
+        yield chunk
+
+
+def format_value(value, blank=None):
+    """
+    Decimal — строкой без потери точности, даты — в ISO 8601, пустые значения — blank.
+    """
+    if value is None:
+        return blank
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, (int, float, bool, str)):
+        return value
+    return str(value)
@@ -1,16 +1,47 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm
 from django.core.exceptions import ValidationError
+from django.urls import reverse
 from .models import (
     Organization, City, User, PurchaserProfile,
     Product, AlcoholProduct, Supplier, Price, 
     SupplierToken, PriceRequest
 )
+from .permissions import access_scope
 from django.utils.translation import gettext_lazy as _
+import codecs
 import uuid
 from django.utils.timezone import now
 from datetime import timedelta
 
+## Widgets ##
+
+class AutocompleteSelect(forms.Select):
+    """
+    select2 с подгрузкой вариантов из /api/autocomplete/ (kind — вид подсказок):
+    в HTML попадает только выбранное значение, а не весь справочник.
+    """
+    def __init__(self, kind, attrs=None):
+        super().__init__(attrs)
+        self.kind = kind
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs['class'] = f"{attrs.get('class', '')} select2".strip()
+        attrs['data-ajax--url'] = f"{reverse('autocomplete')}?kind={self.kind}"
+        attrs['data-minimum-input-length'] = 1
+        return attrs
+
+    def optgroups(self, name, value, attrs=None):
+        field = self.choices.field
+        selected = {str(v) for v in value if v not in field.empty_values}
+        options = []
+        if field.empty_label is not None:
+            options.append(self.create_option(name, '', field.empty_label, not selected, 0))
+        for obj in self.choices.queryset.filter(pk__in=selected):
+            options.append(self.create_option(name, obj.pk, field.label_from_instance(obj), True, len(options)))
+        return [(None, options, 0)]
+
 ## User Forms ##
 
 class UserRegistrationForm(UserCreationForm):
@@ -85,7 +116,7 @@ class ProductForm(forms.ModelForm):
         if user and not user.is_superuser:
             # Ограничиваем выбор организаций для не-админов
             if hasattr(user, 'purchaser_profile'):
-                self.fields['organization'].queryset = user.purchaser_profile.organizations.all()
+                self.fields['organization'].queryset = Organization.objects.filter(pk__in=access_scope(user).organization_ids)
 
 class AlcoholProductForm(forms.ModelForm):
     class Meta:
@@ -100,7 +131,7 @@ class AlcoholProductForm(forms.ModelForm):
 class SupplierForm(forms.ModelForm):
     class Meta:
         model = Supplier
-        fields = ('name', 'contact_info', 'inn', 'city', 'organization')
+        fields = ('name', 'contact_info', 'email', 'inn', 'city', 'organization')
         widgets = {
             'contact_info': forms.Textarea(attrs={'rows': 3}),
             'organization': forms.Select(attrs={'class': 'select2'}),
@@ -114,7 +145,7 @@ class SupplierForm(forms.ModelForm):
         if user and not user.is_superuser:
             # Ограничиваем выбор организаций для не-админов
             if hasattr(user, 'purchaser_profile'):
-                self.fields['organization'].queryset = user.purchaser_profile.organizations.all()
+                self.fields['organization'].queryset = Organization.objects.filter(pk__in=access_scope(user).organization_ids)
 
 class SupplierTokenForm(forms.ModelForm):
     regenerate = forms.BooleanField(
@@ -147,8 +178,8 @@ class PriceForm(forms.ModelForm):
         model = Price
         fields = ('product', 'supplier', 'price', 'manufacturer')
         widgets = {
-            'product': forms.Select(attrs={'class': 'select2'}),
-            'supplier': forms.Select(attrs={'class': 'select2'}),
+            'product': AutocompleteSelect('product'),
+            'supplier': AutocompleteSelect('supplier'),
             'price': forms.NumberInput(attrs={'step': '0.01'}),
         }
 
@@ -159,13 +190,16 @@ class PriceForm(forms.ModelForm):
         if user and not user.is_superuser:
             # Ограничиваем выбор продуктов и поставщиков для не-админов
             if hasattr(user, 'purchaser_profile'):
-                orgs = user.purchaser_profile.organizations.all()
+                orgs = access_scope(user).organization_ids
                 self.fields['product'].queryset = Product.objects.filter(organization__in=orgs)
                 self.fields['supplier'].queryset = Supplier.objects.filter(organization__in=orgs)
 
 class PriceBulkForm(forms.Form):
-    supplier = forms.ModelChoiceField(queryset=Supplier.objects.all(), label=_("Поставщик"))
+    supplier = forms.ModelChoiceField(queryset=Supplier.objects.all(), label=_("Поставщик"),
+                                      widget=AutocompleteSelect('supplier'))
     price_file = forms.FileField(label=_("Файл с ценами (CSV)"))
+    # Пусто — кодировка определяется по началу файла (UTF-8 или cp1251)
+    encoding = forms.CharField(label=_("Кодировка"), required=False)
 
     def __init__(self, *args, **kwargs):
         user = kwargs.pop('user', None)
@@ -173,9 +207,18 @@ class PriceBulkForm(forms.Form):
         
         if user and not user.is_superuser:
             if hasattr(user, 'purchaser_profile'):
-                orgs = user.purchaser_profile.organizations.all()
+                orgs = access_scope(user).organization_ids
                 self.fields['supplier'].queryset = Supplier.objects.filter(organization__in=orgs)
 
+    def clean_encoding(self):
+        encoding = self.cleaned_data['encoding'] or None
+        if encoding:
+            try:
+                codecs.lookup(encoding)
+            except LookupError:
+                raise ValidationError(_("Неизвестная кодировка"))
+        return encoding
+
 class PriceRequestForm(forms.ModelForm):
     """
     Форма для создания/редактирования запроса цены.
@@ -186,6 +229,9 @@ class PriceRequestForm(forms.ModelForm):
         # Исключаем поля, которые устанавливаются автоматически или требуют специальной логики
         exclude = ('purchaser', 'created_at', 'updated_at') 
         widgets = {
+            'supplier': AutocompleteSelect('supplier'),
+            'product': AutocompleteSelect('product'),
+            'alcohol': AutocompleteSelect('alcohol'),
             'message': forms.Textarea(attrs={'rows': 3, 'placeholder': 'Добавьте комментарий к запросу, если необходимо...'}),
             'status': forms.Select(), # Если нужно разрешить редактирование статуса вручную
         }
@@ -201,8 +247,7 @@ class PriceRequestForm(forms.ModelForm):
                 # Админ видит всех
                 pass 
             elif hasattr(self.user, 'purchaser_profile'):
-                profile = self.user.purchaser_profile
-                orgs = profile.organizations.all()
+                orgs = access_scope(self.user).organization_ids
                 
                 # Фильтруем поставщиков и товары по организациям пользователя
                 self.fields['supplier'].queryset = Supplier.objects.filter(organization__in=orgs)
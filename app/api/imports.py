@@ -0,0 +1,227 @@
+import codecs
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .bulk import insert_rows
+from .matching import confirmed_mappings
+from .models import Product, Price, PriceRow
+
+# Допустимые заголовки колонок CSV (первая строка файла)
+NAME_COLUMNS = ('name', 'product', 'наименование', 'продукт')
+PRICE_COLUMNS = ('price', 'цена')
+MANUFACTURER_COLUMNS = ('manufacturer', 'производитель')
+
+MAX_PRICE = Decimal('99999999.99')
+
+# Кодировка определяется по началу файла: UTF-8, иначе cp1251 (CSV из Excel
+# в русской локали). Явная кодировка (поле encoding формы импорта) проверку отключает
+ENCODING_PROBE = 64 * 1024
+FALLBACK_ENCODING = 'cp1251'
+
+
+class PriceImportReport:
+    """
+    Итог импорта: количество созданных цен и ошибки по номерам строк файла.
+    """
+    def __init__(self):
+        self.total = 0
+        self.created = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.errors.append({'row': line, 'error': message})
+
+    def as_dict(self):
+        return {
+            'total': self.total,
+            'created': self.created,
+            'failed': len(self.errors),
+            'errors': self.errors,
+        }
+
+
+class PriceImporter:
+    """
+    Потоковый импорт прайс-листа поставщика из CSV.
+
+    Файл читается построчно, строки проверяются пачками по batch_size:
+    названия продуктов разрешаются в id одним запросом на пачку,
+    цены пишутся через bulk_create, каждая пачка — в своей транзакции.
+    Если строка не читается в кодировке файла, импорт останавливается, а ошибка
+    попадает в отчёт вместе с числом уже записанных цен.
+    """
+    def __init__(self, supplier, batch_size=1000, encoding=None):
+        self.supplier = supplier
+        self.batch_size = batch_size
+        self.encoding = encoding
+        self.date_added = timezone.now()
+        self.report = PriceImportReport()
+        self.seen_products = set()
+
+    def run(self, uploaded_file, progress=None):
+        reader = self.reader(uploaded_file)
+        batch, line = [], 1
+        try:
+            for line, row in enumerate(reader, start=2):
+                self.report.total += 1
+                batch.append((line, row))
+                if len(batch) >= self.batch_size:
+                    self.process_batch(batch)
+                    batch = []
+                    if progress:
+                        progress(self.report)
+        except UnicodeDecodeError:
+            self.report.add_error(line + 1, f"Строка не в кодировке {self.encoding}: импорт остановлен")
+        if batch:
+            self.process_batch(batch)
+        return self.report
+
+    def reader(self, uploaded_file):
+        """
+        Оборачивает загруженный файл в текстовый поток без чтения целиком в память.
+        Разделитель (',', ';' или табуляция) определяется по строке заголовка.
+        """
+        if isinstance(uploaded_file, io.TextIOBase):
+            lines = iter(uploaded_file)
+        else:
+            # UploadedFile и бинарные файлы итерируются построчно (bytes)
+            self.encoding = self.encoding or detect_encoding(uploaded_file)
+            lines = codecs.iterdecode(uploaded_file, self.encoding)
+        try:
+            header = next(lines, '')
+        except UnicodeDecodeError:
+            raise ValueError(f"Файл не в кодировке {self.encoding}")
+        try:
+            dialect = csv.Sniffer().sniff(header, delimiters=',;\t')
+            delimiter = dialect.delimiter
+        except csv.Error:
+            delimiter = ','
+        fieldnames = [column.strip().lower() for column in next(csv.reader([header], delimiter=delimiter), [])]
+        self.name_column = self.find_column(fieldnames, NAME_COLUMNS)
+        self.price_column = self.find_column(fieldnames, PRICE_COLUMNS)
+        self.manufacturer_column = self.find_column(fieldnames, MANUFACTURER_COLUMNS, required=False)
+        return csv.DictReader(lines, fieldnames=fieldnames, delimiter=delimiter)
+
+    def find_column(self, fieldnames, candidates, required=True):
+        for candidate in candidates:
+            if candidate in fieldnames:
+                return candidate
+        if required:
+            raise ValueError(f"В файле нет колонки {' / '.join(candidates)}")
+        return None
+
+    def parse_price(self, value):
+        value = (value or '').strip().replace(' ', '').replace('\xa0', '').replace(',', '.')
+        if not value:
+            return None
+        try:
+            price = Decimal(value)
+        except InvalidOperation:
+            raise ValueError(f"Некорректная цена: {value}")
+        if price < 0:
+            raise ValueError("Цена не может быть отрицательной")
+        if price > MAX_PRICE:
+            raise ValueError("Цена слишком высока")
+        return price.quantize(Decimal('0.01'))
+
+    def resolve_products(self, names):
+        """
+        Возвращает {название: [id, ...]} для продуктов организации поставщика: точное
+        совпадение названия, иначе подтверждённое сопоставление (не более двух запросов).
+        """
+        products = {}
+        queryset = Product.objects.filter(
+            organization_id=self.supplier.organization_id, name__in=names
+        ).values_list('name', 'id')
+        for name, pk in queryset:
+            products.setdefault(name, []).append(pk)
+        # Названия, не совпавшие с каталогом, — по сопоставлениям, подтверждённым для поставщика
+        missing = [name for name in names if name not in products]
+        if missing:
+            for name, (pk, _) in confirmed_mappings(self.supplier, missing).items():
+                products[name] = [pk]
+        return products
+
+    def process_batch(self, batch):
+        parsed = []
+        for line, row in batch:
+            name = (row.get(self.name_column) or '').strip()
+            if not name:
+                self.report.add_error(line, "Не указано наименование продукта")
+                continue
+            try:
+                price = self.parse_price(row.get(self.price_column))
+            except ValueError as e:
+                self.report.add_error(line, str(e))
+                continue
+            manufacturer = (row.get(self.manufacturer_column) or '').strip() if self.manufacturer_column else ''
+            parsed.append((line, name, price, manufacturer[:255] or None))
+
+        products = self.resolve_products({name for _, name, _, _ in parsed})
+        prices, lines = [], []
+        for line, name, price, manufacturer in parsed:
+            ids = products.get(name)
+            if not ids:
+                self.report.add_error(line, f"Продукт «{name}» не найден")
+                continue
+            if len(ids) > 1:
+                self.report.add_error(line, f"Найдено несколько продуктов «{name}»")
+                continue
+            if ids[0] in self.seen_products:
+                self.report.add_error(line, f"Повторная строка для продукта «{name}»")
+                continue
+            self.seen_products.add(ids[0])
+            prices.append((ids[0], self.supplier.pk, price, manufacturer, self.date_added, self.date_added))
+            lines.append(line)
+
+        if not prices:
+            return
+        try:
+            with transaction.atomic():
+                self.write(prices)
+        except IntegrityError as e:
+            for line in lines:
+                self.report.add_error(line, f"Ошибка записи: {e}")
+            return
+        self.report.created += len(prices)
+
+    def write(self, prices):
+        """
+        Записывает пачку цен одним executemany, минуя создание экземпляров Price,
+        и передаёт записанные строки общим обработчикам записи цен.
+        """
+        insert_rows(Price, ('product', 'supplier', 'price', 'manufacturer', 'date_added', 'date_updated'), prices)
+        # executemany не возвращает id — читаем их по уникальному ключу (product, supplier, date_added)
+        ids = dict(Price.objects.filter(
+            supplier=self.supplier, date_added=self.date_added,
+            product_id__in=[product_id for product_id, *_ in prices],
+        ).values_list('product_id', 'id'))
+        Price.prices_written([
+            PriceRow(ids[product_id], product_id, supplier_id, price, manufacturer, date_added, date_updated)
+            for product_id, supplier_id, price, manufacturer, date_added, date_updated in prices
+        ])
+
+
+def detect_encoding(uploaded_file):
+    """
+    utf-8-sig, если начало файла — корректный UTF-8 (последний символ может быть
+    обрезан границей блока), иначе FALLBACK_ENCODING. Файл возвращается в начало.
+    """
+    head = uploaded_file.read(ENCODING_PROBE)
+    uploaded_file.seek(0)
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING
+    return 'utf-8-sig'
+
+
+def import_prices(supplier, uploaded_file, batch_size=1000, progress=None, encoding=None):
+    """
+    Импортирует прайс-лист поставщика и возвращает PriceImportReport.
+    """
+    return PriceImporter(supplier, batch_size=batch_size, encoding=encoding).run(uploaded_file, progress=progress)
@@ -0,0 +1,220 @@
+import logging
+import multiprocessing
+import os
+import socket
+import time
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+import django
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from .imports import import_prices
+from .matching import match_names
+from .notifications import DIGEST_TASK, send_digest
+from .models import (
+    Job, Supplier, Organization, CurrentPrice, CurrentPriceAlcohol,
+    PriceRollup, PriceAlcoholRollup
+)
+
+logger = logging.getLogger(__name__)
+
+# Зарегистрированные задачи: имя -> функция(job, **params)
+TASKS = {}
+
+
+def task(name):
+    """
+    Регистрирует функцию как фоновую задачу. Функция получает объект Job
+    (для set_progress) и параметры задачи; возвращаемое значение (JSON) сохраняется в result.
+    """
+    def decorator(func):
+        TASKS[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, params=None, user=None, max_attempts=3):
+    """
+    Ставит задачу в очередь и возвращает Job. Задача будет запущена
+    только после фиксации текущей транзакции.
+    """
+    if name not in TASKS:
+        raise ValueError(f"Неизвестная задача: {name}")
+    return Job.objects.create(
+        name=name, params=params or {},
+        created_by=user if user and user.is_authenticated else None,
+        max_attempts=max_attempts,
+    )
+
+
+def claim_next(worker):
+    """
+    Забирает следующую задачу из очереди. Захват — условный UPDATE по статусу,
+    поэтому несколько обработчиков не получат одну и ту же задачу.
+    """
+    candidates = Job.objects.filter(
+        status='queued', run_after__lte=timezone.now()
+    ).order_by('run_after', 'pk').values_list('pk', flat=True)[:10]
+    for pk in candidates:
+        claimed = Job.objects.filter(pk=pk, status='queued').update(
+            status='running', worker=worker, started_at=timezone.now(), updated_at=timezone.now(),
+        )
+        if claimed:
+            return pk
+    return None
+
+
+def retry_delay(attempts):
+    """
+    Экспоненциальная задержка перед повтором: 10 с, 20 с, 40 с ... но не больше часа.
+    """
+    return timedelta(seconds=min(10 * 2 ** (attempts - 1), 3600))
+
+
+def execute(job_id):
+    """
+    Выполняет захваченную задачу и фиксирует результат, повтор или ошибку.
+    """
+    close_old_connections()
+    try:
+        job = Job.objects.get(pk=job_id)
+        job.attempts += 1
+        func = TASKS.get(job.name)
+        try:
+            if func is None:
+                raise LookupError(f"Неизвестная задача: {job.name}")
+            result = func(job, **job.params)
+        except Exception:
+            job.error = traceback.format_exc()
+            logger.exception("Задача %s #%s завершилась ошибкой", job.name, job.pk)
+            if func is not None and job.attempts < job.max_attempts:
+                job.status = 'queued'
+                job.run_after = timezone.now() + retry_delay(job.attempts)
+            else:
+                job.status = 'failed'
+                job.finished_at = timezone.now()
+        else:
+            job.status = 'done'
+            job.result = result
+            job.error = ''
+            job.finished_at = timezone.now()
+        job.save(update_fields=['attempts', 'status', 'result', 'error', 'run_after', 'finished_at', 'updated_at'])
+        return job.status
+    finally:
+        connections.close_all()
+
+
+def requeue_stale(stale_after):
+    """
+    Возвращает в очередь задачи, «зависшие» в статусе running (обработчик остановлен).
+    """
+    return Job.objects.filter(
+        status='running', updated_at__lt=timezone.now() - stale_after
+    ).update(status='queued', worker='', run_after=timezone.now())
+
+
+class Worker:
+    """
+    Обработчик очереди: забирает задачи из таблицы Job и выполняет их
+    в пуле потоков или процессов.
+    """
+    def __init__(self, workers=4, mode='thread', poll_interval=1.0, stale_after=timedelta(hours=1)):
+        self.workers = workers
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.name = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+    def executor(self):
+        if self.mode == 'process':
+            # spawn: дочерние процессы не наследуют соединения с БД родителя;
+            # django.setup должен выполниться до импорта моделей в процессе
+            return ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup,
+            )
+        return ThreadPoolExecutor(self.workers, thread_name_prefix='job')
+
+    def run(self, once=False):
+        """
+        Основной цикл. once=True — выполнить всё, что есть в очереди, и выйти.
+        """
+        requeue_stale(self.stale_after)
+        running = set()
+        with self.executor() as pool:
+            while True:
+                while len(running) < self.workers:
+                    job_id = claim_next(self.name)
+                    if job_id is None:
+                        break
+                    running.add(pool.submit(execute, job_id))
+                if not running:
+                    if once:
+                        break
+                    time.sleep(self.poll_interval)
+                    continue
+                done, running = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception():
+                        logger.error("Сбой обработчика задач: %s", future.exception())
+
+
+## Задачи ##
+
+@task('prices.import')
+def import_prices_task(job, supplier_id, path, batch_size=1000, encoding=None):
+    """
+    Импорт прайс-листа, загруженного через /api/prices/import/?async=1.
+    """
+    supplier = Supplier.objects.get(pk=supplier_id)
+    with default_storage.open(path, 'rb') as price_file:
+        report = import_prices(
+            supplier, price_file, batch_size=batch_size, encoding=encoding,
+            progress=lambda report: job.set_progress(report.total),
+        )
+    job.set_progress(report.total, report.total)
+    default_storage.delete(path)
+    return report.as_dict()
+
+
+@task('suppliers.match')
+def match_names_task(job, supplier_id, names, kind='product', limit=3):
+    """
+    Сопоставление большого прайс-листа через /api/suppliers/<id>/match/?async=1.
+    """
+    supplier = Supplier.objects.get(pk=supplier_id)
+    return {'results': match_names(supplier, names, kind, limit)}
+
+
+@task(DIGEST_TASK)
+def send_digest_task(job, supplier_id):
+    """
+    Сводное письмо поставщику о запросах цен (планируется notifications.schedule_digests).
+    """
+    return send_digest(supplier_id)
+
+
+@task('prices.rebuild_current')
+def rebuild_current_prices_task(job):
+    with transaction.atomic():
+        products = CurrentPrice.objects.rebuild()
+        alcohol = CurrentPriceAlcohol.objects.rebuild()
+    return {'products': products, 'alcohol': alcohol}
+
+
+@task('prices.rebuild_rollups')
+def rebuild_price_rollups_task(job):
+    with transaction.atomic():
+        products = PriceRollup.objects.rebuild()
+        alcohol = PriceAlcoholRollup.objects.rebuild()
+    return {'products': products, 'alcohol': alcohol}
+
+
+@task('organizations.delete')
+def delete_organization_task(job, organization_id):
+    deleted, per_model = Organization.objects.filter(pk=organization_id).delete()
+    return {'deleted': deleted, 'per_model': per_model}
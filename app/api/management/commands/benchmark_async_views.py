@@ -0,0 +1,146 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from api.models import Organization, City, User, PurchaserProfile, Product, Supplier, Price
+
+PATHS = ('products/', 'products/with-prices/', 'products/{product}/prices/?cursor=', 'price-requests/?cursor=')
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает списки API под WSGI (пул потоков, синхронные view) и ASGI "
+            "(/api/async/...): запросов в секунду и задержки p50/p99 при заданном числе "
+            "одновременных клиентов. Кэш ответов отключён, чтобы каждый запрос читал БД. "
+            "Тестовые данные записываются в БД (их читают другие потоки) и затем удаляются")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=200, help="Количество продуктов")
+        parser.add_argument('--suppliers', type=int, default=5, help="Цен на продукт (поставщиков)")
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16, 64],
+                            help="Одновременных клиентов (несколько значений — несколько замеров)")
+        parser.add_argument('--requests', type=int, default=400, help="Запросов на замер")
+        parser.add_argument('--threads', type=int, default=8, help="Потоков WSGI-сервера")
+
+    def handle(self, *args, **options):
+        organization, city, user = self.create_data(options['products'], options['suppliers'])
+        token = Token.objects.create(user=user)
+        product = Product.objects.filter(organization=organization).values_list('pk', flat=True).first()
+        paths = [path.format(product=product) for path in PATHS]
+        try:
+            with override_settings(
+                DEBUG=False, ALLOWED_HOSTS=['testserver'],
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+            ):
+                self.stdout.write(
+                    f"{'сервер':<7}{'клиентов':>9}{'запр/с':>9}{'p50, мс':>9}{'p99, мс':>9}{'max, мс':>9}{'ошибок':>8}")
+                for concurrency in options['concurrency']:
+                    for name, run in (('wsgi', self.run_wsgi), ('asgi', self.run_asgi)):
+                        elapsed, timings, errors = asyncio.run(
+                            run(paths, token.key, concurrency, options['requests'], options['threads']))
+                        self.report(name, concurrency, elapsed, timings, errors)
+        finally:
+            user.delete()
+            organization.delete()
+            city.delete()
+
+    def create_data(self, products, suppliers):
+        organization = Organization.objects.create(name="Бенчмарк")
+        city = City.objects.create(name="Бенчмарк")
+        user = User.objects.create_user(username=f'benchmark-{time.time_ns()}', role='purchaser')
+        profile = PurchaserProfile.objects.create(user=user)
+        profile.organizations.add(organization)
+        profile.cities.add(city)
+        supplier_objects = Supplier.objects.bulk_create(
+            Supplier(name=f"Поставщик {i}", contact_info="-", inn="0000000000", organization=organization, city=city)
+            for i in range(suppliers)
+        )
+        Product.objects.bulk_create(
+            Product(name=f"Продукт {i}", unit="кг", quantity=i % 100, organization=organization)
+            for i in range(products)
+        )
+        now = timezone.now()
+        Price.objects.bulk_create(
+            Price(product_id=pk, supplier=supplier, price=Decimal(i % 1000) / 7 + j, date_added=now)
+            for i, pk in enumerate(Product.objects.filter(organization=organization).values_list('pk', flat=True))
+            for j, supplier in enumerate(supplier_objects)
+        )
+        return organization, city, user
+
+    async def clients(self, request, paths, concurrency, total):
+        """
+        concurrency клиентов отправляют запросы по очереди (следующий — после ответа),
+        всего total. Задержка запроса включает ожидание свободного потока сервера.
+        """
+        timings, errors = [], 0
+        counter = iter(range(total))
+
+        async def client():
+            nonlocal errors
+            for number in counter:
+                started = time.perf_counter()
+                status = await request(paths[number % len(paths)])
+                timings.append(time.perf_counter() - started)
+                errors += status != 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return time.perf_counter() - started, timings, errors
+
+    async def run_wsgi(self, paths, key, concurrency, total, threads):
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        loop = asyncio.get_running_loop()
+
+        def call(path):
+            environ = factory.get(f'/api/{path}', HTTP_AUTHORIZATION=f'Token {key}').environ
+            statuses = []
+            response = handler(environ, lambda status, headers: statuses.append(status))
+            b''.join(response)
+            response.close()
+            return int(statuses[0].split()[0])
+
+        with ThreadPoolExecutor(threads) as pool:
+            return await self.clients(lambda path: loop.run_in_executor(pool, call, path), paths, concurrency, total)
+
+    async def run_asgi(self, paths, key, concurrency, total, threads):
+        handler = ASGIHandler()
+
+        async def call(path):
+            path, _, query = f'/api/async/{path}'.partition('?')
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+                'headers': [(b'host', b'testserver'), (b'authorization', f'Token {key}'.encode())],
+                'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+            }
+            messages = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                messages.append(message)
+
+            await handler(scope, receive, send)
+            return messages[0]['status']
+
+        return await self.clients(call, paths, concurrency, total)
+
+    def report(self, name, concurrency, elapsed, timings, errors):
+        timings = sorted(timings)
+
+        def percentile(share):
+            return timings[min(int(len(timings) * share), len(timings) - 1)] * 1000
+
+        self.stdout.write(
+            f"{name:<7}{concurrency:>9}{len(timings) / elapsed:>9.0f}{percentile(0.5):>9.1f}"
+            f"{percentile(0.99):>9.1f}{timings[-1] * 1000:>9.1f}{errors:>8}"
+        )
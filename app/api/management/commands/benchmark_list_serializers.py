@@ -0,0 +1,90 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from api.models import Organization, City, User, Product, Supplier, Price, PriceRequest
+from api.readers import ValuesReader
+from api.serializers import ProductSerializer, PriceSerializer, PriceRequestSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает скорость сериализации списков: ModelSerializer и чтение через values() "
+            "(ValuesReader). Тестовые данные создаются в транзакции и откатываются")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help="Количество строк в каждом замере")
+
+    def handle(self, *args, **options):
+        request = APIRequestFactory().get('/')
+        request.query_params = request.GET
+        self.stdout.write(f"{'список':<16}{'строк':>8}{'serializer, с':>16}{'values(), с':>14}{'ускорение':>11}")
+        for rows in options['rows']:
+            try:
+                with transaction.atomic():
+                    self.fill(rows)
+                    for name, queryset, serializer_class in self.cases():
+                        self.measure(name, rows, queryset, serializer_class, request)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def fill(self, rows):
+        organization = Organization.objects.create(name="Бенчмарк")
+        city = City.objects.create(name="Бенчмарк")
+        supplier = Supplier.objects.create(name="Бенчмарк", contact_info="-", inn="0000000000",
+                                           organization=organization, city=city)
+        purchaser = User.objects.create(username=f"benchmark-{time.monotonic_ns()}", first_name="Иван",
+                                        last_name="Петров", role='purchaser')
+        Product.objects.bulk_create(
+            Product(name=f"Продукт {i}", unit="кг", quantity=i % 100, organization=organization)
+            for i in range(rows)
+        )
+        products = list(Product.objects.filter(organization=organization).values_list('pk', flat=True))
+        now = timezone.now()
+        Price.objects.bulk_create(
+            Price(product_id=pk, supplier=supplier, price=Decimal(i % 1000) / 7, manufacturer="ООО Завод", date_added=now)
+            for i, pk in enumerate(products)
+        )
+        PriceRequest.objects.bulk_create(
+            PriceRequest(purchaser=purchaser, supplier=supplier, product_id=pk, message="Прошу цену")
+            for pk in products
+        )
+        self.organization = organization
+
+    def cases(self):
+        organization = self.organization
+        return [
+            ('products', Product.objects.filter(organization=organization).order_by('pk'), ProductSerializer),
+            ('prices', Price.objects.filter(supplier__organization=organization).order_by('pk'), PriceSerializer),
+            ('price-requests', PriceRequest.objects.filter(supplier__organization=organization).order_by('pk'),
+             PriceRequestSerializer),
+        ]
+
+    def measure(self, name, rows, queryset, serializer_class, request):
+        context = {'request': request}
+        reader = ValuesReader.for_serializer(serializer_class(context=context))
+
+        started = time.perf_counter()
+        data = serializer_class(
+            queryset.select_related(*serializer_class(context=context).related_lookups()), many=True, context=context,
+        ).data
+        serializer_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        fast = reader.represent(reader.values(queryset))
+        values_time = time.perf_counter() - started
+
+        if [dict(row) for row in data] != fast:
+            self.stderr.write(f"{name}: ответы различаются")
+        self.stdout.write(
+            f"{name:<16}{rows:>8}{serializer_time:>16.3f}{values_time:>14.3f}{serializer_time / values_time:>10.1f}x"
+        )
@@ -0,0 +1,63 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.matching import matchers
+from api.models import Organization, Product
+
+LETTERS = 'абвгдежзиклмнопрстуфхцчшщыэюя'
+UNITS = ('1кг', '0,5л', '1л', '400г', '250 г', '10 шт', '')
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ("Замеряет сопоставление прайс-листа с каталогом: построение индекса n-грамм "
+            "и поиск кандидатов для названий с опечатками. Тестовые данные откатываются")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--catalogue', type=int, default=50000, help="Товаров в каталоге")
+        parser.add_argument('--lines', type=int, default=10000, help="Строк в прайс-листе")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        words = [''.join(rng.choice(LETTERS) for _ in range(rng.randint(3, 10))) for _ in range(5000)]
+        try:
+            with transaction.atomic():
+                organization = Organization.objects.create(name="Бенчмарк")
+                Product.objects.bulk_create(
+                    Product(name=f"{' '.join(rng.sample(words, rng.randint(2, 4)))} {rng.choice(UNITS)}".strip(),
+                            unit="шт", organization=organization)
+                    for _ in range(options['catalogue'])
+                )
+                started = time.perf_counter()
+                matcher = matchers.get(Product, organization.pk)
+                build_time = time.perf_counter() - started
+                items = list(zip(matcher.ids.tolist(), matcher.names))
+                raise Rollback
+        except Rollback:
+            pass
+
+        lines = [rng.choice(items) for _ in range(options['lines'])]
+        names = [self.misspell(name, rng) for _, name in lines]
+        started = time.perf_counter()
+        found = matcher.match(names)
+        match_time = time.perf_counter() - started
+        correct = sum(1 for (pk, _), name in zip(lines, names) if found[name] and found[name][0][0] == pk)
+        self.stdout.write(
+            f"каталог {len(items)}, строк {len(names)}: индекс {build_time:.2f} с, "
+            f"сопоставление {match_time:.2f} с, верный первый кандидат {correct / len(names):.1%}"
+        )
+
+    def misspell(self, name, rng):
+        # Опечатка, другой регистр и порядок слов, как в прайс-листах поставщиков
+        chars = list(name)
+        chars[rng.randrange(len(chars))] = rng.choice(LETTERS)
+        words = ''.join(chars).split()
+        rng.shuffle(words)
+        return ' '.join(words).upper()
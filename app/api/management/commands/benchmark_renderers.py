@@ -0,0 +1,92 @@
+import gzip
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.models import Organization, City, Product, Supplier, Price
+from api.readers import ValuesReader
+from api.renderers import FastJSONRenderer, MessagePackRenderer
+from api.serializers import ProductWithPricesSerializer, PriceSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает рендеринг ответов with-prices и списка цен: время и размер "
+            "для JSON (DRF), JSON (orjson) и MessagePack, без сжатия и с gzip. "
+            "Тестовые данные создаются в транзакции и откатываются")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=5000, help="Количество продуктов")
+        parser.add_argument('--suppliers', type=int, default=5, help="Цен на продукт (поставщиков)")
+        parser.add_argument('--repeat', type=int, default=3, help="Повторов замера (берётся лучший)")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                payloads = self.payloads(options['products'], options['suppliers'])
+                raise Rollback(payloads)
+        except Rollback as rollback:
+            payloads = rollback.args[0]
+
+        renderers = [
+            ('json (drf)', JSONRenderer()),
+            ('json (orjson)', FastJSONRenderer()),
+            ('msgpack', MessagePackRenderer()),
+        ]
+        self.stdout.write(f"{'ответ':<14}{'формат':<15}{'рендер, с':>11}{'байт':>12}{'gzip, байт':>12}{'gzip, с':>9}")
+        for name, data in payloads:
+            for format_name, renderer in renderers:
+                render_time, content = self.best(lambda: renderer.render(data), options['repeat'])
+                gzip_time, compressed = self.best(lambda: gzip.compress(content, compresslevel=6), options['repeat'])
+                self.stdout.write(
+                    f"{name:<14}{format_name:<15}{render_time:>11.3f}{len(content):>12}{len(compressed):>12}{gzip_time:>9.3f}"
+                )
+
+    def best(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - started)
+        return min(timings), result
+
+    def payloads(self, products, suppliers):
+        organization = Organization.objects.create(name="Бенчмарк")
+        city = City.objects.create(name="Бенчмарк")
+        supplier_objects = [
+            Supplier.objects.create(name=f"Поставщик {i}", contact_info="-", inn="0000000000",
+                                    organization=organization, city=city)
+            for i in range(suppliers)
+        ]
+        Product.objects.bulk_create(
+            Product(name=f"Продукт {i}", unit="кг", quantity=i % 100, organization=organization)
+            for i in range(products)
+        )
+        product_ids = list(Product.objects.filter(organization=organization).values_list('pk', flat=True))
+        now = timezone.now()
+        Price.objects.bulk_create(
+            Price(product_id=pk, supplier=supplier, price=Decimal(i % 1000) / 7 + j,
+                  manufacturer="ООО Завод", date_added=now)
+            for i, pk in enumerate(product_ids) for j, supplier in enumerate(supplier_objects)
+        )
+
+        request = Request(APIRequestFactory().get('/'))
+        context = {'request': request}
+        with_prices = ProductWithPricesSerializer(
+            Product.objects.filter(organization=organization).select_related('organization').prefetch_related(
+                Prefetch('price_set', queryset=Price.objects.select_related('supplier'))),
+            many=True, context=context,
+        ).data
+        reader = ValuesReader.for_serializer(PriceSerializer(context=context))
+        prices = reader.represent(reader.values(Price.objects.filter(supplier__organization=organization)))
+        return [('with-prices', with_prices), ('prices', prices)]
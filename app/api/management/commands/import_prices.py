@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.imports import import_prices
+from api.models import Supplier
+
+
+class Command(BaseCommand):
+    help = "Импортирует прайс-лист поставщика из CSV-файла"
+
+    def add_arguments(self, parser):
+        parser.add_argument('supplier_id', type=int, help="ID поставщика")
+        parser.add_argument('path', help="Путь к CSV-файлу")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Количество строк в одной транзакции")
+
+    def handle(self, *args, **options):
+        try:
+            supplier = Supplier.objects.get(pk=options['supplier_id'])
+        except Supplier.DoesNotExist:
+            raise CommandError("Поставщик не найден")
+
+        with open(options['path'], 'rb') as price_file:
+            try:
+                report = import_prices(supplier, price_file, batch_size=options['batch_size'])
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        for error in report.errors:
+            self.stderr.write(f"Строка {error['row']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Обработано строк: {report.total}, создано цен: {report.created}, ошибок: {len(report.errors)}"
+        ))
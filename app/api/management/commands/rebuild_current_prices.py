@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.models import CurrentPrice, CurrentPriceAlcohol
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает таблицы актуальных предложений из истории цен"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Размер пачки при чтении истории и вставке")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        products = CurrentPrice.objects.rebuild(batch_size=batch_size)
+        alcohol = CurrentPriceAlcohol.objects.rebuild(batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f"Актуальных предложений: продукты — {products}, алкоголь — {alcohol}"
+        ))
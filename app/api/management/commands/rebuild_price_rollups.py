@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.models import PriceRollup, PriceAlcoholRollup
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает агрегаты динамики цен (день/неделя/месяц) из истории цен"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Размер пачки при вставке агрегатов")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        products = PriceRollup.objects.rebuild(batch_size=batch_size)
+        alcohol = PriceAlcoholRollup.objects.rebuild(batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f"Агрегатов: продукты — {products}, алкоголь — {alcohol}"
+        ))
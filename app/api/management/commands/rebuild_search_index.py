@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api import search
+
+
+class Command(BaseCommand):
+    help = "Переиндексирует полнотекстовый поиск (продукты, алкоголь, поставщики, производители в ценах)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('kinds', nargs='*',
+                            help=f"Виды документов: {', '.join(search.DOCUMENTS)} (по умолчанию все)")
+
+    def handle(self, *args, **options):
+        if search.get_backend() is None:
+            raise CommandError("Для этой СУБД полнотекстовый поиск не поддерживается")
+        unknown = set(options['kinds']) - set(search.DOCUMENTS)
+        if unknown:
+            raise CommandError(f"Неизвестные виды документов: {', '.join(sorted(unknown))}")
+        with transaction.atomic():
+            counts = search.rebuild(options['kinds'])
+        self.stdout.write(self.style.SUCCESS(
+            ", ".join(f"{kind} — {count}" for kind, count in counts.items())
+        ))
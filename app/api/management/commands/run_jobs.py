@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from api.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = "Запускает обработчик фоновых задач (таблица Job)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4,
+                            help="Количество одновременно выполняемых задач")
+        parser.add_argument('--mode', choices=['thread', 'process'], default='thread',
+                            help="Пул потоков или процессов")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Период опроса очереди, секунд")
+        parser.add_argument('--stale-after', type=int, default=3600,
+                            help="Через сколько секунд без обновлений задача running считается зависшей")
+        parser.add_argument('--once', action='store_true',
+                            help="Выполнить задачи, стоящие в очереди, и завершиться")
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            workers=options['workers'],
+            mode=options['mode'],
+            poll_interval=options['poll_interval'],
+            stale_after=timedelta(seconds=options['stale_after']),
+        )
+        self.stdout.write(f"Обработчик {worker.name}: {options['workers']} ({options['mode']})")
+        try:
+            worker.run(once=options['once'])
+        except KeyboardInterrupt:
+            self.stdout.write("Остановлен")
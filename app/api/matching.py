@@ -0,0 +1,228 @@
+import threading
+from math import log
+
+import numpy as np
+from django.db.models import Count, Max
+
+from .models import AlcoholProduct, Product, SupplierItemMapping
+from .stemmer import tokenize
+
+NGRAM = 3
+LIMIT = 3
+MIN_SCORE = 0.3
+# n-грамма считается частой, если встречается больше чем у COMMON_SHARE каталога
+COMMON_SHARE = 0.01
+COMMON_MIN = 100
+# Сколько кандидатов по редким n-граммам оценивается полностью
+CANDIDATES = 200
+
+
+def normalize(name):
+    return ' '.join(tokenize(name))
+
+
+def ngrams(name):
+    """
+    Символьные n-граммы нормализованного названия с пробелами по краям
+    («Молоко 3,2%» -> « мо», «мол», ... «3 2», «2 »): порядок слов, регистр,
+    «ё» и знаки препинания на сходство не влияют.
+    """
+    text = f' {normalize(name)} '
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class CatalogueMatcher:
+    """
+    Предвычисленный индекс каталога организации: n-граммы названий с весами idf
+    в виде обратного индекса на массивах numpy (для каждой n-граммы — номера
+    товаров). Сходство — косинус по взвешенным множествам n-грамм, от 0 до 1.
+    """
+    def __init__(self, items):
+        # items: [(id, название)]
+        self.ids = np.array([pk for pk, _ in items], dtype=np.int64)
+        self.names = [name for _, name in items]
+        self.vocabulary = {}
+        item_index, gram_index = [], []
+        for position, name in enumerate(self.names):
+            for gram in ngrams(name):
+                item_index.append(position)
+                gram_index.append(self.vocabulary.setdefault(gram, len(self.vocabulary)))
+        item_index = np.array(item_index, dtype=np.int64)
+        gram_index = np.array(gram_index, dtype=np.int64)
+
+        size = len(self.names)
+        frequency = np.bincount(gram_index, minlength=len(self.vocabulary))
+        self.idf = np.log((size + 1) / (frequency + 1)) + 1
+        self.unknown_idf = log(size + 1) + 1
+        weights = self.idf ** 2
+        self.norms = np.sqrt(np.bincount(item_index, weights=weights[gram_index], minlength=size))
+        self.norms[self.norms == 0] = 1
+
+        # Списки товаров по n-граммам подряд (CSR): товары n-граммы g — postings[offsets[g]:offsets[g + 1]],
+        # вес каждого вхождения (idf²) — в posting_weights
+        order = np.argsort(gram_index, kind='stable')
+        self.postings = item_index[order].astype(np.int32)
+        self.posting_weights = weights[gram_index[order]].astype(np.float32)
+        self.offsets = np.concatenate(([0], np.cumsum(frequency)))
+        self.weights = weights
+
+    def __len__(self):
+        return len(self.names)
+
+    def query(self, name):
+        """
+        Номера n-грамм названия в словаре каталога и норма его вектора.
+        """
+        known, query_norm = [], 0.0
+        for gram in ngrams(name):
+            index = self.vocabulary.get(gram)
+            if index is None:
+                query_norm += self.unknown_idf ** 2
+            else:
+                known.append(index)
+                query_norm += self.weights[index]
+        return known, np.sqrt(query_norm) or 1.0
+
+    def candidates(self, name):
+        """
+        Товары, у которых есть общие редкие n-граммы с названием, и их сходство с ним.
+
+        Кандидаты берутся из списков редких n-грамм; частые («кг », « 1л») есть у
+        значительной части каталога и только добавляют вклад лучшим CANDIDATES
+        кандидатам: списки отсортированы по номеру товара, принадлежность ищется
+        через searchsorted.
+        """
+        known, query_norm = self.query(name)
+        if not known:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        known = np.array(known, dtype=np.int64)
+        starts, ends = self.offsets[known], self.offsets[known + 1]
+        common = ends - starts > max(COMMON_MIN, len(self.names) * COMMON_SHARE)
+        if common.all():
+            common[:] = False
+        rare = ~common
+        items = np.concatenate([self.postings[start:end] for start, end in zip(starts[rare], ends[rare])])
+        weights = np.concatenate([self.posting_weights[start:end] for start, end in zip(starts[rare], ends[rare])])
+        candidates, positions = np.unique(items, return_inverse=True)
+        scores = np.bincount(positions, weights=weights)
+        if len(candidates) > CANDIDATES:
+            # Вклад частых n-грамм мал: досчитываем его только лучшим по редким
+            best = np.argpartition(-scores, CANDIDATES)[:CANDIDATES]
+            candidates, scores = candidates[best], scores[best]
+        for gram, start, end in zip(known[common], starts[common], ends[common]):
+            postings = self.postings[start:end]
+            found = np.minimum(np.searchsorted(postings, candidates), len(postings) - 1)
+            scores += self.weights[gram] * (postings[found] == candidates)
+        return candidates, scores / (self.norms[candidates] * query_norm)
+
+    def match(self, names, limit=LIMIT, min_score=MIN_SCORE):
+        """
+        {название: [(id, название в каталоге, уверенность), ...]} — до limit лучших
+        кандидатов с уверенностью не ниже min_score, по убыванию. Повторяющиеся
+        названия пачки оцениваются один раз.
+        """
+        result = {}
+        for name in dict.fromkeys(names):
+            candidates, scores = self.candidates(name)
+            if len(scores) > limit:
+                top = np.argpartition(-scores, limit)[:limit]
+            else:
+                top = np.arange(len(scores))
+            top = top[np.argsort(-scores[top], kind='stable')]
+            result[name] = [
+                (int(self.ids[candidates[i]]), self.names[candidates[i]], round(float(scores[i]), 3))
+                for i in top if scores[i] >= min_score
+            ]
+        return result
+
+
+class MatcherCache:
+    """
+    Индексы каталогов в памяти процесса по (модель, организация). Индекс строится
+    заново, если изменились число товаров, последний id или время последнего
+    изменения (одна агрегирующая проверка на пачку названий).
+    """
+    def __init__(self):
+        self.matchers = {}
+        self.lock = threading.Lock()
+
+    def get(self, model, organization_id):
+        catalogue = model.objects.filter(organization_id=organization_id)
+        stamp = tuple(catalogue.aggregate(count=Count('pk'), last_id=Max('pk'), updated=Max('last_updated')).values())
+        key = (model._meta.label, organization_id)
+        with self.lock:
+            cached = self.matchers.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        matcher = CatalogueMatcher(list(catalogue.values_list('pk', 'name')))
+        with self.lock:
+            self.matchers[key] = (stamp, matcher)
+        return matcher
+
+
+matchers = MatcherCache()
+
+
+CATALOGUES = {'product': Product, 'alcohol': AlcoholProduct}
+
+
+def confirmed_mappings(supplier, names, kind='product'):
+    """
+    {исходное название: (id, название в каталоге)} для подтверждённых сопоставлений.
+    """
+    keys = {}
+    for name in names:
+        keys.setdefault(normalize(name)[:255], []).append(name)
+    mappings = SupplierItemMapping.objects.filter(
+        supplier=supplier, name__in=keys, **{f'{kind}__isnull': False},
+    ).values_list('name', kind, f'{kind}__name')
+    return {name: (item_id, item_name) for key, item_id, item_name in mappings for name in keys[key]}
+
+
+def match_names(supplier, names, kind='product', limit=LIMIT, min_score=MIN_SCORE):
+    """
+    Кандидаты из каталога организации поставщика для названий из прайс-листа:
+    [{name, confirmed, candidates: [{id, name, score}]}] в порядке названий.
+    Подтверждённое ранее сопоставление возвращается единственным кандидатом с score 1.
+    """
+    names = list(dict.fromkeys(names))
+    confirmed = confirmed_mappings(supplier, names, kind)
+    unmatched = [name for name in names if name not in confirmed]
+    found = {}
+    if unmatched:
+        found = matchers.get(CATALOGUES[kind], supplier.organization_id).match(unmatched, limit, min_score)
+    result = []
+    for name in names:
+        if name in confirmed:
+            item_id, item_name = confirmed[name]
+            candidates = [{'id': item_id, 'name': item_name, 'score': 1.0}]
+        else:
+            candidates = [{'id': pk, 'name': item_name, 'score': score} for pk, item_name, score in found[name]]
+        result.append({'name': name, 'confirmed': name in confirmed, 'candidates': candidates})
+    return result
+
+
+def confirm_mappings(supplier, pairs, kind='product', user=None):
+    """
+    Запоминает сопоставления [(название у поставщика, id товара)]; товары должны
+    принадлежать организации поставщика. Возвращает число сохранённых записей.
+    """
+    item_ids = {item_id for _, item_id in pairs}
+    allowed = set(CATALOGUES[kind].objects.filter(
+        pk__in=item_ids, organization_id=supplier.organization_id,
+    ).values_list('pk', flat=True))
+    if item_ids - allowed:
+        raise ValueError(f"Товары не найдены в каталоге организации: {sorted(item_ids - allowed)}")
+    other = 'alcohol' if kind == 'product' else 'product'
+    mappings = {
+        normalize(name)[:255]: SupplierItemMapping(
+            supplier=supplier, name=normalize(name)[:255], confirmed_by=user,
+            **{f'{kind}_id': item_id, f'{other}_id': None},
+        )
+        for name, item_id in pairs
+    }
+    SupplierItemMapping.objects.bulk_create(
+        mappings.values(), update_conflicts=True, unique_fields=['supplier', 'name'],
+        update_fields=[kind, other, 'confirmed_by', 'confirmed_at'],
+    )
+    return len(mappings)
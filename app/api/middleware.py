@@ -0,0 +1,14 @@
+from django.middleware.gzip import GZipMiddleware
+
+
+class NonStreamingGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware только для обычных ответов. Потоковые (выгрузка каталога,
+    поток событий /api/events/) отдаются без сжатия: под ASGI каждая часть
+    text/event-stream стала бы отдельным членом gzip, а сжатие синхронного
+    потока копит данные в буфере и задерживает их отправку.
+    """
+    def process_response(self, request, response):
+        if response.streaming:
+            return response
+        return super().process_response(request, response)
@@ -0,0 +1,50 @@
+# Generated by Django 4.2 on 2026-10-17 00:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_alter_suppliertoken_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CurrentPriceAlcohol',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Предложенная цена')),
+                ('manufacturer', models.CharField(blank=True, max_length=255, null=True, verbose_name='Единица измерения')),
+                ('date_added', models.DateTimeField(verbose_name='Дата добавления')),
+                ('date_updated', models.DateTimeField(verbose_name='Дата обновления')),
+                ('alcohol', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='current_prices', to='api.alcoholproduct', verbose_name='Алкоголь')),
+                ('source', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='current_offer', to='api.pricealcohol', verbose_name='Запись истории')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.supplier', verbose_name='Поставщик')),
+            ],
+            options={
+                'verbose_name': 'Актуальное предложение по алкоголю',
+                'verbose_name_plural': 'Актуальные предложения по алкоголю',
+                'unique_together': {('alcohol', 'supplier')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CurrentPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Предложенная цена')),
+                ('manufacturer', models.CharField(blank=True, max_length=255, null=True, verbose_name='Единица измерения')),
+                ('date_added', models.DateTimeField(verbose_name='Дата добавления')),
+                ('date_updated', models.DateTimeField(verbose_name='Дата обновления')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='current_prices', to='api.product', verbose_name='Продукт')),
+                ('source', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='current_offer', to='api.price', verbose_name='Запись истории')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.supplier', verbose_name='Поставщик')),
+            ],
+            options={
+                'verbose_name': 'Актуальное предложение по продукту',
+                'verbose_name_plural': 'Актуальные предложения по продуктам',
+                'unique_together': {('product', 'supplier')},
+            },
+        ),
+    ]
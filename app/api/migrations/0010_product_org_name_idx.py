@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-17 00:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_currentprice_currentpricealcohol'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['organization', 'name'], name='product_org_name_idx'),
+        ),
+    ]
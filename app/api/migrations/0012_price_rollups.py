@@ -0,0 +1,66 @@
+# Generated by Django 4.2 on 2026-10-17 00:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'День'), ('week', 'Неделя'), ('month', 'Месяц')], max_length=10, verbose_name='Период')),
+                ('period_start', models.DateField(verbose_name='Начало периода')),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Минимальная цена')),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Максимальная цена')),
+                ('sum_price', models.DecimalField(decimal_places=2, max_digits=18, verbose_name='Сумма цен')),
+                ('count', models.PositiveIntegerField(verbose_name='Количество предложений')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_rollups', to='api.product', verbose_name='Продукт')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.supplier', verbose_name='Поставщик')),
+            ],
+            options={
+                'verbose_name': 'Динамика цен по продукту',
+                'verbose_name_plural': 'Динамика цен по продуктам',
+            },
+        ),
+        migrations.CreateModel(
+            name='PriceAlcoholRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'День'), ('week', 'Неделя'), ('month', 'Месяц')], max_length=10, verbose_name='Период')),
+                ('period_start', models.DateField(verbose_name='Начало периода')),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Минимальная цена')),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Максимальная цена')),
+                ('sum_price', models.DecimalField(decimal_places=2, max_digits=18, verbose_name='Сумма цен')),
+                ('count', models.PositiveIntegerField(verbose_name='Количество предложений')),
+                ('alcohol', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_rollups', to='api.alcoholproduct', verbose_name='Алкоголь')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.supplier', verbose_name='Поставщик')),
+            ],
+            options={
+                'verbose_name': 'Динамика цен по алкоголю',
+                'verbose_name_plural': 'Динамика цен по алкоголю',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='pricerollup',
+            index=models.Index(fields=['product', 'period', 'period_start'], name='price_rollup_series_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='pricerollup',
+            unique_together={('product', 'supplier', 'period', 'period_start')},
+        ),
+        migrations.AddIndex(
+            model_name='pricealcoholrollup',
+            index=models.Index(fields=['alcohol', 'period', 'period_start'], name='price_alc_rollup_series_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='pricealcoholrollup',
+            unique_together={('alcohol', 'supplier', 'period', 'period_start')},
+        ),
+    ]
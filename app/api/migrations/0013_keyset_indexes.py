@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-17 00:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_price_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='price',
+            index=models.Index(fields=['date_added', 'id'], name='price_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='price',
+            index=models.Index(fields=['product', 'date_added', 'id'], name='price_product_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pricealcohol',
+            index=models.Index(fields=['date_added', 'id'], name='pricealcohol_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pricealcohol',
+            index=models.Index(fields=['alcohol', 'date_added', 'id'], name='pricealcohol_alc_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pricerequest',
+            index=models.Index(fields=['created_at', 'id'], name='pricerequest_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pricerequest',
+            index=models.Index(fields=['purchaser', 'created_at', 'id'], name='pricerequest_purch_created_idx'),
+        ),
+    ]
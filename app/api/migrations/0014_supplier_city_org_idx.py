@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-17 00:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='supplier',
+            index=models.Index(fields=['city', 'organization'], name='supplier_city_org_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+from django.db import migrations
+
+# Поисковый индекс зависит от СУБД (см. api/search.py): в SQLite — таблица FTS5,
+# которую заполняют сигналы, в PostgreSQL — GIN-индексы по tsvector полей моделей
+
+DOCUMENTS = (
+    ('product', 'Product', ('name',)),
+    ('alcohol', 'AlcoholProduct', ('name',)),
+    ('supplier', 'Supplier', ('name', 'inn', 'contact_info')),
+    ('price', 'Price', ('manufacturer',)),
+)
+
+
+def gin_indexes(apps):
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    for kind, model_name, fields in DOCUMENTS:
+        yield apps.get_model('api', model_name), GinIndex(
+            SearchVector(*fields, config='russian'), name=f'{kind}_search_idx',
+        )
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE api_search_index USING fts5("
+            "body, organization_id UNINDEXED, tokenize='unicode61 remove_diacritics 2')"
+        )
+        # Существующие записи индексирует команда rebuild_search_index
+    elif vendor == 'postgresql':
+        for model, index in gin_indexes(apps):
+            schema_editor.add_index(model, index)
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS api_search_index")
+    elif vendor == 'postgresql':
+        for model, index in gin_indexes(apps):
+            schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_supplier_city_org_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-17 00:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupplierItemMapping',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='Название у поставщика')),
+                ('confirmed_at', models.DateTimeField(auto_now=True, verbose_name='Дата подтверждения')),
+                ('alcohol', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='api.alcoholproduct', verbose_name='Алкоголь')),
+                ('confirmed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Подтвердил')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='api.product', verbose_name='Продукт')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='item_mappings', to='api.supplier', verbose_name='Поставщик')),
+            ],
+            options={
+                'verbose_name': 'Сопоставление товара поставщика',
+                'verbose_name_plural': 'Сопоставления товаров поставщиков',
+                'unique_together': {('supplier', 'name')},
+            },
+        ),
+    ]
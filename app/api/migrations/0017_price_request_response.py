@@ -0,0 +1,27 @@
+# Generated by Django 4.2 on 2026-10-17 00:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_supplier_item_mapping'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pricerequest',
+            name='responded_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата ответа'),
+        ),
+        migrations.AddField(
+            model_name='pricerequest',
+            name='response_time',
+            field=models.DurationField(blank=True, null=True, verbose_name='Время ответа'),
+        ),
+        migrations.AddIndex(
+            model_name='pricerequest',
+            index=models.Index(fields=['supplier', 'status'], name='pricerequest_supp_status_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-17 01:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_price_request_response'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supplier',
+            name='email',
+            field=models.EmailField(blank=True, max_length=254, verbose_name='E-mail для уведомлений'),
+        ),
+        migrations.CreateModel(
+            name='SupplierNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата отправки')),
+                ('price_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.pricerequest', verbose_name='Запрос цены')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='api.supplier', verbose_name='Поставщик')),
+            ],
+            options={
+                'verbose_name': 'Уведомление поставщика',
+                'verbose_name_plural': 'Уведомления поставщиков',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='suppliernotification',
+            index=models.Index(fields=['supplier', 'sent_at'], name='notification_supp_sent_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 01:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_supplier_notifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supplier',
+            name='last_updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_supplier_last_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organization',
+            name='last_updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,12 +1,22 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
 from django.core.validators import MinValueValidator
 from django.utils import timezone
+import re
 import uuid
+from collections import namedtuple
 from datetime import timedelta
 from django.utils.timezone import now
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
+from django.dispatch import Signal
+from .bulk import insert_rows
+from .permissions import access_scope
+
+EMAIL_RE = re.compile(r'[\w.+-]+@[\w-]+(\.[\w-]+)+')
+
 
 class Organization(models.Model):
     name = models.CharField(
@@ -15,6 +25,7 @@ class Organization(models.Model):
     description = models.TextField(
         blank=True, null=True, 
         verbose_name="Описание")
+    last_updated = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -123,6 +134,10 @@ class Product(models.Model):
     class Meta:
         verbose_name = 'Продукт'
         verbose_name_plural = 'Продукты'
+        indexes = [
+            # Поиск продукта организации по названию (импорт прайс-листов)
+            models.Index(fields=['organization', 'name'], name='product_org_name_idx'),
+        ]
 
 class AlcoholProduct(models.Model):
     name = models.CharField(
@@ -165,6 +180,9 @@ class Supplier(models.Model):
         max_length=255, 
         verbose_name=u"Наименование")
     contact_info = models.TextField(verbose_name=u"Контактная информация")
+    email = models.EmailField(
+        blank=True,
+        verbose_name="E-mail для уведомлений")
     inn_validator = RegexValidator(
         regex=r'^\d{10,12}$', 
         message="Неверный формат ИНН")
@@ -181,13 +199,30 @@ class Supplier(models.Model):
     organization = models.ForeignKey(
         Organization, on_delete=models.CASCADE, 
         verbose_name="Организация")
+    # Входит в ETag цен: название поставщика есть в ответах списков цен
+    last_updated = models.DateTimeField(
+        auto_now=True)
 
     def __str__(self):
         return f"{self.organization} - {self.name}"
+
+    @property
+    def notification_email(self):
+        """
+        Адрес для уведомлений: поле email или первый адрес из контактной информации.
+        """
+        if self.email:
+            return self.email
+        match = EMAIL_RE.search(self.contact_info or '')
+        return match.group(0) if match else None
     
     class Meta:
         verbose_name = 'Поставщик'
         verbose_name_plural = 'Поставщики'
+        indexes = [
+            # Поставщики городов и организаций закупщика (ограничение видимости в API)
+            models.Index(fields=['city', 'organization'], name='supplier_city_org_idx'),
+        ]
 
 class SupplierToken(models.Model):
     supplier = models.ForeignKey(
@@ -221,6 +256,71 @@ class SupplierToken(models.Model):
         verbose_name = 'Токен поставщика'
         verbose_name_plural = 'Токен поставщиков'
 
+# Нормализованная запись истории цен (Price или PriceAlcohol), которую получают
+# обработчики записи цен; item_id — id продукта или алкоголя
+PriceRow = namedtuple('PriceRow', ['pk', 'item_id', 'supplier_id', 'price', 'manufacturer', 'date_added', 'date_updated'])
+# Поля записи истории для PriceRow (item_field — product или alcohol)
+ROW_FIELDS = ('pk', '{item_field}_id', 'supplier_id', 'price', 'manufacturer', 'date_added', 'date_updated')
+
+# Отправляется в транзакции после записи цен: sender — Price или PriceAlcohol,
+# rows — список PriceRow, created — False, если изменены уже существующие записи,
+# previous — пары (товар, поставщик), из которых изменённые записи перенесены
+prices_saved = Signal()
+
+# Отправляется в транзакции после удаления записей истории цен (delete() записи
+# или выборки): sender — Price или PriceAlcohol, rows — список PriceRow удалённых.
+# При каскадном удалении продукта или поставщика не отправляется: зависимые
+# строки (актуальные предложения, агрегаты) удаляются тем же каскадом
+prices_deleted = Signal()
+
+# Отправляется в транзакции после создания запросов цен (по одному или fan_out):
+# requests — список созданных PriceRequest
+price_requests_created = Signal()
+
+class PriceQuerySet(models.QuerySet):
+    """
+    QuerySet истории цен: массовая вставка, изменение и удаление обновляют таблицу
+    актуальных предложений.
+    """
+    def rows(self):
+        fields = [field.format(item_field=self.model.item_field) for field in ROW_FIELDS]
+        return [PriceRow(*values) for values in self.values_list(*fields)]
+
+    def pairs(self):
+        return set(self.values_list(f'{self.model.item_field}_id', 'supplier_id'))
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            self.model.prices_written([obj.as_row() for obj in objs])
+        return objs
+
+    def delete(self):
+        # Строки для обработчиков читаются до удаления одним запросом; сам DELETE
+        # и каскады Django выполняет пачками, без сигналов на каждую запись
+        with transaction.atomic(using=self.db):
+            rows = self.rows()
+            deleted = super().delete()
+            self.model.prices_removed(rows)
+        return deleted
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def update(self, **kwargs):
+        # Изменённые записи могли перейти в другую пару (товар, поставщик) или перестать
+        # быть последними в своей — актуальные предложения прежних пар пересчитываются
+        with transaction.atomic(using=self.db):
+            pks = list(self.values_list('pk', flat=True))
+            previous = self.pairs()
+            updated = super().update(**kwargs)
+            if pks:
+                rows = self.model.objects.filter(pk__in=pks).rows()
+                self.model.prices_written(rows, created=False, previous=previous)
+        return updated
+
+    update.alters_data = True
+
 class Price(models.Model):
     product = models.ForeignKey(
         Product, on_delete=models.CASCADE, 
@@ -249,14 +349,62 @@ class Price(models.Model):
     def __str__(self):
         return f"{self.product.name} - {self.supplier.name} - {self.price} - {self.date_added}"
 
+    objects = PriceQuerySet.as_manager()
+
     class Meta:
         unique_together = ('product', 'supplier', 'date_added')
         verbose_name = 'Предложения от поставщиков по продукту'
         verbose_name_plural = 'Предложения от поставщиков по продуктам'
+        indexes = [
+            # Постраничный вывод по ключу (date_added, id): весь список и цены продукта
+            models.Index(fields=['date_added', 'id'], name='price_date_id_idx'),
+            models.Index(fields=['product', 'date_added', 'id'], name='price_product_date_id_idx'),
+        ]
+
+    item_field = 'product'
 
     def save(self, *args, **kwargs):
         self.date_updated = timezone.now()
-        super().save(*args, **kwargs)
+        created = self._state.adding
+        with transaction.atomic():
+            previous = set() if created else type(self).objects.filter(pk=self.pk).pairs()
+            super().save(*args, **kwargs)
+            row = self.as_row()
+            self.prices_written([row], created=created, previous=previous - {(row.item_id, row.supplier_id)})
+
+    def as_row(self):
+        return PriceRow(self.pk, self.product_id, self.supplier_id, self.price,
+                        self.manufacturer, self.date_added, self.date_updated)
+
+    @staticmethod
+    def prices_written(rows, created=True, previous=()):
+        """
+        Вызывается в транзакции после любой записи истории цен (save, bulk_create,
+        update, импорт). previous — пары (товар, поставщик), из которых записи
+        перенесены изменением.
+        """
+        CurrentPrice.objects.refresh(rows, previous)
+        prices_saved.send(sender=Price, rows=rows, created=created, previous=previous)
+
+    def delete(self, *args, **kwargs):
+        row = self.as_row()
+        with transaction.atomic():
+            deleted = super().delete(*args, **kwargs)
+            self.prices_removed([row])
+        return deleted
+
+    @staticmethod
+    def prices_removed(rows):
+        """
+        Вызывается в транзакции после удаления записей истории цен: актуальные
+        предложения затронутых пар пересчитываются одним проходом по истории.
+        """
+        if not rows:
+            return
+        CurrentPrice.objects.rebuild(
+            product_id__in={row.item_id for row in rows}, supplier_id__in={row.supplier_id for row in rows},
+        )
+        prices_deleted.send(sender=Price, rows=rows)
 
     def clean(self):
         if self.price and self.price > 99999999.99:
@@ -286,14 +434,312 @@ class PriceAlcohol(models.Model):
     def __str__(self):
         return f"{self.alcohol.name} - {self.supplier.name} - {self.price} - {self.date_added}"
 
+    objects = PriceQuerySet.as_manager()
+
     class Meta:
         unique_together = ('alcohol', 'supplier', 'date_added') # убираем unique_together
         verbose_name = 'Предложения от поставщиков по алкоголю'
         verbose_name_plural = 'Предложения от поставщиков по алкоголю'
+        indexes = [
+            models.Index(fields=['date_added', 'id'], name='pricealcohol_date_id_idx'),
+            models.Index(fields=['alcohol', 'date_added', 'id'], name='pricealcohol_alc_date_id_idx'),
+        ]
+
+    item_field = 'alcohol'
 
     def save(self, *args, **kwargs):
         self.date_updated = timezone.now()
-        super().save(*args, **kwargs)
+        created = self._state.adding
+        with transaction.atomic():
+            previous = set() if created else type(self).objects.filter(pk=self.pk).pairs()
+            super().save(*args, **kwargs)
+            row = self.as_row()
+            self.prices_written([row], created=created, previous=previous - {(row.item_id, row.supplier_id)})
+
+    def as_row(self):
+        return PriceRow(self.pk, self.alcohol_id, self.supplier_id, self.price,
+                        self.manufacturer, self.date_added, self.date_updated)
+
+    @staticmethod
+    def prices_written(rows, created=True, previous=()):
+        CurrentPriceAlcohol.objects.refresh(rows, previous)
+        prices_saved.send(sender=PriceAlcohol, rows=rows, created=created, previous=previous)
+
+    def delete(self, *args, **kwargs):
+        row = self.as_row()
+        with transaction.atomic():
+            deleted = super().delete(*args, **kwargs)
+            self.prices_removed([row])
+        return deleted
+
+    @staticmethod
+    def prices_removed(rows):
+        if not rows:
+            return
+        CurrentPriceAlcohol.objects.rebuild(
+            alcohol_id__in={row.item_id for row in rows}, supplier_id__in={row.supplier_id for row in rows},
+        )
+        prices_deleted.send(sender=PriceAlcohol, rows=rows)
+
+class CurrentPriceManager(models.Manager):
+    """
+    Поддержка таблицы актуальных предложений: одна строка на пару (товар, поставщик),
+    указывающая на самую свежую запись истории цен.
+    """
+    FIELDS = ('supplier', 'source', 'price', 'manufacturer', 'date_added', 'date_updated')
+
+    def _upsert(self, rows):
+        """
+        Вставляет или заменяет строки по ключу (товар, поставщик) одним executemany.
+        """
+        item_field = self.model.item_field
+        return insert_rows(
+            self.model,
+            (item_field,) + self.FIELDS,
+            [(row.item_id, row.supplier_id, row.pk, row.price, row.manufacturer,
+              row.date_added, row.date_updated) for row in rows],
+            unique_fields=(item_field, 'supplier'),
+            update_fields=self.FIELDS[1:],
+            using=self.db,
+        )
+
+    def refresh(self, rows, previous=()):
+        """
+        Обновляет актуальные предложения по только что записанным ценам (список PriceRow).
+        Запись заменяет текущую, только если она не старше неё. previous — пары, которые
+        записи покинули: их предложения сначала пересчитываются из истории, иначе
+        строка прежней пары ссылалась бы на ту же запись (source уникален).
+        """
+        item_attr = f'{self.model.item_field}_id'
+        if previous:
+            self.rebuild(**{
+                f'{item_attr}__in': {item_id for item_id, _ in previous},
+                'supplier_id__in': {supplier_id for _, supplier_id in previous},
+            })
+        if any(row.pk is None for row in rows):
+            # Бэкенд не вернул первичные ключи после bulk_create — пересчитываем из истории
+            return self.rebuild(**{f'{item_attr}__in': {row.item_id for row in rows}})
+
+        latest = {}
+        for row in rows:
+            key = (row.item_id, row.supplier_id)
+            if key not in latest or (row.date_added, row.pk) > (latest[key].date_added, latest[key].pk):
+                latest[key] = row
+        if not latest:
+            return 0
+
+        with transaction.atomic(using=self.db):
+            existing = {
+                (item_id, supplier_id): (date_added, source_id)
+                for item_id, supplier_id, date_added, source_id in self.select_for_update().filter(**{
+                    f'{item_attr}__in': {key[0] for key in latest},
+                    'supplier_id__in': {key[1] for key in latest},
+                }).values_list(item_attr, 'supplier_id', 'date_added', 'source_id')
+            }
+            fresh, stale = [], set()
+            for key, row in latest.items():
+                current = existing.get(key)
+                if current is None or (row.date_added, row.pk) >= current:
+                    fresh.append(row)
+                elif current[1] == row.pk:
+                    # Текущая запись была изменена «в прошлое» — нужен пересчёт пары
+                    stale.add(key)
+            self._upsert(fresh)
+            for item_id, supplier_id in stale:
+                self.rebuild(**{item_attr: item_id, 'supplier_id': supplier_id})
+        return len(fresh)
+
+    def rebuild(self, batch_size=1000, **filters):
+        """
+        Полностью пересчитывает актуальные предложения из истории цен.
+        filters ограничивают пересчёт (например, product_id=... или supplier_id__in=...).
+        """
+        item_attr = f'{self.model.item_field}_id'
+        history = self.model._meta.get_field('source').related_model
+        created = 0
+        with transaction.atomic(using=self.db):
+            self.filter(**filters).delete()
+            queryset = history._default_manager.filter(**filters).order_by(
+                item_attr, 'supplier_id', '-date_added', '-pk'
+            ).values_list('pk', item_attr, 'supplier_id', 'price', 'manufacturer', 'date_added', 'date_updated')
+            rows, previous = [], None
+            for values in queryset.iterator(chunk_size=batch_size):
+                row = PriceRow(*values)
+                key = (row.item_id, row.supplier_id)
+                if key == previous:
+                    continue
+                previous = key
+                rows.append(row)
+                if len(rows) >= batch_size:
+                    created += self._upsert(rows)
+                    rows = []
+            created += self._upsert(rows)
+        return created
+
+class CurrentPrice(models.Model):
+    """
+    Актуальное (последнее) предложение поставщика по продукту.
+    Денормализованная копия последней записи Price для пары (продукт, поставщик).
+    """
+    item_field = 'product'
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, 
+        related_name='current_prices', 
+        verbose_name="Продукт")
+    supplier = models.ForeignKey(
+        Supplier, on_delete=models.CASCADE, 
+        related_name='+', 
+        verbose_name="Поставщик")
+    source = models.OneToOneField(
+        Price, on_delete=models.CASCADE, 
+        related_name='current_offer', 
+        verbose_name="Запись истории")
+    price = models.DecimalField(
+        max_digits=10, decimal_places=2, 
+        null=True, blank=True, 
+        verbose_name="Предложенная цена")
+    manufacturer = models.CharField(
+        max_length=255, blank=True, null=True, 
+        verbose_name="Единица измерения")
+    date_added = models.DateTimeField(verbose_name="Дата добавления")
+    date_updated = models.DateTimeField(verbose_name="Дата обновления")
+
+    objects = CurrentPriceManager()
+
+    def __str__(self):
+        return f"{self.product_id} - {self.supplier_id} - {self.price}"
+
+    class Meta:
+        unique_together = ('product', 'supplier')
+        verbose_name = 'Актуальное предложение по продукту'
+        verbose_name_plural = 'Актуальные предложения по продуктам'
+
+class CurrentPriceAlcohol(models.Model):
+    """
+    Актуальное (последнее) предложение поставщика по алкоголю.
+    """
+    item_field = 'alcohol'
+
+    alcohol = models.ForeignKey(
+        AlcoholProduct, on_delete=models.CASCADE, 
+        related_name='current_prices', 
+        verbose_name="Алкоголь")
+    supplier = models.ForeignKey(
+        Supplier, on_delete=models.CASCADE, 
+        related_name='+', 
+        verbose_name="Поставщик")
+    source = models.OneToOneField(
+        PriceAlcohol, on_delete=models.CASCADE, 
+        related_name='current_offer', 
+        verbose_name="Запись истории")
+    price = models.DecimalField(
+        max_digits=10, decimal_places=2, 
+        null=True, blank=True, 
+        verbose_name="Предложенная цена")
+    manufacturer = models.CharField(
+        max_length=255, blank=True, null=True, 
+        verbose_name="Единица измерения")
+    date_added = models.DateTimeField(verbose_name="Дата добавления")
+    date_updated = models.DateTimeField(verbose_name="Дата обновления")
+
+    objects = CurrentPriceManager()
+
+    def __str__(self):
+        return f"{self.alcohol_id} - {self.supplier_id} - {self.price}"
+
+    class Meta:
+        unique_together = ('alcohol', 'supplier')
+        verbose_name = 'Актуальное предложение по алкоголю'
+        verbose_name_plural = 'Актуальные предложения по алкоголю'
+
+class PriceRequestManager(models.Manager):
+    """
+    Массовые запросы цен: один запрос на каждую пару (товар, поставщик).
+    """
+    def fan_out(self, purchaser, supplier_ids, product_ids=(), alcohol_ids=(), message=None, batch_size=1000):
+        """
+        Создаёт запросы цен закупщика на все товары у всех поставщиков. Права
+        проверяются для множеств id сразу (по запросу на поставщиков, продукты
+        и алкоголь); в одной транзакции пары с уже ожидающим ответа запросом
+        пропускаются, новые записываются bulk_create. Недоступные или
+        несуществующие id — ValidationError, ничего не создаётся.
+        Возвращает {'created': ..., 'skipped': ...}.
+        """
+        scope = access_scope(purchaser)
+        supplier_ids, product_ids, alcohol_ids = set(supplier_ids), set(product_ids), set(alcohol_ids)
+
+        # Как в clean(): организация поставщика проверяется, если в профиле заданы организации;
+        # кроме того, поставщик должен быть виден закупщику (города профиля)
+        suppliers = scope.filter_suppliers(Supplier.objects.filter(pk__in=supplier_ids), field=None)
+        items = {'product': (Product, product_ids), 'alcohol': (AlcoholProduct, alcohol_ids)}
+        if scope.organization_ids:
+            suppliers = scope.filter(suppliers)
+        errors = {}
+        missing = supplier_ids - set(suppliers.values_list('pk', flat=True))
+        if missing:
+            errors['suppliers'] = [f"Поставщики недоступны или не найдены: {sorted(missing)}"]
+        for field, (model, ids) in items.items():
+            if ids:
+                missing = ids - set(scope.filter(model.objects.filter(pk__in=ids)).values_list('pk', flat=True))
+                if missing:
+                    errors[field] = [f"Товары недоступны или не найдены: {sorted(missing)}"]
+        if errors:
+            raise ValidationError(errors)
+
+        requests, skipped = [], 0
+        with transaction.atomic():
+            # Проверка ожидающих запросов и запись — в одной транзакции под блокировкой
+            # строки закупщика: параллельные fan_out одного закупщика выполняются по
+            # очереди и не создают дублей (SQLite и так сериализует пишущие транзакции)
+            User.objects.select_for_update().filter(pk=purchaser.pk).exists()
+            for field, (model, ids) in items.items():
+                if not ids:
+                    continue
+                pending = set(self.filter(
+                    purchaser=purchaser, status='pending', supplier_id__in=supplier_ids, **{f'{field}_id__in': ids},
+                ).values_list('supplier_id', f'{field}_id'))
+                for supplier_id in sorted(supplier_ids):
+                    for item_id in sorted(ids):
+                        if (supplier_id, item_id) in pending:
+                            skipped += 1
+                            continue
+                        requests.append(self.model(
+                            purchaser=purchaser, supplier_id=supplier_id, message=message, **{f'{field}_id': item_id},
+                        ))
+            self.bulk_create(requests, batch_size=batch_size)
+            if requests:
+                price_requests_created.send(sender=self.model, requests=requests)
+        return {'created': len(requests), 'skipped': skipped}
+
+    def answered_by(self, item_field, rows):
+        """
+        Ожидающие запросы, на которые отвечают цены rows (список PriceRow; item_field —
+        'product' или 'alcohol').
+        """
+        items_by_supplier = {}
+        for row in rows:
+            items_by_supplier.setdefault(row.supplier_id, set()).add(row.item_id)
+        if not items_by_supplier:
+            return self.none()
+        condition = models.Q()
+        for supplier_id, item_ids in items_by_supplier.items():
+            condition |= models.Q(supplier_id=supplier_id, **{f'{item_field}_id__in': item_ids})
+        return self.filter(condition, status='pending')
+
+    def mark_responded(self, item_field, rows):
+        """
+        Отмечает ожидающие запросы, на которые пришли цены, одним UPDATE: статус,
+        время ответа и задержка от создания запроса. Возвращает число обновлённых запросов.
+        """
+        responded_at = timezone.now()
+        return self.answered_by(item_field, rows).update(
+            status='responded', responded_at=responded_at, updated_at=responded_at,
+            response_time=models.ExpressionWrapper(
+                models.Value(responded_at) - models.F('created_at'), output_field=models.DurationField(),
+            ),
+        )
+
 
 class PriceRequest(models.Model):
     """
@@ -342,6 +788,16 @@ class PriceRequest(models.Model):
         auto_now=True, 
         verbose_name="Дата обновления"
     )
+    responded_at = models.DateTimeField(
+        blank=True, null=True,
+        verbose_name="Дата ответа"
+    )
+    response_time = models.DurationField(
+        blank=True, null=True,
+        verbose_name="Время ответа"
+    )
+
+    objects = PriceRequestManager()
     
     def clean(self):
         super().clean()
@@ -352,21 +808,25 @@ class PriceRequest(models.Model):
             raise ValidationError("Можно запросить цену либо на продукт, либо на алкоголь, но не на оба одновременно.")
             
         # Проверяем, что закупщик и поставщик принадлежат одной организации
-        if self.purchaser and self.supplier:
-            purchaser_orgs = []
-            if hasattr(self.purchaser, 'purchaser_profile'):
-                purchaser_orgs = list(self.purchaser.purchaser_profile.organizations.all())
-            else:
-                # Если у пользователя нет профиля, проверяем по его организации (если есть)
-                # или пропускаем проверку
-                pass
-                
-            if purchaser_orgs and self.supplier.organization not in purchaser_orgs:
+        if self.purchaser_id and self.supplier_id:
+            # Права закупщика уже вычислены в запросе, если он же и создаёт запрос цены.
+            # Без профиля (или без организаций) проверку пропускаем
+            scope = access_scope(self.purchaser)
+            if scope.organization_ids and not scope.allows_organization(self.supplier.organization_id):
                 raise ValidationError("Поставщик должен принадлежать одной из организаций закупщика.")
 
     def save(self, *args, **kwargs):
         self.full_clean()
-        super().save(*args, **kwargs)
+        if self.status == 'responded' and self.responded_at is None:
+            # Ответ отмечен вручную — задержка считается так же, как при записи цен
+            self.responded_at = timezone.now()
+            if self.created_at:
+                self.response_time = self.responded_at - self.created_at
+        created = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if created:
+                price_requests_created.send(sender=PriceRequest, requests=[self])
         
     def __str__(self):
         item = self.product.name if self.product else (self.alcohol.name if self.alcohol else "Не указан")
@@ -375,4 +835,373 @@ class PriceRequest(models.Model):
     class Meta:
         verbose_name = 'Запрос цены'
         verbose_name_plural = 'Запросы цен'
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            # Постраничный вывод по ключу (created_at, id): все запросы и запросы закупщика
+            models.Index(fields=['created_at', 'id'], name='pricerequest_created_id_idx'),
+            models.Index(fields=['purchaser', 'created_at', 'id'], name='pricerequest_purch_created_idx'),
+            # Ожидающие запросы поставщика (отметка ответа при записи цен)
+            models.Index(fields=['supplier', 'status'], name='pricerequest_supp_status_idx'),
+        ]
+class Job(models.Model):
+    """
+    Фоновая задача (импорт, выгрузка, пересчёт), выполняемая командой run_jobs.
+    """
+    STATUS_CHOICES = (
+        ('queued', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Выполнена'),
+        ('failed', 'Ошибка'),
+    )
+
+    name = models.CharField(
+        max_length=100, 
+        verbose_name="Задача")
+    params = models.JSONField(
+        default=dict, blank=True, 
+        verbose_name="Параметры")
+    status = models.CharField(
+        max_length=20, 
+        choices=STATUS_CHOICES, 
+        default='queued', 
+        verbose_name="Статус")
+    created_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, 
+        null=True, blank=True, 
+        verbose_name="Автор")
+    attempts = models.PositiveIntegerField(
+        default=0, 
+        verbose_name="Попыток")
+    max_attempts = models.PositiveIntegerField(
+        default=3, 
+        verbose_name="Максимум попыток")
+    progress = models.PositiveIntegerField(
+        default=0, 
+        verbose_name="Выполнено")
+    total = models.PositiveIntegerField(
+        null=True, blank=True, 
+        verbose_name="Всего")
+    result = models.JSONField(
+        null=True, blank=True, 
+        verbose_name="Результат")
+    error = models.TextField(
+        blank=True, 
+        verbose_name="Ошибка")
+    worker = models.CharField(
+        max_length=100, blank=True, 
+        verbose_name="Обработчик")
+    run_after = models.DateTimeField(
+        default=timezone.now, 
+        verbose_name="Запуск не ранее")
+    created_at = models.DateTimeField(
+        auto_now_add=True, 
+        verbose_name="Дата создания")
+    started_at = models.DateTimeField(
+        null=True, blank=True, 
+        verbose_name="Начало выполнения")
+    finished_at = models.DateTimeField(
+        null=True, blank=True, 
+        verbose_name="Окончание выполнения")
+    updated_at = models.DateTimeField(
+        auto_now=True, 
+        verbose_name="Дата обновления")
+
+    def set_progress(self, progress, total=None):
+        """
+        Сохраняет прогресс одним UPDATE, не трогая остальные поля задачи.
+        """
+        self.progress = progress
+        if total is not None:
+            self.total = total
+        Job.objects.filter(pk=self.pk).update(progress=self.progress, total=self.total, updated_at=now())
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        ordering = ['-created_at']
+        indexes = [
+            # Выборка следующей задачи обработчиком
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+
+
+def period_bounds(period, day):
+    """
+    Начало и конец (не включительно) дня, недели (с понедельника) или месяца, содержащих day.
+    """
+    if period == 'day':
+        return day, day + timedelta(days=1)
+    if period == 'week':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=7)
+    start = day.replace(day=1)
+    return start, (start + timedelta(days=32)).replace(day=1)
+
+class PriceRollupManager(models.Manager):
+    """
+    Поддержка агрегатов истории цен (min/avg/max/count по периодам).
+    Новые цены добавляются в агрегаты инкрементально, изменённые и удалённые
+    пересчитываются по затронутым периодам.
+    """
+    PERIODS = ('day', 'week', 'month')
+    FIELDS = ('supplier', 'period', 'period_start', 'min_price', 'max_price', 'sum_price', 'count')
+
+    def history_model(self):
+        return self.model._meta.apps.get_model(self.model._meta.app_label, self.model.history_model)
+
+    def _upsert(self, rows):
+        item_field = self.model.item_field
+        return insert_rows(
+            self.model, (item_field,) + self.FIELDS, rows,
+            unique_fields=(item_field, 'supplier', 'period', 'period_start'),
+            update_fields=self.FIELDS[3:],
+            using=self.db,
+        )
+
+    def add(self, rows):
+        """
+        Добавляет новые записи истории (список PriceRow) в агрегаты всех периодов.
+        """
+        item_attr = f'{self.model.item_field}_id'
+        totals = {}
+        for row in rows:
+            if row.price is None:
+                continue
+            day = timezone.localdate(row.date_added)
+            for period in self.PERIODS:
+                key = (row.item_id, row.supplier_id, period, period_bounds(period, day)[0])
+                low, high, total, count = totals.get(key, (row.price, row.price, 0, 0))
+                totals[key] = (min(low, row.price), max(high, row.price), total + row.price, count + 1)
+        if not totals:
+            return 0
+
+        with transaction.atomic(using=self.db):
+            existing = self.select_for_update().filter(**{
+                f'{item_attr}__in': {key[0] for key in totals},
+                'supplier_id__in': {key[1] for key in totals},
+                'period_start__in': {key[3] for key in totals},
+            }).values_list(item_attr, 'supplier_id', 'period', 'period_start',
+                           'min_price', 'max_price', 'sum_price', 'count')
+            for item_id, supplier_id, period, start, low, high, total, count in existing:
+                key = (item_id, supplier_id, period, start)
+                if key in totals:
+                    new_low, new_high, new_total, new_count = totals[key]
+                    totals[key] = (min(low, new_low), max(high, new_high), total + new_total, count + new_count)
+            return self._upsert([key + value for key, value in totals.items()])
+
+    def recalculate(self, item_id, supplier_id, days):
+        """
+        Пересчитывает из истории периоды, содержащие указанные даты (после изменения или удаления цен).
+        """
+        item_attr = f'{self.model.item_field}_id'
+        history = self.history_model()._default_manager
+        rows, empty = [], []
+        bounds = {(period,) + period_bounds(period, day) for day in days for period in self.PERIODS}
+        with transaction.atomic(using=self.db):
+            for period, start, end in bounds:
+                stats = history.filter(**{
+                    item_attr: item_id, 'supplier_id': supplier_id, 'price__isnull': False,
+                    'date_added__date__gte': start, 'date_added__date__lt': end,
+                }).aggregate(low=Min('price'), high=Max('price'), total=Sum('price'), count=Count('pk'))
+                if stats['count']:
+                    rows.append((item_id, supplier_id, period, start,
+                                 stats['low'], stats['high'], stats['total'], stats['count']))
+                else:
+                    empty.append((period, start))
+            self._upsert(rows)
+            for period, start in empty:
+                self.filter(**{item_attr: item_id, 'supplier_id': supplier_id,
+                               'period': period, 'period_start': start}).delete()
+
+    def rebuild(self, batch_size=1000, **filters):
+        """
+        Полностью пересчитывает агрегаты группировкой истории на стороне БД.
+        """
+        item_attr = f'{self.model.item_field}_id'
+        history = self.history_model()._default_manager
+        truncs = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+        created = 0
+        with transaction.atomic(using=self.db):
+            self.filter(**filters).delete()
+            for period in self.PERIODS:
+                queryset = history.filter(price__isnull=False, **filters).annotate(
+                    period_start=truncs[period]('date_added', output_field=models.DateField()),
+                ).values(item_attr, 'supplier_id', 'period_start').annotate(
+                    low=Min('price'), high=Max('price'), total=Sum('price'), count=Count('pk'),
+                ).values_list(item_attr, 'supplier_id', 'period_start', 'low', 'high', 'total', 'count').order_by()
+                rows = []
+                for item_id, supplier_id, start, low, high, total, count in queryset.iterator(chunk_size=batch_size):
+                    rows.append((item_id, supplier_id, period, start, low, high, total, count))
+                    if len(rows) >= batch_size:
+                        created += self._upsert(rows)
+                        rows = []
+                created += self._upsert(rows)
+        return created
+
+class PriceRollup(models.Model):
+    """
+    Агрегаты истории цен продукта по поставщику за день, неделю или месяц.
+    """
+    PERIOD_CHOICES = (
+        ('day', 'День'),
+        ('week', 'Неделя'),
+        ('month', 'Месяц'),
+    )
+    item_field = 'product'
+    history_model = 'Price'
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, 
+        related_name='price_rollups', 
+        verbose_name="Продукт")
+    supplier = models.ForeignKey(
+        Supplier, on_delete=models.CASCADE, 
+        related_name='+', 
+        verbose_name="Поставщик")
+    period = models.CharField(
+        max_length=10, 
+        choices=PERIOD_CHOICES, 
+        verbose_name="Период")
+    period_start = models.DateField(verbose_name="Начало периода")
+    min_price = models.DecimalField(
+        max_digits=10, decimal_places=2, 
+        verbose_name="Минимальная цена")
+    max_price = models.DecimalField(
+        max_digits=10, decimal_places=2, 
+        verbose_name="Максимальная цена")
+    sum_price = models.DecimalField(
+        max_digits=18, decimal_places=2, 
+        verbose_name="Сумма цен")
+    count = models.PositiveIntegerField(verbose_name="Количество предложений")
+
+    objects = PriceRollupManager()
+
+    @property
+    def avg_price(self):
+        return self.sum_price / self.count if self.count else None
+
+    class Meta:
+        unique_together = ('product', 'supplier', 'period', 'period_start')
+        indexes = [
+            models.Index(fields=['product', 'period', 'period_start'], name='price_rollup_series_idx'),
+        ]
+        verbose_name = 'Динамика цен по продукту'
+        verbose_name_plural = 'Динамика цен по продуктам'
+
+class PriceAlcoholRollup(models.Model):
+    """
+    Агрегаты истории цен на алкоголь по поставщику за день, неделю или месяц.
+    """
+    PERIOD_CHOICES = PriceRollup.PERIOD_CHOICES
+    item_field = 'alcohol'
+    history_model = 'PriceAlcohol'
+
+    alcohol = models.ForeignKey(
+        AlcoholProduct, on_delete=models.CASCADE, 
+        related_name='price_rollups', 
+        verbose_name="Алкоголь")
+    supplier = models.ForeignKey(
+        Supplier, on_delete=models.CASCADE, 
+        related_name='+', 
+        verbose_name="Поставщик")
+    period = models.CharField(
+        max_length=10, 
+        choices=PERIOD_CHOICES, 
+        verbose_name="Период")
+    period_start = models.DateField(verbose_name="Начало периода")
+    min_price = models.DecimalField(
+        max_digits=10, decimal_places=2, 
+        verbose_name="Минимальная цена")
+    max_price = models.DecimalField(
+        max_digits=10, decimal_places=2, 
+        verbose_name="Максимальная цена")
+    sum_price = models.DecimalField(
+        max_digits=18, decimal_places=2, 
+        verbose_name="Сумма цен")
+    count = models.PositiveIntegerField(verbose_name="Количество предложений")
+
+    objects = PriceRollupManager()
+
+    @property
+    def avg_price(self):
+        return self.sum_price / self.count if self.count else None
+
+    class Meta:
+        unique_together = ('alcohol', 'supplier', 'period', 'period_start')
+        indexes = [
+            models.Index(fields=['alcohol', 'period', 'period_start'], name='price_alc_rollup_series_idx'),
+        ]
+        verbose_name = 'Динамика цен по алкоголю'
+        verbose_name_plural = 'Динамика цен по алкоголю'
+
+
+class SupplierItemMapping(models.Model):
+    """
+    Подтверждённое сопоставление названия из прайс-листа поставщика с товаром
+    каталога. Название хранится нормализованным (см. matching.normalize).
+    """
+    supplier = models.ForeignKey(
+        Supplier, on_delete=models.CASCADE,
+        related_name='item_mappings',
+        verbose_name="Поставщик")
+    name = models.CharField(
+        max_length=255,
+        verbose_name="Название у поставщика")
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE,
+        blank=True, null=True,
+        verbose_name="Продукт")
+    alcohol = models.ForeignKey(
+        AlcoholProduct, on_delete=models.CASCADE,
+        blank=True, null=True,
+        verbose_name="Алкоголь")
+    confirmed_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL,
+        blank=True, null=True,
+        verbose_name="Подтвердил")
+    confirmed_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Дата подтверждения")
+
+    def __str__(self):
+        return f"{self.supplier}: {self.name} -> {self.product or self.alcohol}"
+
+    class Meta:
+        unique_together = ('supplier', 'name')
+        verbose_name = 'Сопоставление товара поставщика'
+        verbose_name_plural = 'Сопоставления товаров поставщиков'
+
+
+class SupplierNotification(models.Model):
+    """
+    Намерение уведомить поставщика о запросе цены (outbox): записывается в той же
+    транзакции, что и запрос, и отправляется в составе сводного письма поставщику
+    задачей notifications.send_digest (см. notifications.py).
+    """
+    supplier = models.ForeignKey(
+        Supplier, on_delete=models.CASCADE,
+        related_name='notifications',
+        verbose_name="Поставщик")
+    price_request = models.ForeignKey(
+        PriceRequest, on_delete=models.CASCADE,
+        verbose_name="Запрос цены")
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Дата создания")
+    sent_at = models.DateTimeField(
+        blank=True, null=True,
+        verbose_name="Дата отправки")
+
+    def __str__(self):
+        return f"{self.supplier}: запрос #{self.price_request_id}"
+
+    class Meta:
+        verbose_name = 'Уведомление поставщика'
+        verbose_name_plural = 'Уведомления поставщиков'
+        indexes = [
+            # Неотправленные уведомления поставщика (сборка сводного письма)
+            models.Index(fields=['supplier', 'sent_at'], name='notification_supp_sent_idx'),
+        ]
@@ -0,0 +1,111 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.utils import timezone
+
+from .models import Job, Supplier, SupplierNotification
+
+logger = logging.getLogger(__name__)
+
+DIGEST_TASK = 'notifications.send_digest'
+# Повторы при ошибках SMTP — с экспоненциальной задержкой jobs.retry_delay
+DIGEST_MAX_ATTEMPTS = 5
+
+
+def record(requests):
+    """
+    Записывает уведомления о созданных запросах цен (в транзакции создания
+    запросов) и планирует рассылку поставщикам.
+    """
+    SupplierNotification.objects.bulk_create(
+        [SupplierNotification(supplier_id=request.supplier_id, price_request_id=request.pk) for request in requests],
+        batch_size=1000,
+    )
+    schedule_digests({request.supplier_id for request in requests})
+
+
+def schedule_digests(supplier_ids):
+    """
+    Ставит задачу сводного письма каждому поставщику, у которого её ещё нет в очереди,
+    с запуском через NOTIFICATION_DIGEST_WINDOW секунд: все запросы, созданные до
+    запуска, уйдут одним письмом. Задача, срок которой уже наступил, может быть
+    захвачена обработчиком в любой момент, поэтому к ней запросы не добавляются.
+    """
+    now = timezone.now()
+    scheduled = set(Job.objects.filter(
+        name=DIGEST_TASK, status='queued', run_after__gt=now, params__supplier_id__in=supplier_ids,
+    ).values_list('params__supplier_id', flat=True))
+    run_after = now + timedelta(seconds=settings.NOTIFICATION_DIGEST_WINDOW)
+    return Job.objects.bulk_create([
+        Job(name=DIGEST_TASK, params={'supplier_id': supplier_id}, run_after=run_after,
+            max_attempts=DIGEST_MAX_ATTEMPTS)
+        for supplier_id in sorted(set(supplier_ids) - scheduled)
+    ])
+
+
+def item_name(price_request):
+    item = price_request.product or price_request.alcohol
+    return item.name if item else "Не указан"
+
+
+def digest_message(supplier, requests, to, connection=None):
+    """
+    Сводное письмо поставщику: по строке на запрос цены.
+    """
+    lines = []
+    for price_request in requests:
+        purchaser = price_request.purchaser.get_full_name() or price_request.purchaser.username
+        line = f"— {item_name(price_request)} (закупщик: {purchaser})"
+        if price_request.message:
+            line += f": {price_request.message}"
+        lines.append(line)
+    body = (
+        f"Здравствуйте, {supplier.name}!\n\n"
+        f"Закупщики запросили цены на позиции ({len(requests)}):\n\n"
+        + "\n".join(lines)
+        + "\n\nЦены, записанные в систему, отметят запросы как выполненные.\n"
+    )
+    return EmailMessage(
+        subject=f"Новые запросы цен: {len(requests)}", body=body, to=[to], connection=connection,
+    )
+
+
+def send_digest(supplier_id, connection=None):
+    """
+    Отправляет поставщику одним письмом все неотправленные уведомления. Запросы,
+    отменённые или выполненные до отправки, в письмо не попадают.
+
+    Уведомления захватываются одним UPDATE (время отправки — метка захвата), поэтому
+    параллельная задача того же поставщика их не получит, а письмо отправляется вне
+    транзакции и не держит блокировку БД. При ошибке SMTP захват снимается и ошибка
+    пробрасывается — уведомления уйдут при повторе задачи. Без адреса уведомления
+    не захватываются и уйдут первым письмом после того, как адрес появится.
+    Возвращает {'emails': ..., 'requests': ...}.
+    """
+    supplier = Supplier.objects.filter(pk=supplier_id).first()
+    if supplier is None:
+        return {'emails': 0, 'requests': 0}
+    to = supplier.notification_email
+    if not to:
+        logger.warning("У поставщика %s нет адреса для уведомлений", supplier)
+        return {'emails': 0, 'requests': 0}
+    claimed_at = timezone.now()
+    unsent = SupplierNotification.objects.filter(supplier=supplier)
+    if not unsent.filter(sent_at__isnull=True).update(sent_at=claimed_at):
+        return {'emails': 0, 'requests': 0}
+    claimed = unsent.filter(sent_at=claimed_at)
+    requests = [
+        notification.price_request for notification in claimed.filter(price_request__status='pending')
+        .select_related('price_request__product', 'price_request__alcohol', 'price_request__purchaser')
+        .order_by('pk')
+    ]
+    if not requests:
+        return {'emails': 0, 'requests': 0}
+    try:
+        digest_message(supplier, requests, to, connection).send()
+    except Exception:
+        claimed.update(sent_at=None)
+        raise
+    return {'emails': 1, 'requests': len(requests)}
@@ -0,0 +1,154 @@
+import base64
+from collections import OrderedDict
+from datetime import datetime
+
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(PageNumberPagination):
+    """
+    Постраничный вывод с необязательным режимом «по ключу» (keyset).
+
+    По умолчанию — обычные номера страниц. Если в запросе есть параметр cursor
+    (пустой — первая страница), записи выбираются от новых к старым по паре
+    полей view.keyset_fields (дата, id) условием «меньше ключа последней записи»
+    с LIMIT, без COUNT(*) и OFFSET: любая страница стоит как первая.
+    Сортировка ?ordering в этом режиме не применяется. С ?search= записи упорядочены
+    по релевантности, а не по ключу, поэтому выводятся обычными страницами.
+    """
+    cursor_query_param = 'cursor'
+
+    def keyset_mode(self, request):
+        return self.cursor_query_param in request.query_params and not request.query_params.get(
+            api_settings.SEARCH_PARAM)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.keyset_mode(request):
+            return super().paginate_queryset(queryset, request, view)
+        queryset, reverse, position = self.keyset_queryset(queryset, request, view)
+        return self.keyset_page(list(queryset[:self.page_size + 1]), reverse, position)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        if not self.keyset_mode(request):
+            return await apaginate_pages(self, queryset, request)
+        queryset, reverse, position = self.keyset_queryset(queryset, request, view)
+        return self.keyset_page([row async for row in queryset[:self.page_size + 1]], reverse, position)
+
+    def keyset_queryset(self, queryset, request, view):
+        """
+        Выборка страницы по ключу (LIMIT добавляет вызывающий): (queryset, назад ли, ключ).
+        """
+        self.request = request
+        self.date_field, self.id_field = view.keyset_fields
+        self.page_size = self.get_page_size(request)
+        reverse, position = self.decode_cursor(request.query_params[self.cursor_query_param])
+
+        if position is not None:
+            value, pk = position
+            if reverse:
+                queryset = queryset.filter(**{self.date_field + '__gte': value}).exclude(
+                    **{self.date_field: value, self.id_field + '__lte': pk})
+            else:
+                queryset = queryset.filter(**{self.date_field + '__lte': value}).exclude(
+                    **{self.date_field: value, self.id_field + '__gte': pk})
+        if reverse:
+            queryset = queryset.order_by(self.date_field, self.id_field)
+        else:
+            queryset = queryset.order_by('-' + self.date_field, '-' + self.id_field)
+        return queryset, reverse, position
+
+    def keyset_page(self, rows, reverse, position):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = has_more if reverse else position is not None
+        self.page_rows = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.keyset_mode(self.request):
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if not self.keyset_mode(self.request):
+            return super().get_next_link()
+        if not self.has_next or not self.page_rows:
+            return None
+        return self.cursor_link(self.page_rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.keyset_mode(self.request):
+            return super().get_previous_link()
+        if not self.has_previous or not self.page_rows:
+            return None
+        return self.cursor_link(self.page_rows[0], reverse=True)
+
+    def cursor_link(self, row, reverse):
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(row, reverse))
+
+    def encode_cursor(self, row, reverse):
+        # Строки — экземпляры моделей или словари values() (см. readers.ValuesListMixin)
+        if isinstance(row, dict):
+            value, pk = row[self.date_field], row[self.id_field]
+        else:
+            value, pk = getattr(row, self.date_field), getattr(row, self.id_field)
+        value = value.isoformat()
+        token = f"{'r' if reverse else 'n'}|{value}|{pk}"
+        return base64.urlsafe_b64encode(token.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, cursor):
+        """
+        Разбирает курсор: (назад ли, (дата, id) ключа или None для первой страницы).
+        """
+        if not cursor:
+            return False, None
+        try:
+            direction, value, pk = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+            return direction == 'r', (datetime.fromisoformat(value), int(pk))
+        except (ValueError, UnicodeError):
+            raise NotFound("Некорректный курсор.")
+
+
+async def apaginate_queryset(paginator, queryset, request, view=None):
+    """
+    paginate_queryset для async view: страница читается через async ORM, ссылки
+    и ответ строит сам paginator (get_paginated_response), как обычно.
+    """
+    if isinstance(paginator, KeysetPagination):
+        return await paginator.apaginate_queryset(queryset, request, view)
+    return await apaginate_pages(paginator, queryset, request)
+
+
+async def apaginate_pages(paginator, queryset, request):
+    """
+    Номера страниц (PageNumberPagination): COUNT(*) и строки страницы.
+    """
+    paginator.request = request
+    page_size = paginator.get_page_size(request)
+    if not page_size:
+        return None
+    django_paginator = paginator.django_paginator_class(queryset, page_size)
+    django_paginator.count = await queryset.acount()
+    page_number = paginator.get_page_number(request, django_paginator)
+    try:
+        paginator.page = django_paginator.page(page_number)
+    except InvalidPage as exc:
+        raise NotFound(paginator.invalid_page_message.format(page_number=page_number, message=str(exc)))
+    paginator.page.object_list = [row async for row in paginator.page.object_list]
+    if django_paginator.num_pages > 1 and paginator.template is not None:
+        paginator.display_page_controls = True
+    return list(paginator.page)
+
@@ -1,7 +1,12 @@
 # app/api/permissions.py
+from asgiref.sync import sync_to_async
 from rest_framework import permissions
+from django.conf import settings
+from django.core.cache import caches
 from django.core.exceptions import PermissionDenied
+from django.db import models, transaction
 from functools import wraps
+import time
 
 class IsAdminOrReadOnly(permissions.BasePermission):
     """
@@ -39,18 +44,209 @@ class IsPurchaserOrHigher(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         # Предполагаем, что у объекта есть связь с организацией
         # и у пользователя есть профиль закупщика
-        if request.user.role == 'admin':
+        scope = access_scope(request.user)
+        if scope.unrestricted:
             return True
-        if hasattr(request.user, 'purchaser_profile'):
-            user_profile = request.user.purchaser_profile
-            # Проверка доступа к организации и городу объекта
-            # (логика будет зависеть от типа объекта)
-            # Например, для Product:
-            if hasattr(obj, 'organization'):
-                 return obj.organization in user_profile.organizations.all()
-            # Для Price/PriceAlcohol нужно проверять организацию продукта/алкоголя
+        # Проверка доступа к организации объекта
+        # (логика будет зависеть от типа объекта)
+        # Например, для Product:
+        if hasattr(obj, 'organization_id'):
+            return scope.allows_organization(obj.organization_id)
+        # Для Price/PriceAlcohol нужно проверять организацию продукта/алкоголя
         return False # По умолчанию запрещено
 
+class AccessScope:
+    """
+    Права пользователя: роль и неизменяемые множества id доступных организаций
+    и городов. Администратор не ограничен (unrestricted).
+    """
+    __slots__ = ('role', 'unrestricted', 'organization_ids', 'city_ids')
+
+    def __init__(self, role, organization_ids=(), city_ids=(), unrestricted=False):
+        self.role = role
+        self.unrestricted = unrestricted
+        self.organization_ids = frozenset(organization_ids)
+        self.city_ids = frozenset(city_ids)
+
+    @classmethod
+    def for_user(cls, user):
+        """
+        Организации и города профиля закупщика одним запросом (UNION двух таблиц связей).
+        """
+        if user.role == 'admin':
+            return cls(user.role, unrestricted=True)
+        return cls.from_rows(user, cls.profile_rows(user))
+
+    @classmethod
+    async def afor_user(cls, user):
+        """
+        for_user для async view: тот же запрос через async ORM.
+        """
+        if user.role == 'admin':
+            return cls(user.role, unrestricted=True)
+        return cls.from_rows(user, [row async for row in cls.profile_rows(user)])
+
+    @staticmethod
+    def profile_rows(user):
+        from .models import PurchaserProfile
+
+        organizations = PurchaserProfile.organizations.through.objects.filter(
+            purchaserprofile__user=user
+        ).values_list(models.Value('organization'), 'organization_id')
+        cities = PurchaserProfile.cities.through.objects.filter(
+            purchaserprofile__user=user
+        ).values_list(models.Value('city'), 'city_id')
+        return organizations.union(cities, all=True)
+
+    @classmethod
+    def from_rows(cls, user, rows):
+        organization_ids, city_ids = [], []
+        for kind, pk in rows:
+            (organization_ids if kind == 'organization' else city_ids).append(pk)
+        return cls(user.role, organization_ids, city_ids)
+
+    def allows_organization(self, organization_id):
+        return self.unrestricted or organization_id in self.organization_ids
+
+    def allows_city(self, city_id):
+        return self.unrestricted or city_id in self.city_ids
+
+    def filter_suppliers(self, queryset, field='supplier'):
+        """
+        Ограничивает выборку поставщиками городов закупщика (field — путь к поставщику,
+        None — выборка самих поставщиков). Поставщики без города видны всем; если
+        города в профиле не заданы, ограничения по городу нет.
+        """
+        if self.unrestricted or not self.city_ids:
+            return queryset
+        prefix = f'{field}__' if field else ''
+        return queryset.filter(
+            models.Q(**{f'{prefix}city_id__in': self.city_ids}) | models.Q(**{f'{prefix}city__isnull': True})
+        )
+
+    def filter(self, queryset, field='organization'):
+        """
+        Ограничивает выборку доступными организациями (field — путь к организации).
+        """
+        if self.unrestricted:
+            return queryset
+        return queryset.filter(**{f'{field}_id__in': self.organization_ids})
+
+# Права закупщиков кэшируются между запросами, если кэш общий для процессов
+# (settings.CACHE_SHARED): ключ записи содержит версию, которая
+# меняется при изменении профиля или роли (см. signals.py), и сброс в одном
+# процессе должен быть виден остальным. Иначе права читаются на каждый запрос
+SCOPE_CACHE_TIMEOUT = 60 * 60
+
+def scope_cache_keys(user_id):
+    return f'access-scope:version:{user_id}', f'access-scope:{user_id}'
+
+def cached_access_scope(user):
+    """
+    Права из общего кэша (одно обращение get_many); при промахе или смене
+    версии — вычисление одним запросом к БД и запись в кэш.
+    """
+    version_key, entry_key = scope_cache_keys(user.pk)
+    cache = caches['default']
+    values = cache.get_many([version_key, entry_key])
+    version = values.get(version_key, 0)
+    entry = values.get(entry_key)
+    if entry is not None and entry[:2] == (version, user.role):
+        return AccessScope(user.role, entry[2], entry[3])
+    scope = AccessScope.for_user(user)
+    cache.set(entry_key, scope_cache_entry(version, scope), SCOPE_CACHE_TIMEOUT)
+    return scope
+
+async def acached_access_scope(user):
+    version_key, entry_key = scope_cache_keys(user.pk)
+    cache = caches['default']
+    values = await cache.aget_many([version_key, entry_key])
+    version = values.get(version_key, 0)
+    entry = values.get(entry_key)
+    if entry is not None and entry[:2] == (version, user.role):
+        return AccessScope(user.role, entry[2], entry[3])
+    scope = await AccessScope.afor_user(user)
+    await cache.aset(entry_key, scope_cache_entry(version, scope), SCOPE_CACHE_TIMEOUT)
+    return scope
+
+def scope_cache_entry(version, scope):
+    return (version, scope.role, sorted(scope.organization_ids), sorted(scope.city_ids))
+
+def invalidate_access_scope(user_id):
+    """
+    Меняет версию прав пользователя: сразу и ещё раз после фиксации транзакции,
+    чтобы параллельный запрос не закэшировал права, прочитанные до коммита.
+    """
+    version_key, _ = scope_cache_keys(user_id)
+
+    def bump():
+        cache = caches['default']
+        try:
+            cache.incr(version_key)
+        except ValueError:
+            # Версия вытеснена из кэша — начинаем с заведомо новой
+            cache.set(version_key, time.time_ns(), timeout=None)
+    bump()
+    transaction.on_commit(bump)
+
+def access_scope(user):
+    """
+    Права пользователя, вычисленные один раз на объект user — то есть на запрос:
+    request.user создаётся заново для каждого запроса. Между запросами права
+    закупщика берутся из кэша, если он общий; администратору кэш не нужен.
+    """
+    scope = getattr(user, '_access_scope', None)
+    if scope is None or scope.role != user.role:
+        if user.role == 'admin' or user.pk is None or not settings.CACHE_SHARED:
+            scope = AccessScope.for_user(user)
+        else:
+            scope = cached_access_scope(user)
+        user._access_scope = scope
+    return scope
+
+async def aauthenticate(request, query_token=False):
+    """
+    Пользователь запроса для async view: токен DRF (Authorization: Token ...; с
+    query_token — и ?token=, EventSource в браузере не передаёт заголовки) либо
+    сессия. None — не аутентифицирован или отключён.
+    """
+    from django.contrib.auth import get_user
+    from rest_framework.authtoken.models import Token
+
+    key = request.GET.get('token') if query_token else None
+    header = request.headers.get('Authorization', '')
+    if not key and header.startswith('Token '):
+        key = header[len('Token '):].strip()
+    if key:
+        token = await Token.objects.select_related('user').filter(key=key).afirst()
+        user = token.user if token else None
+    else:
+        # Асинхронного get_user в Django 4.2 нет — сессия читается в потоке
+        user = await sync_to_async(get_user)(request)
+    return user if user is not None and user.is_authenticated and user.is_active else None
+
+async def aaccess_scope(user):
+    """
+    access_scope для async view: права вычисляются через async ORM и асинхронный
+    API кэша и запоминаются на user так же, поэтому синхронный код, который
+    затем вызывает access_scope (фильтры, get_queryset), к БД уже не обращается.
+    """
+    scope = getattr(user, '_access_scope', None)
+    if scope is None or scope.role != user.role:
+        if user.role == 'admin' or user.pk is None or not settings.CACHE_SHARED:
+            scope = await AccessScope.afor_user(user)
+        else:
+            scope = await acached_access_scope(user)
+        user._access_scope = scope
+    return scope
+
+def allowed_organization_ids(user):
+    """
+    id организаций, доступных пользователю; None — без ограничений (администратор).
+    """
+    scope = access_scope(user)
+    return None if scope.unrestricted else scope.organization_ids
+
 # Оставим старые декораторы для совместимости, они используются в других местах
 
 def admin_required(view_func):
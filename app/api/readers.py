@@ -0,0 +1,112 @@
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+# Поля, для которых значение из values() нужно привести так же, как это делает DRF;
+# остальные (строки, числа, флаги, id связей) выводятся как есть
+CONVERTED_FIELDS = (
+    serializers.DecimalField, serializers.DateTimeField, serializers.DateField,
+    serializers.TimeField, serializers.FloatField, serializers.DurationField, serializers.UUIDField,
+)
+
+
+class ValuesReader:
+    """
+    Быстрое чтение списков без экземпляров моделей и сериализаторов на строку.
+
+    Колонки строятся по полям сериализатора (с учётом ?fields): поле модели и
+    source вида 'organization.name' читаются через values(), поля-методы —
+    через выражения из value_expressions сериализатора. Результат по форме
+    совпадает с serializer.data. Если у сериализатора есть поля, которые так
+    прочитать нельзя (вложенные объекты, many-to-many), for_serializer
+    возвращает None и view использует обычный путь.
+    """
+    def __init__(self, columns, expressions):
+        # columns: (имя в ответе, ключ в values(), поле DRF для приведения значения или None)
+        self.columns = columns
+        self.expressions = expressions
+
+    @classmethod
+    def for_serializer(cls, serializer):
+        expressions = getattr(serializer, 'value_expressions', {})
+        columns, annotations = [], {}
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if name in expressions:
+                key = f'value_{name}'
+                annotations[key] = expressions[name]
+            elif isinstance(field, (serializers.BaseSerializer, serializers.ManyRelatedField,
+                                    serializers.SerializerMethodField)) or field.source == '*':
+                return None
+            else:
+                # id связи (PrimaryKeyRelatedField) values() возвращает по имени поля
+                key = field.source.replace('.', '__')
+            columns.append((name, key, field if isinstance(field, CONVERTED_FIELDS) else None))
+        return cls(columns, annotations)
+
+    def values(self, queryset, extra=()):
+        """
+        values()-выборка с колонками ответа; extra — служебные поля (ключ пагинации).
+        """
+        lookups = list(dict.fromkeys(
+            [key for _, key, _ in self.columns if key not in self.expressions] + list(extra)
+        ))
+        return queryset.select_related(None).prefetch_related(None).values(*lookups, **self.expressions)
+
+    def represent(self, rows):
+        columns = [(name, key, field and converter(field)) for name, key, field in self.columns]
+        result = []
+        for row in rows:
+            item = {}
+            for name, key, convert in columns:
+                value = row[key]
+                item[name] = value if convert is None or value is None else convert(value)
+            result.append(item)
+        return result
+
+
+def converter(field):
+    """
+    Приведение значения как в field.to_representation. Результаты запоминаются:
+    в выборке много одинаковых цен и дат (прайс-лист загружается одной пачкой).
+    Для дат в ISO 8601 часовой пояс определяется один раз, а не для каждого значения.
+    """
+    convert = field.to_representation
+    if isinstance(field, serializers.DateTimeField):
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if output_format is not None and output_format.lower() == ISO_8601 and field_timezone is not None:
+            def convert(value):
+                if timezone.is_naive(value):
+                    return field.to_representation(value)
+                value = value.astimezone(field_timezone).isoformat()
+                return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    cache = {}
+
+    def cached(value):
+        try:
+            return cache[value]
+        except KeyError:
+            result = cache[value] = convert(value)
+            return result
+    return cached
+
+
+class ValuesListMixin:
+    """
+    Действие list через ValuesReader: тот же JSON, что у сериализатора, без
+    создания моделей. Ставится после миксинов кэша, перед ViewSet.
+    """
+    def list(self, request, *args, **kwargs):
+        reader = ValuesReader.for_serializer(self.get_serializer())
+        if reader is None:
+            return super().list(request, *args, **kwargs)
+        queryset = reader.values(
+            self.filter_queryset(self.get_queryset()), extra=getattr(self, 'keyset_fields', ()),
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(reader.represent(page))
+        return Response(reader.represent(queryset))
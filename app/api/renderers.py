@@ -0,0 +1,44 @@
+import msgpack
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Типы, которые не кодируются напрямую (Decimal, даты, UUID, ленивые строки),
+# приводятся так же, как в стандартном JSONRenderer DRF: ответы не меняются
+encode_default = JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON через orjson. Вывод по содержанию совпадает с JSONRenderer (компактный,
+    без экранирования кириллицы), но кодирование в разы быстрее на больших списках цен.
+    Запрошенный отступ (Accept: application/json; indent=4) обрабатывает JSONRenderer.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        content = orjson.dumps(
+            data, default=encode_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+        # Как JSONRenderer: U+2028 и U+2029 недопустимы в JavaScript-строках
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    MessagePack (Accept: application/msgpack или ?format=msgpack): компактнее JSON
+    для числовых id и больших списков. Decimal и даты — строками, как в JSON.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
@@ -0,0 +1,266 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.core.exceptions import EmptyResultSet
+from django.db.models import Case, F, IntegerField, When
+from django.utils.module_loading import import_string
+from rest_framework import filters
+
+from .permissions import access_scope
+from .stemmer import stem_text
+
+SEARCH_LIMIT = 1000
+
+
+class SearchDocument:
+    """
+    Описание индексируемой модели: поля с текстом и поле организации
+    (по нему результаты ограничиваются доступными закупщику организациями;
+    None — у документа видимость определяется иначе, например городом поставщика).
+    """
+    def __init__(self, kind, code, model_label, fields, organization_field=None):
+        self.kind = kind
+        self.code = code
+        self.model_label = model_label
+        self.fields = fields
+        self.organization_field = organization_field
+
+    @property
+    def model(self):
+        from django.apps import apps
+        return apps.get_model(self.model_label)
+
+    def row(self, obj):
+        return (obj.pk, getattr(obj, self.organization_field) if self.organization_field else None,
+                ' '.join(str(value) for value in (getattr(obj, field) for field in self.fields) if value))
+
+    def rows(self, queryset):
+        """
+        (id, id организации, текст) для индексации выборки.
+        """
+        organization = [self.organization_field] if self.organization_field else []
+        for values in queryset.values_list('pk', *organization, *self.fields).iterator(chunk_size=2000):
+            yield (values[0], values[1] if organization else None,
+                   ' '.join(str(value) for value in values[1 + len(organization):] if value))
+
+
+DOCUMENTS = {
+    document.kind: document for document in (
+        SearchDocument('product', 1, 'api.Product', ('name',), 'organization_id'),
+        SearchDocument('alcohol', 2, 'api.AlcoholProduct', ('name',), 'organization_id'),
+        SearchDocument('supplier', 3, 'api.Supplier', ('name', 'inn', 'contact_info')),
+        SearchDocument('price', 4, 'api.Price', ('manufacturer',)),
+    )
+}
+KIND_COUNT = 8  # rowid в индексе SQLite: id * KIND_COUNT + код документа
+
+
+def document_for(model):
+    for document in DOCUMENTS.values():
+        if document.model_label == model._meta.label:
+            return document
+    return None
+
+
+def index_text(text):
+    """
+    Текст для индекса: основы слов (русский стеммер), через пробел.
+    """
+    return ' '.join(stem_text(text))
+
+
+def match_expression(query):
+    """
+    Запрос FTS5: все основы слов запроса, каждая как префикс («молок»* найдёт
+    «молоко», «молока», «молоком»). Пустая строка — в запросе нет слов.
+    """
+    return ' AND '.join(f'"{token}"*' for token in stem_text(query))
+
+
+class SQLiteSearchBackend:
+    """
+    Индекс в виртуальной таблице FTS5 (создаётся миграцией 0015_search_index).
+    Тексты хранятся приведёнными к основам, результаты упорядочены по bm25.
+    """
+    table = 'api_search_index'
+
+    def index(self, document, rows):
+        rows = [(pk * KIND_COUNT + document.code, organization_id, index_text(text))
+                for pk, organization_id, text in rows]
+        with transaction.atomic(), connection.cursor() as cursor:
+            self._delete(cursor, [rowid for rowid, _, _ in rows])
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, organization_id, body) VALUES (%s, %s, %s)",
+                [row for row in rows if row[2]],
+            )
+
+    def remove(self, document, ids):
+        with connection.cursor() as cursor:
+            self._delete(cursor, [pk * KIND_COUNT + document.code for pk in ids])
+
+    def _delete(self, cursor, rowids):
+        # Удаление по rowid не сканирует индекс; пачками из-за лимита параметров SQLite
+        for start in range(0, len(rowids), 500):
+            chunk = rowids[start:start + 500]
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE rowid IN ({', '.join(['%s'] * len(chunk))})", chunk,
+            )
+
+    def clear(self, document):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid %% %s = %s", [KIND_COUNT, document.code])
+
+    def search(self, document, query, organization_ids=None, limit=SEARCH_LIMIT, queryset=None):
+        """
+        id найденных записей по релевантности. queryset — выборка, доступная
+        пользователю (например, поставщики его городов): ограничение входит в тот же
+        запрос подзапросом по rowid, поэтому limit отсчитывается уже от видимых записей.
+        """
+        expression = match_expression(query)
+        if not expression:
+            return []
+        sql = f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s AND rowid %% %s = %s"
+        params = [expression, KIND_COUNT, document.code]
+        if organization_ids is not None:
+            if not organization_ids:
+                return []
+            sql += f" AND organization_id IN ({', '.join(['%s'] * len(organization_ids))})"
+            params += list(organization_ids)
+        if queryset is not None:
+            rowids = queryset.order_by().annotate(
+                search_rowid=F('pk') * KIND_COUNT + document.code).values('search_rowid')
+            try:
+                subquery, subquery_params = rowids.query.sql_with_params()
+            except EmptyResultSet:
+                return []
+            sql += f" AND rowid IN ({subquery})"
+            params += list(subquery_params)
+        sql += " ORDER BY rank LIMIT %s"
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [limit])
+            return [rowid // KIND_COUNT for rowid, in cursor.fetchall()]
+
+
+class PostgresSearchBackend:
+    """
+    Полнотекстовый поиск PostgreSQL (конфигурация russian) прямо по таблицам
+    моделей: tsvector вычисляется выражением, для которого миграция создаёт
+    GIN-индексы, поэтому отдельная синхронизация не нужна.
+    """
+    config = 'russian'
+
+    def vector(self, document):
+        # То же выражение, что в GIN-индексах миграции 0015_search_index
+        from django.contrib.postgres.search import SearchVector
+        return SearchVector(*document.fields, config=self.config)
+
+    def index(self, document, rows):
+        pass
+
+    def remove(self, document, ids):
+        pass
+
+    def clear(self, document):
+        pass
+
+    def search(self, document, query, organization_ids=None, limit=SEARCH_LIMIT, queryset=None):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        if not query.strip():
+            return []
+        vector = self.vector(document)
+        search_query = SearchQuery(query, config=self.config, search_type='websearch')
+        scope = queryset
+        queryset = document.model.objects.annotate(document=vector).filter(document=search_query)
+        if organization_ids is not None:
+            queryset = queryset.filter(**{f'{document.organization_field}__in': organization_ids})
+        if scope is not None:
+            queryset = queryset.filter(pk__in=scope.order_by().values('pk'))
+        return list(
+            queryset.annotate(rank=SearchRank(vector, search_query))
+            .order_by('-rank').values_list('pk', flat=True)[:limit]
+        )
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+@lru_cache(maxsize=None)
+def _backend(path, vendor):
+    if path:
+        return import_string(path)()
+    backend_class = BACKENDS.get(vendor)
+    return backend_class() if backend_class else None
+
+
+def get_backend():
+    """
+    Бэкенд поиска: settings.SEARCH_BACKEND (путь к классу) или по типу БД.
+    None — полнотекстового поиска нет, используется обычный SearchFilter.
+    """
+    return _backend(getattr(settings, 'SEARCH_BACKEND', None), connection.vendor)
+
+
+def index_objects(model, objects):
+    document, backend = document_for(model), get_backend()
+    if document and backend:
+        backend.index(document, [document.row(obj) for obj in objects])
+
+
+def index_rows(model, rows):
+    document, backend = document_for(model), get_backend()
+    if document and backend:
+        backend.index(document, rows)
+
+
+def remove_objects(model, ids):
+    document, backend = document_for(model), get_backend()
+    if document and backend:
+        backend.remove(document, ids)
+
+
+def rebuild(kinds=None):
+    """
+    Переиндексирует документы заново; возвращает {вид: число записей}.
+    """
+    backend = get_backend()
+    counts = {}
+    for kind in kinds or DOCUMENTS:
+        document = DOCUMENTS[kind]
+        backend.clear(document)
+        rows = list(document.rows(document.model.objects.all()))
+        backend.index(document, rows)
+        counts[kind] = len(rows)
+    return counts
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    ?search= по полнотекстовому индексу для view с search_document (вид документа):
+    найденные записи упорядочены по релевантности (явный ?ordering= её заменяет).
+    Права пользователя (организации, города поставщиков) и фильтры view применяются
+    в самом поиске, до ограничения SEARCH_LIMIT.
+    У остальных view — обычный SearchFilter по search_fields.
+    """
+    def filter_queryset(self, request, queryset, view):
+        document = DOCUMENTS.get(getattr(view, 'search_document', None))
+        backend = get_backend()
+        if document is None or backend is None:
+            return super().filter_queryset(request, queryset, view)
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip():
+            return queryset
+        organization_ids = None
+        if document.organization_field:
+            scope = access_scope(request.user)
+            if not scope.unrestricted:
+                organization_ids = scope.organization_ids
+        ids = backend.search(document, query, organization_ids, SEARCH_LIMIT, queryset=queryset)
+        if not ids:
+            return queryset.none()
+        return queryset.filter(pk__in=ids).order_by(
+            Case(*[When(pk=pk, then=position) for position, pk in enumerate(ids)], output_field=IntegerField())
+        )
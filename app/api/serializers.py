@@ -1,21 +1,99 @@
+from django.db.models import CharField, Value
+from django.db.models.functions import Coalesce, Concat, Trim
 from rest_framework import serializers
 from .models import (
     Organization, City, User, PurchaserProfile, 
     Product, AlcoholProduct, Supplier, Price, 
-    SupplierToken, PriceAlcohol, PriceRequest
+    SupplierToken, PriceAlcohol, PriceRequest, Job
 )
+def query_param_list(request, name):
+    value = request.query_params.get(name, '') if request is not None else ''
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class SparseFieldsMixin:
+    """
+    Выборочные поля для чтения (GET):
+    ?fields=id,name — только перечисленные поля;
+    ?fields=id,prices.price — поля вложенного списка (если его сериализатор с этим миксином);
+    ?include=organization — вместо id связи вложенный объект (связи из includes).
+
+    Параметры читает корневой сериализатор ответа; вложенным он передаёт только
+    их поля из ?fields (nested_fields).
+    related_fields — связи, которые читают SerializerMethodField (для плана запросов view).
+    """
+    includes = {}
+    related_fields = {}
+    nested_fields = None
+
+    def is_response_root(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.nested_fields:
+            return {name: field for name, field in fields.items() if name in self.nested_fields}
+        request = self.context.get('request')
+        if request is None or request.method != 'GET' or not self.is_response_root():
+            return fields
+        model = self.Meta.model
+        included = [name for name in query_param_list(request, 'include') if name in self.includes]
+        for name in included:
+            many = model._meta.get_field(name).many_to_many
+            fields[name] = self.includes[name](many=many, read_only=True)
+        requested, nested = set(), {}
+        for name in query_param_list(request, 'fields'):
+            name, _, subfield = name.partition('.')
+            requested.add(name)
+            if subfield:
+                nested.setdefault(name, set()).add(subfield)
+        if requested:
+            keep = requested | set(included)
+            for name in list(fields):
+                if name not in keep:
+                    del fields[name]
+        for name, subfields in nested.items():
+            child = getattr(fields.get(name), 'child', fields.get(name))
+            if isinstance(child, SparseFieldsMixin):
+                child.nested_fields = subfields
+        return fields
+
+    def related_lookups(self):
+        """
+        Связи, нужные выбранным полям: источники вида 'organization.name',
+        вложенные объекты и related_fields.
+        """
+        lookups = set()
+        for name, field in self.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, (serializers.BaseSerializer, serializers.ManyRelatedField)) and field.source != '*':
+                source = field.source.replace('.', '__')
+                lookups.add(source)
+                nested = getattr(field, 'child', field)
+                if isinstance(nested, SparseFieldsMixin):
+                    lookups.update(f'{source}__{lookup}' for lookup in nested.related_lookups())
+            elif '.' in field.source:
+                lookups.add('__'.join(field.source.split('.')[:-1]))
+            lookups.update(self.related_fields.get(name, ()))
+        return lookups
+
+
 # Простые модели
-class OrganizationSerializer(serializers.ModelSerializer):
+class OrganizationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Organization
         fields = '__all__'
 
-class CitySerializer(serializers.ModelSerializer):
+class CitySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = City
         fields = '__all__'
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 
@@ -44,7 +122,7 @@ class UserCreateSerializer(serializers.ModelSerializer):
         return user
 
 # Профиль закупщика
-class PurchaserProfileSerializer(serializers.ModelSerializer):
+class PurchaserProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # Для чтения - вложенные сериализаторы
     user = UserSerializer(read_only=True)
     organizations = OrganizationSerializer(many=True, read_only=True)
@@ -74,28 +152,31 @@ class PurchaserProfileSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 # Продукты
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     organization_name = serializers.CharField(source='organization.name', 
                                               read_only=True)
+    includes = {'organization': OrganizationSerializer}
 
     class Meta:
         model = Product
         fields = '__all__'
 
 # Алкоголь
-class AlcoholProductSerializer(serializers.ModelSerializer):
+class AlcoholProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     organization_name = serializers.CharField(source='organization.name', 
                                               read_only=True)
+    includes = {'organization': OrganizationSerializer}
 
     class Meta:
         model = AlcoholProduct
         fields = '__all__'
 
 # Поставщики
-class SupplierSerializer(serializers.ModelSerializer):
+class SupplierSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     city_name = serializers.CharField(source='city.name', read_only=True)
     organization_name = serializers.CharField(source='organization.name', 
                                               read_only=True)
+    includes = {'organization': OrganizationSerializer, 'city': CitySerializer}
 
     class Meta:
         model = Supplier
@@ -107,11 +188,12 @@ class SupplierTokenSerializer(serializers.ModelSerializer):
         fields = ['token', 'created_at']
 
 # Цены на продукты
-class PriceSerializer(serializers.ModelSerializer):
+class PriceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', 
                                          read_only=True)
     supplier_name = serializers.CharField(source='supplier.name', 
                                           read_only=True)
+    includes = {'product': ProductSerializer, 'supplier': SupplierSerializer}
 
     class Meta:
         model = Price
@@ -119,22 +201,20 @@ class PriceSerializer(serializers.ModelSerializer):
         read_only_fields = ['date_added', 'date_updated']
 
 # Новый сериализатор для отображения цен поставщиков для конкретного продукта
-class SupplierPriceSerializer(serializers.ModelSerializer):
+class SupplierPriceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     supplier_name = serializers.CharField(source='supplier.name', 
                                           read_only=True)
-    supplier_id = serializers.IntegerField(source='supplier.id', 
-                                           read_only=True)
+    supplier_id = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Price
         fields = ['id', 'price', 'manufacturer', 
                   'date_updated', 'supplier_name', 'supplier_id']
 
-class SupplierPriceAlcoholSerializer(serializers.ModelSerializer):
+class SupplierPriceAlcoholSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     supplier_name = serializers.CharField(source='supplier.name', 
                                           read_only=True)
-    supplier_id = serializers.IntegerField(source='supplier.id', 
-                                           read_only=True)
+    supplier_id = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = PriceAlcohol
@@ -142,37 +222,29 @@ class SupplierPriceAlcoholSerializer(serializers.ModelSerializer):
                   'date_updated', 'supplier_name', 'supplier_id']
 
 # Расширим существующие сериализаторы продуктов для включения цен
-class ProductWithPricesSerializer(serializers.ModelSerializer):
+class ProductWithPricesSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     organization_name = serializers.CharField(source='organization.name', 
                                               read_only=True)
-    prices = serializers.SerializerMethodField() # Динамически получаем цены
+    # Цены читаются из кэша prefetch_related('price_set'), который строит view,
+    # поэтому сериализация не выполняет дополнительных запросов на каждый продукт
+    prices = SupplierPriceSerializer(source='price_set', many=True, read_only=True)
+    includes = {'organization': OrganizationSerializer}
     
     class Meta:
         model = Product
         fields = '__all__' # Или перечислите конкретные поля + 'prices'
-        
-    def get_prices(self, obj):
-        # Получаем цены для текущего продукта
-        prices = Price.objects.filter(product=obj)
-        # Фильтрация по организациям и городам пользователя будет в view
-        serializer = SupplierPriceSerializer(prices, many=True)
-        return serializer.data
-
-class AlcoholProductWithPricesSerializer(serializers.ModelSerializer):
+
+class AlcoholProductWithPricesSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     organization_name = serializers.CharField(source='organization.name', 
                                               read_only=True)
-    prices = serializers.SerializerMethodField()
+    prices = SupplierPriceAlcoholSerializer(source='pricealcohol_set', many=True, read_only=True)
+    includes = {'organization': OrganizationSerializer}
     
     class Meta:
         model = AlcoholProduct
         fields = '__all__'
-        
-    def get_prices(self, obj):
-        prices = PriceAlcohol.objects.filter(alcohol=obj)
-        serializer = SupplierPriceAlcoholSerializer(prices, many=True)
-        return serializer.data
     
-class PriceRequestSerializer(serializers.ModelSerializer):
+class PriceRequestSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     purchaser_name = serializers.CharField(source='purchaser.get_full_name', 
                                            read_only=True)
     purchaser_username = serializers.CharField(source='purchaser.username', 
@@ -184,11 +256,19 @@ class PriceRequestSerializer(serializers.ModelSerializer):
     alcohol_name = serializers.CharField(source='alcohol.name', 
                                          read_only=True, allow_null=True)
     item_name = serializers.SerializerMethodField() # Поле для отображения имени продукта или алкоголя
+    includes = {'supplier': SupplierSerializer, 'product': ProductSerializer, 'alcohol': AlcoholProductSerializer}
+    related_fields = {'item_name': ('product', 'alcohol')}
+    # Те же значения одним SQL-выражением для чтения списков через values() (readers.py)
+    value_expressions = {
+        'purchaser_name': Trim(Concat('purchaser__first_name', Value(' '), 'purchaser__last_name',
+                                      output_field=CharField())),
+        'item_name': Coalesce('product__name', 'alcohol__name', Value("Не указан")),
+    }
     
     class Meta:
         model = PriceRequest
         fields = '__all__'
-        read_only_fields = ['purchaser', 'created_at', 'updated_at'] # purchaser будет устанавливаться в ViewSet
+        read_only_fields = ['purchaser', 'created_at', 'updated_at', 'responded_at', 'response_time'] # purchaser будет устанавливаться в ViewSet
         
     def get_item_name(self, obj):
         """Возвращает имя продукта или алкоголя."""
@@ -210,4 +290,36 @@ class PriceRequestSerializer(serializers.ModelSerializer):
         if product and alcohol:
             raise serializers.ValidationError("Можно запросить цену либо на продукт, либо на алкоголь, но не на оба одновременно.")
             
-        return data
\ No newline at end of file
+        return data
+
+class JobSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = Job
+        exclude = ['params', 'worker']
+        read_only_fields = [field.name for field in Job._meta.fields]
+
+
+class PriceRequestBulkSerializer(serializers.Serializer):
+    """
+    Параметры массового запроса цен (POST /api/price-requests/bulk/).
+    """
+    suppliers = serializers.ListField(child=serializers.IntegerField(), default=list)
+    products = serializers.ListField(child=serializers.IntegerField(), default=list)
+    alcohol = serializers.ListField(child=serializers.IntegerField(), default=list)
+    message = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+
+class PriceRollupSerializer(serializers.Serializer):
+    """
+    Точка временного ряда цен: агрегаты по поставщику за период
+    (для PriceRollup и PriceAlcoholRollup).
+    """
+    supplier_id = serializers.IntegerField()
+    supplier_name = serializers.CharField(source='supplier.name')
+    period_start = serializers.DateField()
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    avg_price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    count = serializers.IntegerField()
@@ -0,0 +1,238 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import caching, comparison, events, notifications, search
+from .autocomplete import autocomplete
+from .permissions import invalidate_access_scope
+from .models import (
+    Organization, City, User, PurchaserProfile, Product, AlcoholProduct, Supplier, Price, PriceAlcohol,
+    PriceRollup, PriceAlcoholRollup, PriceRequest, prices_saved, prices_deleted, price_requests_created
+)
+
+ROLLUPS = {Price: PriceRollup, PriceAlcohol: PriceAlcoholRollup}
+AUTOCOMPLETE_KINDS = {Product: 'product', AlcoholProduct: 'alcohol', Supplier: 'supplier'}
+
+
+@receiver(prices_saved)
+@receiver(prices_deleted)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=AlcoholProduct)
+@receiver(post_delete, sender=AlcoholProduct)
+@receiver(post_save, sender=Supplier)
+@receiver(post_delete, sender=Supplier)
+def invalidate_price_comparison(sender, **kwargs):
+    comparison.invalidate()
+
+
+@receiver(prices_saved)
+def update_price_rollups(sender, rows, created=True, previous=(), **kwargs):
+    rollups = ROLLUPS[sender].objects
+    if created:
+        rollups.add(rows)
+        return
+    # Изменённая запись могла сменить дату или перейти в другую пару — пересчитываем
+    # агрегаты новой и прежней пары целиком
+    item_attr = f'{sender.item_field}_id'
+    for item_id, supplier_id in {(row.item_id, row.supplier_id) for row in rows} | set(previous):
+        rollups.rebuild(**{item_attr: item_id, 'supplier_id': supplier_id})
+
+
+@receiver(prices_saved)
+def resolve_price_requests(sender, rows, created=True, **kwargs):
+    # Изменение уже записанной цены ответом на новый запрос не считается
+    if not created:
+        return
+    answered = []
+    if events.broker.active:
+        answered = list(PriceRequest.objects.answered_by(sender.item_field, rows))
+    PriceRequest.objects.mark_responded(sender.item_field, rows)
+    for price_request in answered:
+        price_request.status = 'responded'
+    publish_price_requests(answered)
+
+
+def supplier_scopes(supplier_ids):
+    """
+    {id поставщика: (id организации, id города)} для адресации событий.
+    """
+    return {
+        pk: (organization_id, city_id) for pk, organization_id, city_id in
+        Supplier.objects.filter(pk__in=set(supplier_ids)).values_list('pk', 'organization_id', 'city_id')
+    }
+
+
+def publish_price_requests(requests):
+    """
+    События об изменении запросов цен подписчикам организации поставщика (после
+    фиксации): как и в API, запрос видят его закупщик и администраторы.
+    """
+    if not requests or not events.broker.active:
+        return
+    suppliers = supplier_scopes(request.supplier_id for request in requests)
+    published = [
+        ('price_request', suppliers.get(request.supplier_id, (None, None))[0], {
+            'id': request.pk, 'status': request.status, 'supplier_id': request.supplier_id,
+            'product_id': request.product_id, 'alcohol_id': request.alcohol_id,
+            'purchaser_id': request.purchaser_id,
+        }, request.purchaser_id)
+        for request in requests
+    ]
+    transaction.on_commit(lambda: events.broker.publish(published))
+
+
+@receiver(prices_saved)
+def publish_prices(sender, rows, **kwargs):
+    # Цены видят закупщики городов поставщика, как в списках цен
+    if not events.broker.active:
+        return
+    suppliers = supplier_scopes(row.supplier_id for row in rows)
+    published = []
+    for row in rows:
+        organization_id, city_id = suppliers.get(row.supplier_id, (None, None))
+        published.append(('price', organization_id, {
+            'kind': sender.item_field, 'id': row.pk, 'item_id': row.item_id, 'supplier_id': row.supplier_id,
+            'price': str(row.price), 'manufacturer': row.manufacturer, 'date_added': row.date_added,
+        }, None, city_id))
+    transaction.on_commit(lambda: events.broker.publish(published))
+
+
+@receiver(price_requests_created)
+def publish_created_price_requests(sender, requests, **kwargs):
+    publish_price_requests(requests)
+
+
+@receiver(post_save, sender=PriceRequest)
+def publish_price_request_status(sender, instance, created, **kwargs):
+    # Созданные запросы публикуются по price_requests_created
+    if not created:
+        publish_price_requests([instance])
+
+
+@receiver(price_requests_created)
+def notify_suppliers(sender, requests, **kwargs):
+    # В той же транзакции, что и запросы: письмо не уйдёт без запроса и наоборот
+    notifications.record(requests)
+
+
+@receiver(prices_deleted)
+def remove_from_price_rollups(sender, rows, **kwargs):
+    rollups = ROLLUPS[sender].objects
+    days = {}
+    for row in rows:
+        days.setdefault((row.item_id, row.supplier_id), set()).add(timezone.localdate(row.date_added))
+    if len(days) == 1:
+        (item_id, supplier_id), pair_days = days.popitem()
+        rollups.recalculate(item_id, supplier_id, pair_days)
+        return
+    # Удалена выборка: агрегаты затронутых пар пересчитываются группировкой на стороне БД
+    rollups.rebuild(**{
+        f'{sender.item_field}_id__in': {item_id for item_id, _ in days},
+        'supplier_id__in': {supplier_id for _, supplier_id in days},
+    })
+
+
+@receiver(post_save, sender=Organization)
+@receiver(post_delete, sender=Organization)
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=AlcoholProduct)
+@receiver(post_delete, sender=AlcoholProduct)
+@receiver(post_save, sender=Supplier)
+@receiver(post_delete, sender=Supplier)
+@receiver(prices_saved)
+@receiver(prices_deleted)
+def invalidate_cached_responses(sender, **kwargs):
+    # Ответы, зависящие от модели (CachedResponseMixin.cache_models), устаревают целиком.
+    # Права пользователя входят в ключ ответа, поэтому их изменения сброса не требуют
+    caching.bump_version(sender)
+
+
+@receiver(m2m_changed, sender=PurchaserProfile.organizations.through)
+@receiver(m2m_changed, sender=PurchaserProfile.cities.through)
+def invalidate_scope_on_profile_links(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        user_ids = [instance.user_id]
+    elif pk_set is not None:
+        user_ids = PurchaserProfile.objects.filter(pk__in=pk_set).values_list('user_id', flat=True)
+    else:
+        # Очистка со стороны организации или города: затронуты все связанные профили
+        field = 'organizations' if sender is PurchaserProfile.organizations.through else 'cities'
+        user_ids = PurchaserProfile.objects.filter(**{field: instance}).values_list('user_id', flat=True)
+    for user_id in user_ids:
+        invalidate_access_scope(user_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_scope_on_role(sender, instance, update_fields=None, **kwargs):
+    # Сохранение только last_login (вход в систему) и т. п. права не меняет
+    if update_fields is None or 'role' in update_fields:
+        invalidate_access_scope(instance.pk)
+
+
+@receiver(post_save, sender=PurchaserProfile)
+@receiver(post_delete, sender=PurchaserProfile)
+def invalidate_scope_on_profile(sender, instance, **kwargs):
+    invalidate_access_scope(instance.user_id)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=AlcoholProduct)
+@receiver(post_save, sender=Supplier)
+def index_for_search(sender, instance, **kwargs):
+    # Индекс в той же БД: запись откатывается вместе с транзакцией
+    search.index_objects(sender, [instance])
+
+
+@receiver(prices_saved)
+def index_prices_for_search(sender, rows, **kwargs):
+    search.index_rows(sender, [(row.pk, None, row.manufacturer) for row in rows])
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=AlcoholProduct)
+@receiver(post_delete, sender=Supplier)
+def remove_from_search(sender, instance, **kwargs):
+    # В том числе при каскадном удалении: записи индекса удаляются по rowid
+    search.remove_objects(sender, [instance.pk])
+
+
+@receiver(prices_deleted)
+def remove_prices_from_search(sender, rows, **kwargs):
+    search.remove_objects(sender, [row.pk for row in rows])
+
+
+@receiver(pre_delete, sender=Product)
+@receiver(pre_delete, sender=Supplier)
+def remove_cascaded_prices_from_search(sender, instance, **kwargs):
+    # Цены удаляются каскадом без сигналов (быстрое удаление Django) —
+    # их записи индекса убираются одним запросом на продукт или поставщика
+    field = 'product' if sender is Product else 'supplier'
+    search.remove_objects(Price, Price.objects.filter(**{field: instance}).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=AlcoholProduct)
+@receiver(post_save, sender=Supplier)
+def update_autocomplete(sender, instance, **kwargs):
+    autocomplete.changed(AUTOCOMPLETE_KINDS[sender], instance.pk, instance.organization_id,
+                         instance.name, getattr(instance, 'city_id', None))
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=AlcoholProduct)
+@receiver(post_delete, sender=Supplier)
+def remove_from_autocomplete(sender, instance, **kwargs):
+    autocomplete.changed(AUTOCOMPLETE_KINDS[sender], instance.pk)
+
+
+@receiver(post_delete, sender=City)
+def invalidate_supplier_autocomplete(sender, **kwargs):
+    # Город поставщиков обнуляется без сигналов (SET_NULL) — индексы загрузятся заново
+    autocomplete.invalidate('supplier')
@@ -0,0 +1,127 @@
+import re
+from functools import lru_cache
+
+# Русский стеммер Snowball (https://snowballstem.org/algorithms/russian/stemmer.html)
+# для поискового индекса: «муки», «мука», «мукой» -> «мук»
+
+VOWELS = frozenset('аеиоуыэюя')
+
+PERFECTIVE_GERUND = (('в', 'вши', 'вшись'), ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'))
+ADJECTIVE = ('ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом',
+             'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею')
+PARTICIPLE = (('ем', 'нн', 'вш', 'ющ', 'щ'), ('ивш', 'ывш', 'ующ'))
+REFLEXIVE = ('ся', 'сь')
+VERB = (('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'),
+        ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй', 'ил', 'ыл', 'им', 'ым', 'ен',
+         'ило', 'ыло', 'ено', 'ят', 'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'))
+NOUN = ('а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и', 'ией', 'ей', 'ой', 'ий', 'й',
+        'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я')
+DERIVATIONAL = ('ость', 'ост')
+SUPERLATIVE = ('ейше', 'ейш')
+
+WORD_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile(r'[а-я]')
+
+
+def _longest(word, endings):
+    match = ''
+    for ending in endings:
+        if len(ending) > len(match) and word.endswith(ending):
+            match = ending
+    return match
+
+
+def _remove_grouped(word, groups):
+    """
+    Самое длинное окончание из двух групп; окончания первой группы
+    удаляются, только если перед ними стоит «а» или «я».
+    Возвращает (слово, удалено ли).
+    """
+    first = _longest(word, groups[0])
+    second = _longest(word, groups[1])
+    if not first and not second:
+        return word, False
+    if len(second) >= len(first):
+        return word[:-len(second)], True
+    if len(word) > len(first) and word[-len(first) - 1] in 'ая':
+        return word[:-len(first)], True
+    return word, False
+
+
+def _regions(word):
+    """
+    Начала областей RV и R2 (индексы в слове).
+    """
+    rv = r1 = r2 = len(word)
+    for i, char in enumerate(word):
+        if char in VOWELS:
+            rv = i + 1
+            break
+    for i in range(1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+@lru_cache(maxsize=65536)
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC_RE.search(word):
+        return word
+    rv_start, r2_start = _regions(word)
+    prefix, rv = word[:rv_start], word[rv_start:]
+
+    # Шаг 1
+    rv, removed = _remove_grouped(rv, PERFECTIVE_GERUND)
+    if not removed:
+        reflexive = _longest(rv, REFLEXIVE)
+        if reflexive:
+            rv = rv[:-len(reflexive)]
+        adjective = _longest(rv, ADJECTIVE)
+        if adjective:
+            rv = rv[:-len(adjective)]
+            rv, _ = _remove_grouped(rv, PARTICIPLE)
+        else:
+            rv, removed = _remove_grouped(rv, VERB)
+            if not removed:
+                noun = _longest(rv, NOUN)
+                if noun:
+                    rv = rv[:-len(noun)]
+
+    # Шаг 2
+    if rv.endswith('и'):
+        rv = rv[:-1]
+
+    # Шаг 3: словообразовательное окончание в R2
+    derivational = _longest(rv, DERIVATIONAL)
+    if derivational and rv_start + len(rv) - len(derivational) >= r2_start:
+        rv = rv[:-len(derivational)]
+
+    # Шаг 4
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    else:
+        superlative = _longest(rv, SUPERLATIVE)
+        if superlative:
+            rv = rv[:-len(superlative)]
+            if rv.endswith('нн'):
+                rv = rv[:-1]
+        elif rv.endswith('ь'):
+            rv = rv[:-1]
+    return prefix + rv
+
+
+def tokenize(text):
+    """
+    Слова текста в нижнем регистре (буквы и цифры), без стемминга.
+    """
+    return WORD_RE.findall((text or '').lower().replace('ё', 'е'))
+
+
+def stem_text(text):
+    return [stem(token) for token in tokenize(text)]
@@ -1,3 +1,1619 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from smtplib import SMTPException
+from unittest import mock
 
-# Create your tests here.
+import msgpack
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.core import mail
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .models import (
+    Organization, City, User, PurchaserProfile,
+    Product, AlcoholProduct, Supplier, Price, PriceAlcohol,
+    CurrentPrice, CurrentPriceAlcohol, Job, PriceRollup, PriceRequest, SupplierNotification
+)
+from . import caching
+from .serializers import ProductSerializer, PriceSerializer, PriceRequestSerializer
+from .comparison import compare_product_prices, rank_offers
+from .jobs import claim_next, enqueue, execute, task
+from .autocomplete import PrefixIndex, autocomplete
+from .events import EventBroker, broker
+from .forms import PriceForm
+from .imports import import_prices
+from .matching import CatalogueMatcher
+from .permissions import access_scope
+from .stemmer import stem
+
+
+class ApiTestCase(TestCase):
+    """
+    Общие данные для тестов API: организация, город, администратор и закупщик.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name="Ресторан")
+        cls.city = City.objects.create(name="Москва")
+        cls.admin = User.objects.create_user(username='admin', password='pass', role='admin')
+        cls.purchaser = User.objects.create_user(username='buyer', password='pass', role='purchaser')
+        profile = PurchaserProfile.objects.create(user=cls.purchaser)
+        profile.organizations.add(cls.organization)
+        profile.cities.add(cls.city)
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+    def create_supplier(self, name="Поставщик", **kwargs):
+        kwargs.setdefault('organization', self.organization)
+        kwargs.setdefault('city', self.city)
+        return Supplier.objects.create(name=name, contact_info="-", inn="1234567890", **kwargs)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class WithPricesQueryCountTests(ApiTestCase):
+    """
+    Количество запросов в with-prices не должно зависеть от размера страницы
+    (кэш ответов отключён, иначе повторный запрос не доходит до БД).
+    """
+    def fill_products(self, count, suppliers):
+        for i in range(count):
+            product = Product.objects.create(name=f"Продукт {i}", unit="кг", organization=self.organization)
+            for supplier in suppliers:
+                Price.objects.create(product=product, supplier=supplier, price=Decimal('10.50'))
+
+    def fill_alcohol(self, count, suppliers):
+        for i in range(count):
+            alcohol = AlcoholProduct.objects.create(name=f"Вино {i}", unit="л", organization=self.organization)
+            for supplier in suppliers:
+                PriceAlcohol.objects.create(alcohol=alcohol, supplier=supplier, price=Decimal('99.90'))
+
+    def count_queries(self, url):
+        # Права пользователя вычисляются один раз на объект user (первый запрос)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def test_product_with_prices_fixed_queries(self):
+        suppliers = [self.create_supplier(f"Поставщик {i}") for i in range(3)]
+        self.client.force_authenticate(self.purchaser)
+
+        self.fill_products(2, suppliers)
+        small, _ = self.count_queries('/api/products/with-prices/')
+        self.fill_products(18, suppliers)
+        large, response = self.count_queries('/api/products/with-prices/')
+
+        self.assertEqual(small, large)
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(len(response.data['results'][0]['prices']), 3)
+        with self.assertNumQueries(large):
+            self.client.get('/api/products/with-prices/')
+
+    def test_alcohol_with_prices_fixed_queries(self):
+        suppliers = [self.create_supplier(f"Поставщик {i}", type='alco') for i in range(3)]
+        self.client.force_authenticate(self.admin)
+
+        self.fill_alcohol(2, suppliers)
+        small, _ = self.count_queries('/api/alcohol-products/with-prices/')
+        self.fill_alcohol(18, suppliers)
+        large, response = self.count_queries('/api/alcohol-products/with-prices/')
+
+        self.assertEqual(small, large)
+        prices = response.data['results'][0]['prices']
+        self.assertEqual(len(prices), 3)
+        self.assertIn(prices[0]['supplier_id'], {s.id for s in suppliers})
+
+
+class CurrentPriceTests(ApiTestCase):
+    """
+    Таблица актуальных предложений поддерживается при любой записи цен.
+    """
+    def setUp(self):
+        super().setUp()
+        self.supplier = self.create_supplier()
+        self.product = Product.objects.create(name="Мука", unit="кг", organization=self.organization)
+        self.now = timezone.now()
+
+    def test_save_keeps_latest_offer(self):
+        new = Price.objects.create(product=self.product, supplier=self.supplier, price=Decimal('20'), date_added=self.now)
+        Price.objects.create(product=self.product, supplier=self.supplier, price=Decimal('10'),
+                             date_added=self.now - timedelta(days=1))
+
+        current = CurrentPrice.objects.get(product=self.product, supplier=self.supplier)
+        self.assertEqual(current.source_id, new.pk)
+        self.assertEqual(current.price, Decimal('20'))
+
+    def test_bulk_create_and_delete(self):
+        old, new = Price.objects.bulk_create([
+            Price(product=self.product, supplier=self.supplier, price=Decimal('10'), date_added=self.now - timedelta(days=1)),
+            Price(product=self.product, supplier=self.supplier, price=Decimal('15'), date_added=self.now),
+        ])
+        self.assertEqual(CurrentPrice.objects.get().source_id, new.pk)
+
+        new.delete()
+        self.assertEqual(CurrentPrice.objects.get().source_id, old.pk)
+
+    def test_move_to_other_product_and_supplier(self):
+        older = Price.objects.create(product=self.product, supplier=self.supplier, price=Decimal('10'),
+                                     date_added=self.now - timedelta(days=1))
+        moved = Price.objects.create(product=self.product, supplier=self.supplier, price=Decimal('12'),
+                                     date_added=self.now)
+        sugar = Product.objects.create(name="Сахар", unit="кг", organization=self.organization)
+        other = self.create_supplier("Другой")
+        self.client.force_authenticate(self.admin)
+
+        response = self.client.patch(f'/api/prices/{moved.pk}/', {'product': sugar.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(CurrentPrice.objects.get(product=self.product).source_id, older.pk)
+        self.assertEqual(CurrentPrice.objects.get(product=sugar).source_id, moved.pk)
+
+        response = self.client.patch(f'/api/prices/{moved.pk}/', {'supplier': other.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(CurrentPrice.objects.filter(product=sugar, supplier=self.supplier).exists())
+        self.assertEqual(CurrentPrice.objects.get(product=sugar, supplier=other).source_id, moved.pk)
+
+    def test_queryset_update(self):
+        older = Price.objects.create(product=self.product, supplier=self.supplier, price=Decimal('10'),
+                                     date_added=self.now - timedelta(days=1))
+        newer = Price.objects.create(product=self.product, supplier=self.supplier, price=Decimal('12'),
+                                     date_added=self.now)
+        Price.objects.filter(pk=newer.pk).update(price=Decimal('13'))
+        self.assertEqual(CurrentPrice.objects.get().price, Decimal('13'))
+        # Последняя запись сдвинута в прошлое — актуальной становится другая
+        Price.objects.filter(pk=newer.pk).update(date_added=self.now - timedelta(days=2))
+        self.assertEqual(CurrentPrice.objects.get().source_id, older.pk)
+        sugar = Product.objects.create(name="Сахар", unit="кг", organization=self.organization)
+        Price.objects.filter(product=self.product).update(product=sugar)
+        self.assertEqual(list(CurrentPrice.objects.values_list('product_id', 'source_id')), [(sugar.pk, older.pk)])
+
+    def test_rebuild_command(self):
+        alcohol = AlcoholProduct.objects.create(name="Вино", unit="л", organization=self.organization)
+        PriceAlcohol.objects.create(alcohol=alcohol, supplier=self.supplier, price=Decimal('5'))
+        Price.objects.create(product=self.product, supplier=self.supplier, price=Decimal('7'))
+        CurrentPrice.objects.all().delete()
+        CurrentPriceAlcohol.objects.all().delete()
+
+        call_command('rebuild_current_prices', stdout=StringIO())
+        self.assertEqual(CurrentPrice.objects.count(), 1)
+        self.assertEqual(CurrentPriceAlcohol.objects.count(), 1)
+
+    def test_latest_endpoint(self):
+        other = self.create_supplier("Другой")
+        Price.objects.create(product=self.product, supplier=self.supplier, price=Decimal('10'),
+                             date_added=self.now - timedelta(days=1))
+        Price.objects.create(product=self.product, supplier=self.supplier, price=Decimal('12'), date_added=self.now)
+        Price.objects.create(product=self.product, supplier=other, price=Decimal('11'), date_added=self.now)
+        self.client.force_authenticate(self.purchaser)
+
+        response = self.client.get(f'/api/products/{self.product.pk}/prices/?latest=1')
+        self.assertEqual(sorted(p['price'] for p in response.data['results']), ['11.00', '12.00'])
+        response = self.client.get(f'/api/products/{self.product.pk}/prices/')
+        self.assertEqual(response.data['count'], 3)
+        response = self.client.get('/api/products/with-prices/?latest=1')
+        self.assertEqual(len(response.data['results'][0]['prices']), 2)
+
+
+class PriceImportTests(ApiTestCase):
+    """
+    Массовый импорт прайс-листа из CSV.
+    """
+    def test_import_reports_row_errors(self):
+        supplier = self.create_supplier()
+        flour = Product.objects.create(name="Мука", unit="кг", organization=self.organization)
+        Product.objects.create(name="Сахар", unit="кг", organization=self.organization)
+        content = (
+            "Наименование;Цена;Производитель\n"
+            "Мука;12,50;Макфа\n"
+            "Сахар;abc;\n"
+            "Соль;5;\n"
+            "Мука;13;\n"
+        ).encode('utf-8')
+        self.client.force_authenticate(self.purchaser)
+
+        response = self.client.post('/api/prices/import/', {
+            'supplier': supplier.pk,
+            'price_file': SimpleUploadedFile('prices.csv', content, content_type='text/csv'),
+        }, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total'], 4)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([e['row'] for e in response.data['errors']], [3, 4, 5])
+        price = Price.objects.get(product=flour, supplier=supplier)
+        self.assertEqual(price.price, Decimal('12.50'))
+        self.assertEqual(price.manufacturer, "Макфа")
+        self.assertEqual(CurrentPrice.objects.get(product=flour).source_id, price.pk)
+
+    def test_cp1251_upload(self):
+        supplier = self.create_supplier()
+        flour = Product.objects.create(name="Мука", unit="кг", organization=self.organization)
+        content = "Наименование;Цена\nМука;12,50\n".encode('cp1251')
+        self.client.force_authenticate(self.purchaser)
+
+        response = self.client.post('/api/prices/import/', {
+            'supplier': supplier.pk,
+            'price_file': SimpleUploadedFile('prices.csv', content, content_type='text/csv'),
+        }, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(Price.objects.get(product=flour).price, Decimal('12.50'))
+
+        response = self.client.post('/api/prices/import/', {
+            'supplier': supplier.pk, 'encoding': 'no-such-codec',
+            'price_file': SimpleUploadedFile('prices.csv', content, content_type='text/csv'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('encoding', response.data)
+
+    def test_decode_error_reported_after_committed_batches(self):
+        supplier = self.create_supplier()
+        Product.objects.create(name="Мука", unit="кг", organization=self.organization)
+        Product.objects.create(name="Сахар", unit="кг", organization=self.organization)
+        content = "Наименование;Цена\nМука;12\nСахар;30\n".encode('utf-8') + "Соль;5\n".encode('cp1251')
+
+        # Начало файла — корректный UTF-8, испорченная строка идёт после первой пачки
+        with mock.patch('api.imports.ENCODING_PROBE', 16):
+            report = import_prices(supplier, BytesIO(content), batch_size=1)
+
+        self.assertEqual(report.created, 2)
+        self.assertEqual([e['row'] for e in report.as_dict()['errors']], [4])
+        self.assertEqual(Price.objects.filter(supplier=supplier).count(), 2)
+
+
+@task('tests.flaky')
+def flaky_task(job, fail_times):
+    if job.attempts <= fail_times:
+        raise RuntimeError("сбой")
+    job.set_progress(1, 1)
+    return {'attempts': job.attempts}
+
+
+class JobTests(ApiTestCase):
+    """
+    Очередь фоновых задач: захват, повторы и просмотр статуса через API.
+    """
+    def run_next(self):
+        job_id = claim_next('test')
+        self.assertIsNotNone(job_id)
+        execute(job_id)
+        return Job.objects.get(pk=job_id)
+
+    def test_retry_then_done(self):
+        enqueue('tests.flaky', {'fail_times': 1}, user=self.purchaser)
+
+        with self.assertLogs('api.jobs', 'ERROR'):
+            job = self.run_next()
+        self.assertEqual(job.status, 'queued')
+        self.assertIsNone(claim_next('test'))  # повтор отложен
+        Job.objects.update(run_after=timezone.now())
+
+        job = self.run_next()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.result, {'attempts': 2})
+        self.assertEqual((job.progress, job.total), (1, 1))
+
+    def test_fails_after_max_attempts(self):
+        enqueue('tests.flaky', {'fail_times': 5}, max_attempts=1)
+        with self.assertLogs('api.jobs', 'ERROR'):
+            job = self.run_next()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn("RuntimeError", job.error)
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_async_import_and_status_endpoint(self):
+        supplier = self.create_supplier()
+        Product.objects.create(name="Мука", unit="кг", organization=self.organization)
+        self.client.force_authenticate(self.purchaser)
+
+        response = self.client.post('/api/prices/import/?async=1', {
+            'supplier': supplier.pk,
+            'price_file': SimpleUploadedFile('prices.csv', "name,price\nМука,10\n".encode('utf-8')),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 202)
+        self.run_next()
+
+        response = self.client.get(f"/api/jobs/{response.data['id']}/")
+        self.assertEqual(response.data['status'], 'done')
+        self.assertEqual(response.data['result']['created'], 1)
+        self.assertEqual(Price.objects.count(), 1)
+
+
+class BestPriceTests(ApiTestCase):
+    """
+    Сравнение актуальных предложений поставщиков.
+    """
+    def test_rank_offers(self):
+        ranked = rank_offers(
+            np.array([2, 1, 1, 1, 2]), np.array([10, 10, 11, 12, 11]),
+            np.array([5.0, 3.0, 1.5, 2.0, 7.0]),
+        )
+        self.assertEqual(ranked['item_ids'].tolist(), [1, 2])
+        self.assertEqual(ranked['min'].tolist(), [1.5, 5.0])
+        self.assertEqual(ranked['second'].tolist(), [2.0, 7.0])
+        self.assertEqual(ranked['spread'].tolist(), [1.5, 2.0])
+        self.assertEqual(ranked['supplier_ids'].tolist(), [11, 10])
+
+    def test_endpoint_scoped_and_invalidated(self):
+        cheap, dear = self.create_supplier("Дешёвый"), self.create_supplier("Дорогой")
+        product = Product.objects.create(name="Мука", unit="кг", organization=self.organization)
+        other = Product.objects.create(name="Чужая мука", unit="кг",
+                                       organization=Organization.objects.create(name="Другая"))
+        Price.objects.create(product=product, supplier=cheap, price=Decimal('10'))
+        Price.objects.create(product=product, supplier=dear, price=Decimal('12'))
+        Price.objects.create(product=other, supplier=cheap, price=Decimal('1'))
+        self.client.force_authenticate(self.purchaser)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get('/api/products/best-prices/')
+        row, = response.data['results']
+        self.assertEqual((row['min_price'], row['second_price'], row['spread']), (10.0, 12.0, 2.0))
+        self.assertEqual(row['best_supplier_name'], "Дешёвый")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Price.objects.create(product=product, supplier=dear, price=Decimal('9'))
+        row, = self.client.get('/api/products/best-prices/').data['results']
+        self.assertEqual(row['best_supplier_id'], dear.pk)
+
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_cached_only_in_shared_cache(self):
+        supplier = self.create_supplier()
+        product = Product.objects.create(name="Мука", unit="кг", organization=self.organization)
+        Price.objects.create(product=product, supplier=supplier, price=Decimal('10'))
+        for shared, expected in ((True, 10.0), (False, 8.0)):
+            with self.subTest(shared=shared), override_settings(CACHE_SHARED=shared):
+                cache.clear()
+                compare_product_prices()
+                # Запись другим процессом: сброс поколения в этом процессе не виден
+                CurrentPrice.objects.update(price=Decimal('8'))
+                self.assertEqual(compare_product_prices()[0]['min_price'], expected)
+                CurrentPrice.objects.update(price=Decimal('10'))
+
+
+class AllocationTests(ApiTestCase):
+    """
+    План закупки с ограничением числа поставщиков.
+    """
+    def test_max_suppliers_and_filters(self):
+        a, b, c = (self.create_supplier(name) for name in ("A", "B", "C"))
+        c.city = City.objects.create(name="Казань")
+        c.save()
+        offers = {
+            "Мука": {a: 10, b: 12, c: 1},
+            "Сахар": {a: 20, b: 15},
+            "Соль": {b: 5, a: 6},
+        }
+        for name, prices in offers.items():
+            product = Product.objects.create(name=name, unit="кг", quantity=10, organization=self.organization)
+            for supplier, price in prices.items():
+                Price.objects.create(product=product, supplier=supplier, price=Decimal(price))
+        # Администратору видны поставщики всех городов
+        self.client.force_authenticate(self.admin)
+
+        response = self.client.get('/api/products/allocation/')
+        self.assertTrue(response.data['optimal'])
+        self.assertEqual(response.data['total_cost'], 210.0)
+
+        response = self.client.get(f'/api/products/allocation/?max_suppliers=1&city={self.city.pk}')
+        self.assertEqual([s['name'] for s in response.data['suppliers']], ["B"])
+        self.assertEqual(response.data['total_cost'], 320.0)
+        self.assertEqual(response.data['uncovered'], [])
+
+        response = self.client.get('/api/products/allocation/?max_suppliers=0')
+        self.assertEqual(response.status_code, 400)
+
+    def test_zero_quantity_without_warnings(self):
+        a, b = self.create_supplier("A"), self.create_supplier("B")
+        flour = Product.objects.create(name="Мука", unit="кг", quantity=0, organization=self.organization)
+        sugar = Product.objects.create(name="Сахар", unit="кг", quantity=5, organization=self.organization)
+        Price.objects.create(product=flour, supplier=a, price=Decimal('10'))
+        Price.objects.create(product=sugar, supplier=b, price=Decimal('3'))
+        self.client.force_authenticate(self.admin)
+        with np.errstate(all='raise'):
+            response = self.client.get('/api/products/allocation/')
+        self.assertEqual(response.data['total_cost'], 15.0)
+
+
+class PriceRollupTests(ApiTestCase):
+    """
+    Агрегаты динамики цен поддерживаются при записи и совпадают с полным пересчётом.
+    """
+    def snapshot(self):
+        return sorted(PriceRollup.objects.values_list(
+            'product_id', 'supplier_id', 'period', 'period_start', 'min_price', 'max_price', 'sum_price', 'count'))
+
+    def test_incremental_matches_rebuild(self):
+        supplier = self.create_supplier()
+        product = Product.objects.create(name="Мука", unit="кг", organization=self.organization)
+        start = timezone.now().replace(year=2025, month=3, day=3, hour=12)
+        prices = [Price.objects.create(product=product, supplier=supplier, price=Decimal(10 + day),
+                                       date_added=start + timedelta(days=day)) for day in range(10)]
+        Price.objects.bulk_create([Price(product=product, supplier=supplier, price=Decimal('30'),
+                                         date_added=start + timedelta(hours=1))])
+        prices[0].delete()
+        prices[1].price = Decimal('5')
+        prices[1].save()
+
+        incremental = self.snapshot()
+        call_command('rebuild_price_rollups', stdout=StringIO())
+        self.assertEqual(incremental, self.snapshot())
+
+        week = PriceRollup.objects.get(period='week', period_start=start.date())
+        self.assertEqual((week.min_price, week.max_price, week.count), (Decimal('5'), Decimal('30'), 7))
+
+    def test_moved_price_leaves_old_pair(self):
+        supplier = self.create_supplier()
+        flour = Product.objects.create(name="Мука", unit="кг", organization=self.organization)
+        sugar = Product.objects.create(name="Сахар", unit="кг", organization=self.organization)
+        day = timezone.now().replace(year=2025, month=5, day=14, hour=12)
+        Price.objects.create(product=flour, supplier=supplier, price=Decimal('10'), date_added=day)
+        moved = Price.objects.create(product=flour, supplier=supplier, price=Decimal('20'),
+                                     date_added=day + timedelta(hours=1))
+
+        moved.product = sugar
+        moved.save()
+        rollups = {product_id: (low, high, count) for product_id, low, high, count in PriceRollup.objects.filter(
+            period='day').values_list('product_id', 'min_price', 'max_price', 'count')}
+        self.assertEqual(rollups, {flour.pk: (Decimal('10'), Decimal('10'), 1),
+                                   sugar.pk: (Decimal('20'), Decimal('20'), 1)})
+        incremental = self.snapshot()
+        call_command('rebuild_price_rollups', stdout=StringIO())
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_price_history_endpoint(self):
+        supplier = self.create_supplier()
+        product = Product.objects.create(name="Мука", unit="кг", organization=self.organization)
+        day = timezone.now().replace(year=2025, month=5, day=14, hour=12)
+        Price.objects.create(product=product, supplier=supplier, price=Decimal('10'), date_added=day)
+        Price.objects.create(product=product, supplier=supplier, price=Decimal('20'), date_added=day + timedelta(days=1))
+        self.client.force_authenticate(self.purchaser)
+
+        response = self.client.get(f'/api/products/{product.pk}/price-history/?period=month&from=2025-01-01&to=2025-12-31')
+        point, = response.data
+        self.assertEqual(point['period_start'], '2025-05-01')
+        self.assertEqual((point['min_price'], point['avg_price'], point['max_price'], point['count']),
+                         ('10.00', '15.00', '20.00', 2))
+        response = self.client.get(f'/api/products/{product.pk}/price-history/?period=year')
+        self.assertEqual(response.status_code, 400)
+
+
+class PriceDeleteTests(ApiTestCase):
+    """
+    Удаление цен выборкой и каскадом: число запросов не зависит от числа цен,
+    актуальные предложения и агрегаты остаются верными.
+    """
+    def fill(self, supplier, products, per_product):
+        start = timezone.now().replace(year=2025, month=3, day=3, hour=12)
+        items = Product.objects.bulk_create(
+            Product(name=f"Продукт {i}", unit="кг", organization=self.organization) for i in range(products))
+        Price.objects.bulk_create(
+            Price(product=product, supplier=supplier, price=Decimal(10 + day), date_added=start + timedelta(days=day))
+            for product in items for day in range(per_product)
+        )
+        return items
+
+    def count_queries(self, func):
+        with CaptureQueriesContext(connection) as context:
+            func()
+        return len(context.captured_queries)
+
+    def test_queries_do_not_grow_with_rows(self):
+        counts = []
+        for products in (2, 20):
+            supplier = self.create_supplier(f"Поставщик {products}")
+            self.fill(supplier, products, 3)
+            counts.append(self.count_queries(lambda: Price.objects.filter(supplier=supplier).delete()))
+        self.assertEqual(counts[0], counts[1])
+
+        counts = []
+        for products in (2, 20):
+            supplier = self.create_supplier(f"Каскад {products}")
+            self.fill(supplier, 1, products)
+            counts.append(self.count_queries(supplier.delete))
+        self.assertEqual(counts[0], counts[1])
+        self.assertFalse(Price.objects.exists())
+
+    def test_bulk_delete_keeps_current_prices_and_rollups(self):
+        supplier = self.create_supplier()
+        products = self.fill(supplier, 3, 5)
+        Price.objects.filter(date_added__day__gte=6).delete()
+
+        self.assertEqual(CurrentPrice.objects.count(), 3)
+        self.assertEqual({current.price for current in CurrentPrice.objects.all()}, {Decimal('12')})
+        incremental = sorted(PriceRollup.objects.values_list(
+            'product_id', 'supplier_id', 'period', 'period_start', 'min_price', 'max_price', 'sum_price', 'count'))
+        call_command('rebuild_price_rollups', stdout=StringIO())
+        self.assertEqual(incremental, sorted(PriceRollup.objects.values_list(
+            'product_id', 'supplier_id', 'period', 'period_start', 'min_price', 'max_price', 'sum_price', 'count')))
+        self.assertEqual(PriceRollup.objects.get(product=products[0], period='month').count, 3)
+
+
+@override_settings(CACHE_SHARED=True)
+class ResponseCacheTests(ApiTestCase):
+    """
+    Кэш ответов справочников: попадание при повторе, сброс после записи.
+    locmem тестового процесса здесь играет роль общего кэша.
+    """
+    def test_hit_and_invalidation(self):
+        supplier = self.create_supplier()
+        product = Product.objects.create(name="Мука", unit="кг", organization=self.organization)
+        self.client.force_authenticate(self.purchaser)
+
+        first = self.client.get('/api/products/with-prices/')
+        second = self.client.get('/api/products/with-prices/')
+        self.assertEqual((first['X-Cache'], second['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(first.data, second.data)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Price.objects.create(product=product, supplier=supplier, price=Decimal('12'))
+        response = self.client.get('/api/products/with-prices/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['prices'][0]['price'], '12.00')
+
+    def test_scoped_by_organizations(self):
+        other = Organization.objects.create(name="Кафе")
+        Product.objects.create(name="Мука", unit="кг", organization=self.organization)
+        Product.objects.create(name="Соль", unit="кг", organization=other)
+
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get('/api/products/').data['count'], 2)
+        self.client.force_authenticate(self.purchaser)
+        response = self.client.get('/api/products/')
+        self.assertEqual((response['X-Cache'], response.data['count']), ('MISS', 1))
+
+        self.client.force_authenticate(self.admin)
+        self.client.get('/api/products/')
+        stats = self.client.get('/api/cache-stats/').data
+        self.assertEqual((stats['product']['hit'], stats['product']['miss']), (1, 2))
+
+    def test_evicted_version_starts_fresh(self):
+        # Версия вытеснена: новая не должна совпасть с прежней, под которой остались ответы
+        with self.captureOnCommitCallbacks(execute=True):
+            caching.bump_version(Product)
+        cache.delete(caching.version_key(Product))
+        with self.captureOnCommitCallbacks(execute=True):
+            caching.bump_version(Product)
+        self.assertGreater(cache.get(caching.version_key(Product)), 2)
+
+    @override_settings(CACHE_SHARED=False)
+    def test_disabled_without_shared_cache(self):
+        # locmem: ответы не кэшируются, а читаются заново
+        product = Product.objects.create(name="Мука", unit="кг", organization=self.organization)
+        self.client.force_authenticate(self.purchaser)
+        self.client.get('/api/products/')
+        Product.objects.filter(pk=product.pk).update(name="Соль")
+        response = self.client.get('/api/products/')
+        self.assertNotIn('X-Cache', response)
+        self.assertEqual(response.data['results'][0]['name'], "Соль")
+
+
+class ConditionalGetTests(ApiTestCase):
+    """
+    Повторный запрос с ETag получает 304 без сериализации, изменение цены меняет ETag.
+    """
+    def test_with_prices_not_modified(self):
+        supplier = self.create_supplier()
+        product = Product.objects.create(name="Мука", unit="кг", organization=self.organization)
+        price = Price.objects.create(product=product, supplier=supplier, price=Decimal('10'))
+        self.client.force_authenticate(self.purchaser)
+
+        response = self.client.get('/api/products/with-prices/')
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        # Только агрегат по выборке — без чтения строк и цен
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/products/with-prices/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        price.delete()
+        response = self.client.get('/api/products/with-prices/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_detail_and_nested_prices(self):
+        supplier = self.create_supplier()
+        product = Product.objects.create(name="Мука", unit="кг", organization=self.organization)
+        Price.objects.create(product=product, supplier=supplier, price=Decimal('10'))
+        self.client.force_authenticate(self.purchaser)
+
+        for url in (f'/api/products/{product.pk}/', f'/api/products/{product.pk}/prices/'):
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        etag = self.client.get(f'/api/products/{product.pk}/prices/')['ETag']
+        Price.objects.create(product=product, supplier=supplier, price=Decimal('11'))
+        response = self.client.get(f'/api/products/{product.pk}/prices/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(CACHE_SHARED=False)
+    def test_supplier_rename_changes_etag(self):
+        # Название поставщика в ответе: ETag меняется по дате изменения поставщика, без
+        # версий моделей в кэше (их сброс ждёт фиксации транзакции и здесь не выполняется)
+        supplier = self.create_supplier()
+        product = Product.objects.create(name="Мука", unit="кг", organization=self.organization)
+        Price.objects.create(product=product, supplier=supplier, price=Decimal('10'))
+        self.client.force_authenticate(self.purchaser)
+
+        for url in (f'/api/products/{product.pk}/prices/', '/api/products/with-prices/'):
+            etag = self.client.get(url)['ETag']
+            supplier.name += " (новое)"
+            supplier.save()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertIn(supplier.name, response.content.decode())
+
+    @override_settings(CACHE_SHARED=False)
+    def test_organization_rename_changes_etag(self):
+        # Версии моделей в кэше процесса не видят переименования в другом процессе:
+        # ETag меняется по дате изменения организации
+        product = Product.objects.create(name="Мука", unit="кг", organization=self.organization)
+        Price.objects.create(product=product, supplier=self.create_supplier(), price=Decimal('10'))
+        self.client.force_authenticate(self.purchaser)
+
+        for url in ('/api/products/', f'/api/products/{product.pk}/', '/api/products/with-prices/'):
+            etag = self.client.get(url)['ETag']
+            self.organization.name += " (новое)"
+            self.organization.save()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertIn(self.organization.name, response.content.decode())
+
+
+class KeysetPaginationTests(ApiTestCase):
+    """
+    Режим ?cursor= обходит все записи без пропусков и повторов, в том числе
+    при одинаковой дате добавления (загрузка прайс-листа одной пачкой).
+    """
+    def test_walk_prices(self):
+        supplier = self.create_supplier()
+        moment = timezone.now()
+        for i in range(3):
+            product = Product.objects.create(name=f"Продукт {i}", unit="кг", organization=self.organization)
+            Price.objects.bulk_create([
+                Price(product=product, supplier=supplier, price=Decimal(day), date_added=moment - timedelta(days=day))
+                for day in range(15)
+            ])
+        self.client.force_authenticate(self.admin)
+
+        seen, pages, url = [], [], '/api/prices/?cursor='
+        while url:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+            self.assertFalse(any('COUNT(' in query['sql'] for query in context.captured_queries))
+            pages.append(response.data)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(len(seen), 45)
+        self.assertEqual(sorted(seen), sorted(Price.objects.values_list('pk', flat=True)))
+        self.assertIsNone(pages[0]['previous'])
+
+        previous = self.client.get(pages[1]['previous']).data
+        self.assertEqual(previous['results'], pages[0]['results'])
+
+    def test_page_numbers_by_default(self):
+        self.client.force_authenticate(self.purchaser)
+        response = self.client.get('/api/price-requests/')
+        self.assertEqual(response.data['count'], 0)
+        response = self.client.get('/api/price-requests/?cursor=')
+        self.assertEqual(response.data, {'next': None, 'previous': None, 'results': []})
+
+    def test_invalid_cursor(self):
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get('/api/prices/?cursor=xyz').status_code, 404)
+
+
+class CatalogueExportTests(ApiTestCase):
+    """
+    Выгрузка каталога: строка на предложение, товары без цен, организации пользователя.
+    """
+    def setUp(self):
+        super().setUp()
+        supplier = self.create_supplier()
+        self.flour = Product.objects.create(name="Мука", unit="кг", organization=self.organization)
+        Product.objects.create(name="Соль", unit="кг", organization=self.organization)
+        Product.objects.create(name="Чужой", unit="кг", organization=Organization.objects.create(name="Кафе"))
+        Price.objects.create(product=self.flour, supplier=supplier, price=Decimal('10.50'),
+                             date_added=timezone.now() - timedelta(days=1))
+        Price.objects.create(product=self.flour, supplier=supplier, price=Decimal('11.00'))
+        self.client.force_authenticate(self.purchaser)
+
+    def test_csv(self):
+        response = self.client.get('/api/products/export/')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertFalse(response.is_async)
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'name', 'unit'])
+        self.assertEqual(len(lines), 4)
+        self.assertEqual([line.split(',')[1] for line in lines[1:]], ["Мука", "Мука", "Соль"])
+
+    def test_not_compressed(self):
+        # Поток отдаётся по мере чтения, без буфера gzip
+        response = self.client.get('/api/products/export/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 4)
+
+    def test_ndjson_latest(self):
+        response = self.client.get('/api/products/export/?as=ndjson&latest=1')
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual([(r['name'], r['price']) for r in records], [("Мука", '11.00'), ("Соль", None)])
+        self.assertEqual(self.client.get('/api/products/export/?as=xml').status_code, 400)
+
+    async def test_asgi_streams_async_iterator(self):
+        # Под ASGI синхронный итератор был бы вычитан целиком до отправки
+        token = await Token.objects.acreate(user=self.purchaser)
+        response = await AsyncClient().get('/api/products/export/',
+                                           headers={'Authorization': f'Token {token.key}'})
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(content.decode('utf-8').splitlines()), 4)
+
+
+class SparseFieldsTests(ApiTestCase):
+    """
+    ?fields сокращает ответ и запросы, ?include подставляет вложенные объекты одним JOIN.
+    """
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            Product.objects.create(name=f"Продукт {i}", unit="кг", organization=self.organization)
+        self.client.force_authenticate(self.admin)
+
+    def test_fields(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/products/?fields=id,name')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name'})
+        self.assertFalse(any('api_organization' in query['sql'] for query in context.captured_queries))
+
+    def test_include(self):
+        supplier = self.create_supplier()
+        product = Product.objects.first()
+        for i in range(3):
+            Price.objects.create(product=product, supplier=supplier, price=Decimal(i + 1),
+                                 date_added=timezone.now() - timedelta(days=i))
+        # Страница: COUNT и выборка цен с продуктом, организацией и поставщиком одним JOIN
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/prices/?include=product,supplier&fields=id,price')
+        row = response.data['results'][0]
+        self.assertEqual(set(row), {'id', 'price', 'product', 'supplier'})
+        self.assertEqual(row['product']['organization_name'], self.organization.name)
+        self.assertEqual(row['supplier']['city_name'], self.city.name)
+
+        response = self.client.get(f'/api/products/{product.pk}/?include=organization')
+        self.assertEqual(response.data['organization']['name'], self.organization.name)
+
+    def test_with_prices(self):
+        supplier = self.create_supplier()
+        Price.objects.create(product=Product.objects.first(), supplier=supplier, price=Decimal('10'))
+        wine = AlcoholProduct.objects.create(name="Вино", unit="л", organization=self.organization)
+        PriceAlcohol.objects.create(alcohol=wine, supplier=supplier, price=Decimal('500'))
+
+        response = self.client.get('/api/products/with-prices/?fields=id,name,prices.price,prices.supplier_name')
+        rows = [row for row in response.data['results'] if row['prices']]
+        self.assertEqual(set(rows[0]), {'id', 'name', 'prices'})
+        self.assertEqual(rows[0]['prices'], [{'price': '10.00', 'supplier_name': supplier.name}])
+
+        # Без цен и организации в ответе: агрегат ETag, COUNT и продукты, без JOIN и prefetch
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/products/with-prices/?fields=id,name')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name'})
+        self.assertEqual(len(context.captured_queries), 3)
+        self.assertFalse(any('api_organization' in query['sql'] for query in context.captured_queries[1:]))
+
+        response = self.client.get('/api/alcohol-products/with-prices/?fields=id,prices&include=organization')
+        row, = response.data['results']
+        self.assertEqual(set(row), {'id', 'prices', 'organization'})
+        self.assertEqual(row['organization']['name'], self.organization.name)
+        self.assertEqual(row['prices'][0]['price'], '500.00')
+
+
+class ValuesReaderTests(ApiTestCase):
+    """
+    Списки через values() совпадают с ответом сериализаторов поле в поле.
+    """
+    def test_same_json_as_serializers(self):
+        supplier = self.create_supplier()
+        self.purchaser.first_name, self.purchaser.last_name = "Иван", "Петров"
+        self.purchaser.save()
+        product = Product.objects.create(name="Мука", unit="кг", organization=self.organization)
+        alcohol = AlcoholProduct.objects.create(name="Вино", unit="л", organization=self.organization)
+        Price.objects.create(product=product, supplier=supplier, price=Decimal('10.5'), manufacturer=None)
+        PriceRequest.objects.create(purchaser=self.purchaser, supplier=supplier, product=product)
+        PriceRequest.objects.create(purchaser=self.purchaser, supplier=supplier, alcohol=alcohol, message="Срочно")
+        self.client.force_authenticate(self.admin)
+
+        request = APIRequestFactory().get('/')
+        context = {'request': Request(request)}
+        # Запросы: COUNT и одна выборка (для продуктов ещё агрегат для ETag) — без запросов на строку
+        cases = [
+            ('/api/products/', Product.objects.all(), ProductSerializer, 3),
+            ('/api/prices/', Price.objects.all(), PriceSerializer, 2),
+            ('/api/price-requests/', PriceRequest.objects.all(), PriceRequestSerializer, 2),
+        ]
+        for url, queryset, serializer_class, queries in cases:
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    response = self.client.get(url)
+                expected = serializer_class(queryset, many=True, context=context).data
+                self.assertEqual(
+                    sorted(response.data['results'], key=lambda row: row['id']),
+                    sorted((dict(row) for row in expected), key=lambda row: row['id']),
+                )
+
+
+class RendererTests(ApiTestCase):
+    """
+    orjson даёт тот же JSON, что и DRF; MessagePack и gzip выбираются по заголовкам запроса.
+    """
+    def setUp(self):
+        super().setUp()
+        supplier = self.create_supplier()
+        for i in range(30):
+            product = Product.objects.create(name=f"Продукт {i} ", unit="кг", organization=self.organization)
+            Price.objects.create(product=product, supplier=supplier, price=Decimal('10.50') + i)
+        self.client.force_authenticate(self.purchaser)
+
+    def test_same_json(self):
+        response = self.client.get('/api/products/with-prices/')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    def test_msgpack(self):
+        response = self.client.get('/api/products/with-prices/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), json.loads(JSONRenderer().render(response.data)))
+
+    def test_gzip(self):
+        response = self.client.get('/api/products/with-prices/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content)), json.loads(JSONRenderer().render(response.data)))
+
+
+class AccessScopeTests(ApiTestCase):
+    """
+    Права закупщика вычисляются одним запросом и переиспользуются в пределах запроса.
+    """
+    def test_single_query(self):
+        other_city = City.objects.create(name="Казань")
+        self.purchaser.purchaser_profile.cities.add(other_city)
+        user = User.objects.get(pk=self.purchaser.pk)
+        with self.assertNumQueries(1):
+            scope = access_scope(user)
+            self.assertIs(access_scope(user), scope)
+        self.assertEqual(scope.organization_ids, {self.organization.pk})
+        self.assertEqual(scope.city_ids, {self.city.pk, other_city.pk})
+        self.assertTrue(access_scope(self.admin).unrestricted)
+
+    def test_nested_prices_and_price_request(self):
+        other = Organization.objects.create(name="Кафе")
+        foreign = Product.objects.create(name="Соль", unit="кг", organization=other)
+        own = Product.objects.create(name="Мука", unit="кг", organization=self.organization)
+        self.client.force_authenticate(self.purchaser)
+        self.assertEqual(self.client.get(f'/api/products/{foreign.pk}/prices/').data['count'], 0)
+        self.assertEqual(self.client.get(f'/api/products/{own.pk}/prices/').status_code, 200)
+
+        foreign_supplier = self.create_supplier(organization=other)
+        with self.assertRaises(ValidationError):
+            PriceRequest(purchaser=self.purchaser, supplier=foreign_supplier, product=own).full_clean()
+        PriceRequest(purchaser=self.purchaser, supplier=self.create_supplier(), product=own).full_clean()
+
+
+@override_settings(CACHE_SHARED=True)
+class AccessScopeCacheTests(ApiTestCase):
+    """
+    Права закупщика берутся из общего кэша без запросов к БД и сбрасываются
+    при изменении организаций профиля и роли; кэш процесса для этого не используется.
+    """
+    def fresh_user(self):
+        return User.objects.get(pk=self.purchaser.pk)
+
+    def test_cached_between_requests(self):
+        access_scope(self.fresh_user())
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertEqual(access_scope(user).organization_ids, {self.organization.pk})
+
+    def test_invalidated_by_profile_and_role(self):
+        access_scope(self.fresh_user())
+        other = Organization.objects.create(name="Кафе")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.purchaser.purchaser_profile.organizations.add(other)
+        self.assertEqual(access_scope(self.fresh_user()).organization_ids, {self.organization.pk, other.pk})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.purchaserprofile_set.clear()
+        self.assertEqual(access_scope(self.fresh_user()).organization_ids, {self.organization.pk})
+
+        user = self.fresh_user()
+        user.role = 'admin'
+        user.save()
+        self.assertTrue(access_scope(self.fresh_user()).unrestricted)
+
+    @override_settings(CACHE_SHARED=False)
+    def test_not_cached_without_shared_cache(self):
+        # Два процесса со своими locmem: сброс версии во втором не виден первому,
+        # поэтому права не кэшируются между запросами
+        worker, other_worker = {'default': LocMemCache('worker', {})}, {'default': LocMemCache('other', {})}
+        with mock.patch('api.permissions.caches', worker):
+            access_scope(self.fresh_user())
+        other = Organization.objects.create(name="Кафе")
+        with mock.patch('api.permissions.caches', other_worker), self.captureOnCommitCallbacks(execute=True):
+            self.purchaser.purchaser_profile.organizations.add(other)
+        with mock.patch('api.permissions.caches', worker):
+            self.assertEqual(access_scope(self.fresh_user()).organization_ids, {self.organization.pk, other.pk})
+
+
+class CitySupplierVisibilityTests(ApiTestCase):
+    """
+    Закупщику видны цены и поставщики только его городов (и поставщики без города).
+    """
+    def setUp(self):
+        super().setUp()
+        self.local = self.create_supplier("Местный")
+        self.remote = self.create_supplier("Иногородний", city=City.objects.create(name="Казань"))
+        self.anywhere = self.create_supplier("Федеральный", city=None)
+        self.product = Product.objects.create(name="Мука", unit="кг", organization=self.organization)
+        for supplier in (self.local, self.remote, self.anywhere):
+            Price.objects.create(product=self.product, supplier=supplier, price=Decimal('10'))
+        self.visible = {self.local.pk, self.anywhere.pk}
+
+    def test_purchaser(self):
+        self.client.force_authenticate(self.purchaser)
+        response = self.client.get('/api/products/with-prices/')
+        self.assertEqual({row['supplier_id'] for row in response.data['results'][0]['prices']}, self.visible)
+        response = self.client.get(f'/api/products/{self.product.pk}/prices/')
+        self.assertEqual({row['supplier_id'] for row in response.data['results']}, self.visible)
+        response = self.client.get('/api/prices/')
+        self.assertEqual({row['supplier'] for row in response.data['results']}, self.visible)
+        response = self.client.get('/api/suppliers/')
+        self.assertEqual({row['id'] for row in response.data['results']}, self.visible)
+
+    def test_purchaser_reports(self):
+        # Выгрузка, сравнение цен и план закупки — по тем же поставщикам, что и списки
+        Price.objects.filter(supplier=self.remote).update(price=Decimal('1'))
+        CurrentPrice.objects.rebuild()
+        Product.objects.create(name="Соль", unit="кг", organization=self.organization)
+        self.client.force_authenticate(self.purchaser)
+
+        response = self.client.get('/api/products/export/?as=ndjson')
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual({r['supplier_id'] for r in records if r['name'] == "Мука"}, self.visible)
+        self.assertEqual([r['supplier_id'] for r in records if r['name'] == "Соль"], [None])
+
+        row, = self.client.get('/api/products/best-prices/').data['results']
+        self.assertIn(row['best_supplier_id'], self.visible)
+        self.assertEqual(row['offers'], 2)
+
+        response = self.client.get('/api/products/allocation/')
+        self.assertTrue({s['id'] for s in response.data['suppliers']} <= self.visible)
+
+    def test_admin_sees_all(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/suppliers/')
+        self.assertEqual(response.data['count'], 3)
+        row, = self.client.get('/api/products/best-prices/').data['results']
+        self.assertEqual(row['offers'], 3)
+
+
+class FullTextSearchTests(ApiTestCase):
+    """
+    ?search= по индексу FTS5 с русским стеммингом, синхронизация сигналами.
+    """
+    def setUp(self):
+        super().setUp()
+        self.milk = Product.objects.create(name="Молоко сгущённое", unit="кг", organization=self.organization)
+        self.flour = Product.objects.create(name="Мука пшеничная", unit="кг", organization=self.organization)
+        other = Organization.objects.create(name="Чужая")
+        self.foreign = Product.objects.create(name="Молоко", unit="л", organization=other)
+        self.client.force_authenticate(self.purchaser)
+
+    def search(self, url, query):
+        response = self.client.get(url, {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_stemmer(self):
+        self.assertEqual({stem(word) for word in ("молоко", "молока", "молоком")}, {"молок"})
+        self.assertEqual(stem("Пшеничная"), "пшеничн")
+
+    def test_word_forms_and_scope(self):
+        self.assertEqual(self.search('/api/products/', "молоком"), [self.milk.pk])
+        self.assertEqual(self.search('/api/products/', "пшеничной муки"), [self.flour.pk])
+        self.assertEqual(self.search('/api/products/', "кефир"), [])
+
+    def test_ranking(self):
+        best = Product.objects.create(name="Молоко", unit="л", organization=self.organization)
+        self.assertEqual(self.search('/api/products/', "молоко"), [best.pk, self.milk.pk])
+
+    def test_index_follows_changes(self):
+        self.flour.name = "Мука ржаная"
+        self.flour.save()
+        self.assertEqual(self.search('/api/products/', "пшеничная"), [])
+        self.assertEqual(self.search('/api/products/', "ржаной"), [self.flour.pk])
+        self.flour.delete()
+        self.assertEqual(self.search('/api/products/', "мука"), [])
+
+    def test_suppliers_and_prices(self):
+        supplier = self.create_supplier("Молочный комбинат")
+        Supplier.objects.create(name="Хлебозавод", contact_info="-", inn="7701234567", organization=self.organization)
+        self.assertEqual(self.search('/api/suppliers/', "1234567890"), [supplier.pk])
+        self.assertEqual(self.search('/api/suppliers/', "молочного"), [supplier.pk])
+        price = Price.objects.create(product=self.milk, supplier=supplier, price=Decimal('10'),
+                                     manufacturer="Простоквашино")
+        self.assertEqual(self.search('/api/prices/', "простоквашина"), [price.pk])
+
+    def test_scope_before_limit(self):
+        # Лучшие совпадения невидимы закупщику и не должны занимать места в пределе поиска
+        kazan = City.objects.create(name="Казань")
+        self.create_supplier("Молочный", city=kazan)
+        visible = self.create_supplier("Молочный комбинат Север")
+        Price.objects.create(product=self.foreign, supplier=visible, price=Decimal('9'), manufacturer="Домик")
+        price = Price.objects.create(product=self.milk, supplier=visible, price=Decimal('10'),
+                                     manufacturer="Домик в деревне")
+        with mock.patch('api.search.SEARCH_LIMIT', 1):
+            self.assertEqual(self.search('/api/suppliers/', "молочный"), [visible.pk])
+            self.assertEqual(self.search(f'/api/products/{self.milk.pk}/prices/', "домик"), [price.pk])
+
+    def test_search_disables_keyset(self):
+        supplier = self.create_supplier()
+        Price.objects.create(product=self.milk, supplier=supplier, price=Decimal('10'), manufacturer="Домик")
+        response = self.client.get('/api/prices/', {'search': "домик", 'cursor': ''})
+        self.assertEqual(response.data['count'], 1)
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM api_search_index")
+        out = StringIO()
+        call_command('rebuild_search_index', 'product', stdout=out)
+        self.assertIn("product — 3", out.getvalue())
+        self.assertEqual(self.search('/api/products/', "мука"), [self.flour.pk])
+
+
+class AutocompleteTests(ApiTestCase):
+    """
+    Подсказки по префиксу из индекса в памяти, обновляемого сигналами.
+    """
+    def setUp(self):
+        super().setUp()
+        autocomplete.indexes.clear()
+        autocomplete.checked.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.milk = Product.objects.create(name="Молоко сгущённое", unit="кг", organization=self.organization)
+            self.flour = Product.objects.create(name="Мука пшеничная", unit="кг", organization=self.organization)
+            Product.objects.create(name="Молоко", unit="л", organization=Organization.objects.create(name="Чужая"))
+        self.client.force_authenticate(self.purchaser)
+
+    def suggest(self, q, kind='product'):
+        response = self.client.get('/api/autocomplete/', {'kind': kind, 'q': q})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_prefix_index(self):
+        index = PrefixIndex([(1, "Сыр российский", None), (2, "Российский сыр", None), (3, "Сырок", None)])
+        self.assertEqual([pk for _, _, pk in index.lookup("сыр")], [1, 3, 2])
+        index.discard(1)
+        index.add(4, "Сыр Ёлкин", None)
+        self.assertEqual([pk for _, _, pk in index.lookup("сыр ел")], [4])
+        self.assertEqual(len(index.state[0]), 5)
+
+    def test_prefix_index_swaps_state(self):
+        # Чтение в другом потоке держит прежнее состояние: изменение не трогает его
+        index = PrefixIndex([(1, "Сыр российский", None), (2, "Сырок", None)])
+        keys, entries = index.state
+        index.discard(1)
+        index.add(3, "Сыр Ёлкин", None)
+        self.assertIsNot(index.state[0], keys)
+        self.assertEqual(keys, [("российский", 1), ("сыр российский", 1), ("сырок", 2)])
+        self.assertEqual(set(entries), {1, 2})
+        self.assertEqual(set(index.state[1]), {2, 3})
+
+    def test_prefix_of_any_word(self):
+        self.assertEqual(self.suggest("мо"), [self.milk.pk])
+        self.assertEqual(self.suggest("сгущ"), [self.milk.pk])
+        self.assertEqual(self.suggest("м"), [self.milk.pk, self.flour.pk])
+        self.assertEqual(self.client.get('/api/autocomplete/', {'kind': 'users'}).status_code, 400)
+
+    @override_settings(CACHE_SHARED=True)
+    def test_incremental_updates(self):
+        self.assertEqual(self.suggest("ржан"), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.flour.name = "Мука ржаная"
+            self.flour.save()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.suggest("ржан"), [self.flour.pk])
+        # Индекс обновлён на месте, а не загружен заново
+        self.assertFalse([q for q in queries.captured_queries if 'api_product' in q['sql']])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.milk.delete()
+        self.assertEqual(self.suggest("мол"), [])
+
+    @override_settings(CACHE_SHARED=True)
+    def test_other_process_changes(self):
+        self.assertEqual(self.suggest("мука"), [self.flour.pk])
+        # Изменение в другом процессе: индекс не обновлялся, но поколение в кэше сменилось
+        Product.objects.filter(pk=self.flour.pk).update(name="Мука ржаная")
+        cache.incr(autocomplete.generation_key('product'))
+        self.assertEqual(self.suggest("ржан"), [self.flour.pk])
+
+    def test_checked_against_db_without_shared_cache(self):
+        # Кэш процесса: изменения других процессов видны по отметке каталога в БД
+        self.assertEqual(self.suggest("мука"), [self.flour.pk])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.suggest("мука"), [self.flour.pk])
+        self.assertEqual(len([q for q in queries.captured_queries if 'api_product' in q['sql']]), 1)
+        Product.objects.filter(pk=self.flour.pk).update(name="Мука ржаная", last_updated=timezone.now())
+        self.assertEqual(self.suggest("ржан"), [self.flour.pk])
+        sugar = Product.objects.bulk_create([Product(name="Сахар", unit="кг", organization=self.organization)])[0]
+        self.assertEqual(self.suggest("сах"), [sugar.pk])
+
+    def test_suppliers_by_city(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            local = self.create_supplier("Молочный завод")
+            self.create_supplier("Молочная ферма", city=City.objects.create(name="Казань"))
+        self.assertEqual(self.suggest("молоч", kind='supplier'), [local.pk])
+
+    def test_form_renders_selected_only(self):
+        html = str(PriceForm(initial={'product': self.flour.pk})['product'])
+        self.assertIn("Мука пшеничная", html)
+        self.assertNotIn("Молоко", html)
+        self.assertIn('data-ajax--url="/api/autocomplete/?kind=product"', html)
+
+
+class SupplierItemMatchingTests(ApiTestCase):
+    """
+    Сопоставление названий из прайс-листа с каталогом и подтверждённые сопоставления.
+    """
+    def setUp(self):
+        super().setUp()
+        self.supplier = self.create_supplier()
+        self.milk = Product.objects.create(name="Молоко пастеризованное 3,2% 1л", unit="шт", organization=self.organization)
+        self.kefir = Product.objects.create(name="Кефир 2,5% 1л", unit="шт", organization=self.organization)
+        self.cheese = Product.objects.create(name="Сыр Российский", unit="кг", organization=self.organization)
+        self.client.force_authenticate(self.purchaser)
+
+    def test_matcher_ranks_candidates(self):
+        matcher = CatalogueMatcher([(1, "Молоко пастеризованное 3,2% 1л"), (2, "Молоко топлёное 4%"), (3, "Сыр")])
+        found = matcher.match(["МОЛОКО 3.2% ПАСТЕРИЗОВАНОЕ, 1 Л", "Гвозди"], min_score=0.1)
+        self.assertEqual([pk for pk, _, _ in found["МОЛОКО 3.2% ПАСТЕРИЗОВАНОЕ, 1 Л"]], [1, 2])
+        self.assertGreater(found["МОЛОКО 3.2% ПАСТЕРИЗОВАНОЕ, 1 Л"][0][2], 0.6)
+        self.assertEqual(found["Гвозди"], [])
+        # Кандидаты ниже порога уверенности не возвращаются
+        self.assertEqual(len(matcher.match(["Молоко 3,2% пастеризованное"])["Молоко 3,2% пастеризованное"]), 1)
+
+    def test_match_and_confirm(self):
+        url = f'/api/suppliers/{self.supplier.pk}/match/'
+        response = self.client.post(url, {'names': ["Сыр российск. весовой", "Кефир 2.5%"]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        cheese, kefir = response.data['results']
+        self.assertEqual(cheese['candidates'][0]['id'], self.cheese.pk)
+        self.assertEqual(kefir['candidates'][0]['id'], self.kefir.pk)
+        self.assertFalse(cheese['confirmed'])
+
+        response = self.client.post(f'/api/suppliers/{self.supplier.pk}/mappings/', {
+            'mappings': [{'name': "Сыр российск. весовой", 'item': self.cheese.pk}],
+        }, format='json')
+        self.assertEqual(response.data, {'saved': 1})
+        response = self.client.post(url, {'names': ["СЫР РОССИЙСК ВЕСОВОЙ"]}, format='json')
+        self.assertTrue(response.data['results'][0]['confirmed'])
+        self.assertEqual(response.data['results'][0]['candidates'], [
+            {'id': self.cheese.pk, 'name': "Сыр Российский", 'score': 1.0},
+        ])
+
+    def test_match_limit(self):
+        url = f'/api/suppliers/{self.supplier.pk}/match/'
+        for limit in (0, -1, "x"):
+            response = self.client.post(url, {'names': ["Сыр"], 'limit': limit}, format='json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_import_uses_confirmed_mappings(self):
+        self.client.post(f'/api/suppliers/{self.supplier.pk}/mappings/', {
+            'mappings': [{'name': "Молоко паст. 3,2%", 'item': self.milk.pk}],
+        }, format='json')
+        report = import_prices(self.supplier, StringIO("name;price\nМолоко паст. 3,2%;80\n"))
+        self.assertEqual(report.created, 1)
+        self.assertTrue(Price.objects.filter(product=self.milk, supplier=self.supplier).exists())
+
+    def test_foreign_catalogue(self):
+        other = Organization.objects.create(name="Чужая")
+        foreign = self.create_supplier("Чужой", organization=other)
+        response = self.client.post(f'/api/suppliers/{foreign.pk}/match/', {'names': ["Сыр"]}, format='json')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.post(f'/api/suppliers/{self.supplier.pk}/mappings/', {
+            'mappings': [{'name': "Сыр", 'item': Product.objects.create(name="Сыр", unit="кг", organization=other).pk}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class PriceRequestFanOutTests(ApiTestCase):
+    """
+    Массовое создание запросов цен: проверка прав множествами и пропуск дублей.
+    """
+    def setUp(self):
+        super().setUp()
+        self.suppliers = [self.create_supplier(f"Поставщик {i}") for i in range(3)]
+        self.products = [
+            Product.objects.create(name=f"Продукт {i}", unit="кг", organization=self.organization) for i in range(4)
+        ]
+        self.wine = AlcoholProduct.objects.create(name="Вино", unit="бут", organization=self.organization)
+        self.client.force_authenticate(self.purchaser)
+
+    def post(self, **data):
+        return self.client.post('/api/price-requests/bulk/', data, format='json')
+
+    def test_creates_cross_product_in_few_queries(self):
+        PriceRequest.objects.create(purchaser=self.purchaser, supplier=self.suppliers[0], product=self.products[0])
+        supplier_ids = [supplier.pk for supplier in self.suppliers]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(suppliers=supplier_ids, products=[p.pk for p in self.products],
+                                 alcohol=[self.wine.pk], message="Прошу цену")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {'created': 14, 'skipped': 1})
+        # Поставщики, продукты, алкоголь, два запроса дублей, вставка запросов (в точке сохранения)
+        # и уведомлений, поиск и вставка задач рассылки
+        self.assertLessEqual(len(queries), 12)
+        self.assertEqual(PriceRequest.objects.filter(purchaser=self.purchaser, status='pending').count(), 15)
+        self.assertEqual(PriceRequest.objects.filter(alcohol=self.wine, message="Прошу цену").count(), 3)
+        # Повторный вызов ничего не создаёт
+        response = self.post(suppliers=supplier_ids, products=[p.pk for p in self.products])
+        self.assertEqual(response.data, {'created': 0, 'skipped': 12})
+
+    def test_rejects_out_of_scope_ids(self):
+        other = Organization.objects.create(name="Чужая")
+        foreign_supplier = self.create_supplier("Чужой", organization=other)
+        remote = self.create_supplier("Иногородний", city=City.objects.create(name="Казань"))
+        foreign_product = Product.objects.create(name="Чужой", unit="кг", organization=other)
+        response = self.post(suppliers=[self.suppliers[0].pk, foreign_supplier.pk, remote.pk],
+                             products=[self.products[0].pk, foreign_product.pk])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'suppliers', 'product'})
+        self.assertFalse(PriceRequest.objects.exists())
+        self.assertEqual(self.post(suppliers=[self.suppliers[0].pk]).status_code, 400)
+
+    def test_rejects_non_list_ids(self):
+        # Строка "12" не разбирается посимвольно в id 1 и 2
+        response = self.post(suppliers=str(self.suppliers[0].pk), products=[self.products[0].pk])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('suppliers', response.data)
+        self.assertEqual(self.post(suppliers=["x"], products=[self.products[0].pk]).status_code, 400)
+        self.assertFalse(PriceRequest.objects.exists())
+
+    def test_pending_checked_inside_transaction(self):
+        with CaptureQueriesContext(connection) as queries:
+            PriceRequest.objects.fan_out(self.purchaser, [self.suppliers[0].pk], [self.products[0].pk])
+        sql = [query['sql'] for query in queries]
+        savepoint = next(i for i, q in enumerate(sql) if q.startswith('SAVEPOINT'))
+        pending = next(i for i, q in enumerate(sql) if '"status" = \'pending\'' in q)
+        self.assertLess(savepoint, pending)
+
+
+class PriceRequestResolutionTests(ApiTestCase):
+    """
+    Запись цен отмечает ожидающие запросы цен как отвеченные.
+    """
+    def setUp(self):
+        super().setUp()
+        self.supplier = self.create_supplier()
+        self.other = self.create_supplier("Другой")
+        self.flour = Product.objects.create(name="Мука", unit="кг", organization=self.organization)
+        self.sugar = Product.objects.create(name="Сахар", unit="кг", organization=self.organization)
+        self.wine = AlcoholProduct.objects.create(name="Вино", unit="бут", organization=self.organization)
+        PriceRequest.objects.fan_out(self.purchaser, [self.supplier.pk, self.other.pk],
+                                     [self.flour.pk, self.sugar.pk], [self.wine.pk])
+        PriceRequest.objects.update(created_at=timezone.now() - timedelta(hours=2))
+
+    def statuses(self):
+        return {
+            (r.supplier_id, r.product_id, r.alcohol_id): r.status for r in PriceRequest.objects.all()
+        }
+
+    def test_single_price(self):
+        Price.objects.create(product=self.flour, supplier=self.supplier, price=Decimal('10'))
+        PriceAlcohol.objects.create(alcohol=self.wine, supplier=self.other, price=Decimal('500'))
+        responded = {key for key, value in self.statuses().items() if value == 'responded'}
+        self.assertEqual(responded, {(self.supplier.pk, self.flour.pk, None), (self.other.pk, None, self.wine.pk)})
+        request = PriceRequest.objects.get(supplier=self.supplier, product=self.flour)
+        self.assertIsNotNone(request.responded_at)
+        self.assertGreaterEqual(request.response_time, timedelta(hours=2))
+
+    def test_bulk_import_uses_one_update(self):
+        content = StringIO("name;price\nМука;10\nСахар;20\n")
+        with CaptureQueriesContext(connection) as queries:
+            import_prices(self.supplier, content)
+        updates = [q for q in queries.captured_queries
+                   if q['sql'].startswith('UPDATE') and 'api_pricerequest' in q['sql']]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(PriceRequest.objects.filter(supplier=self.supplier, status='responded').count(), 2)
+        self.assertEqual(PriceRequest.objects.filter(supplier=self.other, status='pending').count(), 3)
+
+    def test_cancelled_requests_stay_cancelled(self):
+        PriceRequest.objects.filter(product=self.flour).update(status='cancelled')
+        Price.objects.create(product=self.flour, supplier=self.supplier, price=Decimal('10'))
+        self.assertEqual(self.statuses()[(self.supplier.pk, self.flour.pk, None)], 'cancelled')
+
+
+class SupplierNotificationTests(ApiTestCase):
+    """
+    Уведомления поставщиков о запросах цен: запись в outbox вместе с запросами
+    и одно сводное письмо на поставщика, отправляемое фоновой задачей.
+    """
+    def setUp(self):
+        super().setUp()
+        self.supplier = self.create_supplier(email="sales@supplier.ru")
+        self.flour = Product.objects.create(name="Мука", unit="кг", organization=self.organization)
+        self.sugar = Product.objects.create(name="Сахар", unit="кг", organization=self.organization)
+
+    def run_digests(self):
+        Job.objects.filter(status='queued').update(run_after=timezone.now())
+        while (job_id := claim_next('test')) is not None:
+            execute(job_id)
+
+    def test_fan_out_sends_one_digest_per_supplier(self):
+        suppliers = [self.create_supplier(f"Поставщик {i}", email=f"s{i}@example.com") for i in range(15)]
+        products = Product.objects.bulk_create(
+            Product(name=f"Продукт {i}", unit="кг", organization=self.organization) for i in range(200)
+        )
+        PriceRequest.objects.fan_out(self.purchaser, [s.pk for s in suppliers], [p.pk for p in products])
+        # Письма не отправляются при создании запросов — только задачи, по одной на поставщика
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(SupplierNotification.objects.count(), 3000)
+        jobs = Job.objects.filter(name='notifications.send_digest')
+        self.assertEqual(jobs.count(), 15)
+        self.assertTrue(all(job.run_after > timezone.now() for job in jobs))
+
+        self.run_digests()
+        self.assertEqual(len(mail.outbox), 15)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), sorted(s.email for s in suppliers))
+        self.assertEqual(mail.outbox[0].subject, "Новые запросы цен: 200")
+        self.assertFalse(SupplierNotification.objects.filter(sent_at__isnull=True).exists())
+
+    def test_requests_within_window_share_digest(self):
+        PriceRequest.objects.create(purchaser=self.purchaser, supplier=self.supplier, product=self.flour,
+                                    message="Нужна партия 50 кг")
+        cancelled = PriceRequest.objects.create(purchaser=self.purchaser, supplier=self.supplier, product=self.sugar)
+        cancelled.status = 'cancelled'
+        cancelled.save()
+        self.assertEqual(Job.objects.filter(name='notifications.send_digest').count(), 1)
+
+        self.run_digests()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("Мука (закупщик: buyer): Нужна партия 50 кг", mail.outbox[0].body)
+        self.assertNotIn("Сахар", mail.outbox[0].body)
+
+        # После отправки новый запрос планирует новое письмо
+        PriceRequest.objects.create(purchaser=self.purchaser, supplier=self.supplier, product=self.sugar)
+        self.run_digests()
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_smtp_error_is_retried(self):
+        PriceRequest.objects.create(purchaser=self.purchaser, supplier=self.supplier, product=self.flour)
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=SMTPException("недоступен")), self.assertLogs('api.jobs', 'ERROR'):
+            self.run_digests()
+        job = Job.objects.get(name='notifications.send_digest')
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertTrue(SupplierNotification.objects.filter(sent_at__isnull=True).exists())
+
+        self.run_digests()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, 'done')
+
+    def test_no_address_keeps_notifications(self):
+        supplier = self.create_supplier("Без адреса")
+        PriceRequest.objects.create(purchaser=self.purchaser, supplier=supplier, product=self.flour)
+        with self.assertLogs('api.notifications', 'WARNING'):
+            self.run_digests()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertTrue(SupplierNotification.objects.filter(supplier=supplier, sent_at__isnull=True).exists())
+
+        # Адрес появился — следующее письмо включает и ранние запросы
+        supplier.email = "new@supplier.ru"
+        supplier.save()
+        PriceRequest.objects.create(purchaser=self.purchaser, supplier=supplier, product=self.sugar)
+        self.run_digests()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, "Новые запросы цен: 2")
+
+    def test_address_from_contact_info(self):
+        supplier = Supplier(name="Без поля", contact_info="Тел. +7 900 000-00-00, почта: opt@mail.ru")
+        self.assertEqual(supplier.notification_email, "opt@mail.ru")
+        self.assertIsNone(Supplier(name="Без адреса", contact_info="-").notification_email)
+
+
+class EventBrokerTests(TestCase):
+    """
+    Публикация событий подписчикам по организациям, в том числе из другого потока.
+    """
+    async def test_fan_out_by_organization(self):
+        events = EventBroker()
+        first, everything = events.subscribe({1}), events.subscribe()
+        await sync_to_async(events.publish, thread_sensitive=False)([
+            ('price', 1, {'id': 10}), ('price', 2, {'id': 20}),
+        ])
+        first_messages = await first.messages(timeout=1)
+        self.assertEqual(len(first_messages), 1)
+        self.assertIn(b'event: price\ndata: {"id":10}', first_messages[0])
+        self.assertEqual(len(await everything.messages(timeout=1)), 2)
+
+        events.unsubscribe(first)
+        events.unsubscribe(everything)
+        self.assertFalse(events.active)
+
+    async def test_purchaser_and_city_audience(self):
+        events = EventBroker()
+        purchaser = events.subscribe({1}, user_id=7, city_ids={3})
+        admin = events.subscribe()
+        events.publish([
+            ('price_request', 1, {'id': 1}, 7), ('price_request', 1, {'id': 2}, 8),
+            ('price', 1, {'id': 3}, None, 3), ('price', 1, {'id': 4}, None, 4), ('price', 1, {'id': 5}, None, None),
+        ])
+        received = b''.join(await purchaser.messages(timeout=1))
+        self.assertEqual([i for i in range(1, 6) if b'{"id":%d}' % i in received], [1, 3, 5])
+        self.assertEqual(len(await admin.messages(timeout=1)), 5)
+        # Повтор из истории с теми же ограничениями
+        replayed = events.subscribe({1}, last_event_id=events.history[0].id - 1, user_id=8, city_ids={4})
+        received = b''.join(await replayed.messages(timeout=1))
+        self.assertEqual([i for i in range(1, 6) if b'{"id":%d}' % i in received], [2, 4, 5])
+
+    async def test_replay_and_overflow(self):
+        events = EventBroker(history=3)
+        events.publish([('price', 1, {'id': i}) for i in range(5)])
+        last_id = events.history[-2].id
+        # Пропущено последнее событие — повторяется из истории
+        self.assertEqual(len(await events.subscribe({1}, last_event_id=last_id).messages(timeout=1)), 1)
+        # Пропущенные события вытеснены из истории — клиент получает reset
+        messages = await events.subscribe({1}, last_event_id=last_id - 10).messages(timeout=1)
+        self.assertTrue(messages[0].startswith(b'event: reset'))
+
+        subscription = events.subscribe({1})
+        with mock.patch('api.events.MAX_PENDING', 2):
+            for i in range(3):
+                subscription.push(b'data')
+        self.assertTrue((await subscription.messages(timeout=1))[0].startswith(b'event: reset'))
+
+
+class EventStreamTests(ApiTestCase):
+    """
+    Поток событий /api/events/: цены и запросы цен организаций закупщика.
+    """
+    def setUp(self):
+        super().setUp()
+        self.supplier = self.create_supplier()
+        self.foreign_supplier = self.create_supplier(
+            "Чужой", organization=Organization.objects.create(name="Чужая"))
+        self.flour = Product.objects.create(name="Мука", unit="кг", organization=self.organization)
+        self.token = Token.objects.create(user=self.purchaser)
+        self.async_client = AsyncClient()
+
+    def write_prices(self):
+        remote = self.create_supplier("Иногородний", city=City.objects.create(name="Казань"))
+        colleague = User.objects.create_user(username='colleague', password='pass', role='purchaser')
+        with self.captureOnCommitCallbacks(execute=True):
+            Price.objects.create(product=self.flour, supplier=self.foreign_supplier, price=Decimal('9'))
+            # Не видны закупщику: поставщик другого города и чужой запрос цены
+            Price.objects.create(product=self.flour, supplier=remote, price=Decimal('8'))
+            PriceRequest.objects.create(purchaser=colleague, supplier=self.supplier, product=self.flour)
+            PriceRequest.objects.create(purchaser=self.purchaser, supplier=self.supplier, product=self.flour)
+            Price.objects.create(product=self.flour, supplier=self.supplier, price=Decimal('10'))
+
+    async def test_streams_organization_events(self):
+        response = await self.async_client.get(
+            '/api/events/', headers={'Authorization': f'Token {self.token.key}', 'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertNotIn('Content-Encoding', response)
+        content = response.streaming_content
+        try:
+            self.assertTrue((await anext(content)).startswith(b'retry:'))
+            await sync_to_async(self.write_prices)()
+            received = b''
+            while received.count(b'\n\n') < 3:
+                received += await asyncio.wait_for(anext(content), 5)
+        finally:
+            # Как сервер ASGI по завершении ответа
+            await content.aclose()
+            await sync_to_async(response.close)()
+        self.assertEqual(received.count(b'event: price\n'), 1)
+        self.assertEqual(received.count(b'event: price_request\n'), 2)
+        self.assertNotIn(b'"price":"8', received)
+        self.assertIn(b'"kind":"product","id":%d' % (await Price.objects.aget(supplier=self.supplier)).pk, received)
+        self.assertIn(b'"status":"pending"', received)
+        self.assertIn(b'"status":"responded"', received)
+        self.assertFalse(broker.active)
+
+    async def test_rejects_anonymous_and_foreign_organization(self):
+        response = await self.async_client.get('/api/events/')
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get(
+            f'/api/events/?token={self.token.key}&organization={self.foreign_supplier.organization_id}')
+        self.assertEqual(response.status_code, 403)
+
+    def test_requires_asgi(self):
+        self.client.force_authenticate(self.purchaser)
+        self.assertEqual(self.client.get('/api/events/').status_code, 501)
+
+
+
+class AsyncViewTests(ApiTestCase):
+    """
+    Асинхронные списки /api/async/...: тот же JSON, что у синхронных, без синхронного ORM.
+    """
+    def setUp(self):
+        super().setUp()
+        self.supplier = self.create_supplier()
+        self.foreign = Organization.objects.create(name="Чужая")
+        self.flour = Product.objects.create(name="Мука пшеничная", unit="кг", organization=self.organization)
+        Product.objects.create(name="Сахар", unit="кг", organization=self.organization)
+        self.foreign_product = Product.objects.create(name="Соль", unit="кг", organization=self.foreign)
+        self.wine = AlcoholProduct.objects.create(name="Вино", unit="л", organization=self.organization)
+        for price in ('10', '11', '12'):
+            Price.objects.create(product=self.flour, supplier=self.supplier, price=Decimal(price))
+        PriceAlcohol.objects.create(alcohol=self.wine, supplier=self.supplier, price=Decimal('500'))
+        PriceRequest.objects.create(purchaser=self.purchaser, supplier=self.supplier, product=self.flour)
+        self.token = Token.objects.create(user=self.purchaser)
+        self.async_client = AsyncClient()
+
+    def get(self, url, **headers):
+        return self.async_client.get(url, headers={'Authorization': f'Token {self.token.key}', **headers})
+
+    async def assertSameAsSync(self, path):
+        self.client.force_authenticate(self.purchaser)
+        expected = await sync_to_async(self.client.get)(f'/api/{path}')
+        response = await self.get(f'/api/async/{path}')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(json.loads(response.content), expected.json())
+
+    async def test_same_json_as_sync(self):
+        for path in (
+            'products/', 'products/?ordering=-name', 'products/?fields=id,name',
+            'products/?include=organization', 'products/?search=мука',
+            'products/with-prices/', 'alcohol-products/', 'alcohol-products/with-prices/',
+            f'products/{self.flour.pk}/prices/', f'products/{self.flour.pk}/prices/?cursor=',
+            f'products/{self.flour.pk}/prices/?latest=1', f'products/{self.foreign_product.pk}/prices/',
+            f'alcohol-products/{self.wine.pk}/prices/', 'price-requests/', 'price-requests/?cursor=',
+        ):
+            with self.subTest(path=path):
+                await self.assertSameAsSync(path)
+
+    async def test_cursor_and_msgpack(self):
+        await Price.objects.abulk_create([
+            Price(product=self.flour, supplier=self.supplier, price=Decimal(i)) for i in range(20)
+        ])
+        first = (await self.get(f'/api/async/products/{self.flour.pk}/prices/?cursor=')).json()
+        second = (await self.get(first['next'])).json()
+        self.assertEqual(len(first['results']) + len(second['results']), 23)
+        self.assertIsNone(second['next'])
+        response = await self.get('/api/async/products/', Accept='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content)['count'], 2)
+
+    async def test_authentication_and_permissions(self):
+        self.assertEqual((await self.async_client.get('/api/async/products/')).status_code, 401)
+        supplier_user = await User.objects.acreate(username='seller', role='supplier')
+        token = await Token.objects.acreate(user=supplier_user)
+        response = await self.async_client.get(
+            f'/api/async/products/{self.flour.pk}/prices/', headers={'Authorization': f'Token {token.key}'})
+        self.assertEqual(response.status_code, 403)
+        response = await self.get('/api/async/products/?page=9')
+        self.assertEqual(response.status_code, 404)
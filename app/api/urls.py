@@ -1,7 +1,7 @@
 # your_app/urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 
 # Добавим дополнительные роутеры для вложенных ресурсов
 from rest_framework_nested import routers
@@ -16,6 +16,7 @@ router.register(r'alcohol-products', views.AlcoholProductViewSet)
 router.register(r'suppliers', views.SupplierViewSet)
 router.register(r'prices', views.PriceViewSet)
 router.register(r'price-requests', views.PriceRequestViewSet)
+router.register(r'jobs', views.JobViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -32,6 +33,21 @@ alcohol_router.register(r'prices', views.AlcoholPriceViewSet, basename='alcohol-
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('cache-stats/', views.CacheStatsView.as_view(), name='cache-stats'),
+    path('autocomplete/', views.AutocompleteView.as_view(), name='autocomplete'),
+    path('events/', views.event_stream, name='events'),
+    # Асинхронные варианты списков для запуска под ASGI (ответы те же, что без async/)
+    path('async/products/', async_views.ProductListView.as_view(), name='async-products'),
+    path('async/products/with-prices/', async_views.ProductWithPricesView.as_view(),
+         name='async-products-with-prices'),
+    path('async/products/<int:product_pk>/prices/', async_views.ProductPricesView.as_view(),
+         name='async-product-prices'),
+    path('async/alcohol-products/', async_views.AlcoholProductListView.as_view(), name='async-alcohol-products'),
+    path('async/alcohol-products/with-prices/', async_views.AlcoholProductWithPricesView.as_view(),
+         name='async-alcohol-products-with-prices'),
+    path('async/alcohol-products/<int:alcohol_pk>/prices/', async_views.AlcoholPricesView.as_view(),
+         name='async-alcohol-prices'),
+    path('async/price-requests/', async_views.PriceRequestListView.as_view(), name='async-price-requests'),
     path('', include(products_router.urls)), # Включаем вложенные URL
     path('', include(alcohol_router.urls)),  # Включаем вложенные URL
 ]
\ No newline at end of file
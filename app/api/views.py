@@ -4,27 +4,124 @@ from rest_framework.decorators import action
 from rest_framework import status
 from rest_framework.response import Response
 from django.contrib.auth import authenticate, login
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIRequest
 from django.db.models import Prefetch
-from .models import Organization, City, User, PurchaserProfile, Product, AlcoholProduct, Supplier, Price, SupplierToken, PriceAlcohol, PriceRequest
-from .permissions import IsPurchaserOrHigher, IsAdminOrStaff # Импорт разрешений
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from datetime import date, timedelta
+import uuid
+from .models import Organization, City, User, PurchaserProfile, Product, AlcoholProduct, Supplier, Price, SupplierToken, PriceAlcohol, PriceRequest, Job, PriceRollup, PriceAlcoholRollup, period_bounds
+from . import events
+from .allocation import allocate_products, allocate_alcohol
+from .autocomplete import LIMIT as AUTOCOMPLETE_LIMIT, autocomplete
+from .caching import (
+    CachedResponseMixin, ConditionalResponseMixin, cache_response, conditional_response,
+    stats as cache_stats
+)
+from .comparison import compare_product_prices, compare_alcohol_prices
+from .exports import EXPORT_FORMATS, CatalogueExport
+from .forms import PriceBulkForm
+from .imports import import_prices
+from .jobs import enqueue
+from .matching import CATALOGUES, LIMIT as MATCH_LIMIT, confirm_mappings, match_names
+from .pagination import KeysetPagination
+from .readers import ValuesListMixin
+from .permissions import ( # Импорт разрешений
+    IsPurchaserOrHigher, IsAdminOrStaff, aaccess_scope, aauthenticate, access_scope, allowed_organization_ids
+)
 from .serializers import (
     OrganizationSerializer, CitySerializer, UserSerializer, UserCreateSerializer,
     PurchaserProfileSerializer, ProductSerializer, AlcoholProductSerializer,
     SupplierSerializer, PriceSerializer, PriceRequestSerializer, ProductWithPricesSerializer,
-    AlcoholProductWithPricesSerializer, SupplierPriceSerializer, SupplierPriceAlcoholSerializer
+    AlcoholProductWithPricesSerializer, SupplierPriceSerializer, SupplierPriceAlcoholSerializer,
+    JobSerializer, PriceRollupSerializer, PriceRequestBulkSerializer, SparseFieldsMixin
 )
 
-class OrganizationViewSet(viewsets.ModelViewSet):
+def latest_only(request):
+    """
+    Запрошены ли только актуальные предложения (?latest=1) вместо всей истории цен.
+    """
+    return request.query_params.get('latest', '').lower() in ('1', 'true', 'yes')
+
+def run_async(request):
+    """
+    Запрошено ли выполнение тяжёлой операции в фоне (?async=1).
+    """
+    return request.query_params.get('async', '').lower() in ('1', 'true', 'yes')
+
+def with_related(queryset, lookups):
+    """
+    Подключает связи одним JOIN (ForeignKey по всей цепочке) или prefetch_related
+    (обратные и many-to-many связи).
+    """
+    select, prefetch = [], []
+    for lookup in sorted(lookups):
+        model, single = queryset.model, True
+        for part in lookup.split('__'):
+            field = model._meta.get_field(part)
+            single = single and not (field.many_to_many or field.one_to_many)
+            model = field.related_model
+        (select if single else prefetch).append(lookup)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+def with_prices_related(queryset, serializer, relation, prices):
+    """
+    План запросов with-prices по полям ответа (?fields, ?include): связи выбранных
+    полей и, если цены есть в ответе, предзагрузка prices (цены, доступные пользователю)
+    по обратной связи relation.
+    """
+    lookups = {lookup for lookup in serializer.related_lookups() if lookup.split('__')[0] != relation}
+    queryset = with_related(queryset, lookups)
+    if 'prices' in serializer.fields:
+        queryset = queryset.prefetch_related(Prefetch(relation, queryset=prices))
+    return queryset
+
+class SparseFieldsViewMixin:
+    """
+    План запросов list/retrieve по полям ответа (?fields, ?include): загружаются
+    только связи, которые читают выбранные поля сериализатора.
+    """
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        serializer = self.get_serializer()
+        if not isinstance(serializer, SparseFieldsMixin):
+            return queryset
+        return with_related(queryset, serializer.related_lookups())
+
+class OrganizationViewSet(SparseFieldsViewMixin, CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Organization.objects.all()
     serializer_class = OrganizationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_models = (Organization,)
+    cache_scoped = False
+
+    def destroy(self, request, *args, **kwargs):
+        """
+        Удаление организации каскадно удаляет продукты, поставщиков и историю цен;
+        с ?async=1 оно выполняется фоновой задачей.
+        """
+        if run_async(request):
+            organization = self.get_object()
+            job = enqueue('organizations.delete', {'organization_id': organization.pk}, user=request.user)
+            return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+        return super().destroy(request, *args, **kwargs)
 
-class CityViewSet(viewsets.ModelViewSet):
+class CityViewSet(SparseFieldsViewMixin, CachedResponseMixin, viewsets.ModelViewSet):
     queryset = City.objects.all()
     serializer_class = CitySerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_models = (City,)
+    cache_scoped = False
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     permission_classes = [permissions.IsAuthenticated]
 
@@ -33,47 +130,36 @@ class UserViewSet(viewsets.ModelViewSet):
             return UserCreateSerializer
         return UserSerializer
 
-class PurchaserProfileViewSet(viewsets.ReadOnlyModelViewSet):
+class PurchaserProfileViewSet(SparseFieldsViewMixin, viewsets.ReadOnlyModelViewSet):
     queryset = PurchaserProfile.objects.all()
     serializer_class = PurchaserProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
 
 # Модифицируем существующие ViewSet'ы для продуктов и алкоголя
-class ProductViewSet(viewsets.ModelViewSet): # Сделаем только для чтения, если не нужно редактирование через API
+class ProductViewSet(SparseFieldsViewMixin, ConditionalResponseMixin, CachedResponseMixin, ValuesListMixin, viewsets.ModelViewSet): # Сделаем только для чтения, если не нужно редактирование через API
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [IsPurchaserOrHigher] # Используем новое разрешение
+    cache_models = (Product, Organization, Price, Supplier)
+    modified_related = ('organization__last_updated',) # название организации в ответе
+    search_document = 'product' # ?search= — полнотекстовый поиск по названию
 
     def get_queryset(self):
         """
-        Фильтруем продукты в зависимости от роли пользователя.
+        Фильтруем продукты в зависимости от роли пользователя: администратор
+        видит все, закупщик — продукты разрешенных организаций (без профиля
+        закупщика список организаций пуст).
         """
-        user = self.request.user
-        if user.role == 'admin':
-            return Product.objects.all()
-        elif hasattr(user, 'purchaser_profile'):
-            profile = user.purchaser_profile
-            orgs = profile.organizations.all()
-            cities = profile.cities.all()
-            # Продукты из разрешенных организаций
-            return Product.objects.filter(organization__in=orgs)
-        else:
-            # Если у пользователя нет профиля закупщика, но он имеет роль purchaser/chief_purchaser
-            # Можно вернуть пустой queryset или обработать иначе
-            return Product.objects.none()
+        return access_scope(self.request.user).filter(Product.objects.all())
             
     @action(detail=False, methods=['get'], url_path='with-prices')
+    @conditional_response(related='price')
+    @cache_response
     def with_prices(self, request):
         """
         Возвращает список продуктов с ценами от поставщиков.
         """
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        # Предзагрузка цен для оптимизации
-        queryset = queryset.prefetch_related(
-            Prefetch('price_set', queryset=Price.objects.select_related('supplier'))
-        )
-        
+        queryset = self.with_prices_queryset()
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = ProductWithPricesSerializer(page, many=True, context=self.get_serializer_context())
@@ -82,38 +168,74 @@ class ProductViewSet(viewsets.ModelViewSet): # Сделаем только дл
         serializer = ProductWithPricesSerializer(queryset, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
 
-class AlcoholProductViewSet(viewsets.ReadOnlyModelViewSet):
+    def with_prices_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        
+        # Предзагрузка цен для оптимизации
+        prices = access_scope(self.request.user).filter_suppliers(Price.objects.select_related('supplier'))
+        if latest_only(self.request):
+            # Только последние предложения каждого поставщика — через таблицу актуальных цен
+            prices = prices.filter(current_offer__isnull=False)
+        serializer = ProductWithPricesSerializer(context=self.get_serializer_context())
+        return with_prices_related(queryset, serializer, 'price_set', prices)
+
+    @action(detail=False, methods=['get'], url_path='best-prices')
+    def best_prices(self, request):
+        """
+        Сравнение актуальных предложений: минимальная и вторая цены, разброс
+        и самый дешёвый поставщик по каждому продукту доступных организаций.
+        """
+        result = compare_product_prices(allowed_organization_ids(request.user), access_scope(request.user))
+        page = self.paginate_queryset(result)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(result)
+
+    @action(detail=True, methods=['get'], url_path='price-history')
+    def price_history(self, request, pk=None):
+        """
+        Динамика цен продукта по поставщикам (min/avg/max/count за период).
+        """
+        return price_history_response(request, self.get_object(), PriceRollup)
+
+    @action(detail=False, methods=['get'])
+    def allocation(self, request):
+        """
+        План закупки: поставщик для каждого продукта с минимальной общей стоимостью
+        месячной потребности. Параметры: organization, max_suppliers, city, supplier_type.
+        """
+        return allocation_response(request, allocate_products)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Потоковая выгрузка всех доступных продуктов с ценами поставщиков:
+        ?as=csv|ndjson, ?latest=1 — только актуальные предложения.
+        """
+        return export_response(request, self, ('id', 'name', 'unit', 'quantity', 'type'), 'price')
+
+class AlcoholProductViewSet(SparseFieldsViewMixin, ConditionalResponseMixin, CachedResponseMixin, ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = AlcoholProduct.objects.all()
     serializer_class = AlcoholProductSerializer
     permission_classes = [IsPurchaserOrHigher]
+    cache_models = (AlcoholProduct, Organization, PriceAlcohol, Supplier)
+    modified_related = ('organization__last_updated',) # название организации в ответе
+    search_document = 'alcohol'
 
     def get_queryset(self):
         """
         Фильтруем алкогольные продукты в зависимости от роли пользователя.
         """
-        user = self.request.user
-        if user.role == 'admin':
-            return AlcoholProduct.objects.all()
-        elif hasattr(user, 'purchaser_profile'):
-            profile = user.purchaser_profile
-            orgs = profile.organizations.all()
-            # Алкоголь из разрешенных организаций
-            return AlcoholProduct.objects.filter(organization__in=orgs)
-        else:
-            return AlcoholProduct.objects.none()
+        return access_scope(self.request.user).filter(AlcoholProduct.objects.all())
             
     @action(detail=False, methods=['get'], url_path='with-prices')
+    @conditional_response(related='pricealcohol')
+    @cache_response
     def with_prices(self, request):
         """
         Возвращает список алкогольных продуктов с ценами от поставщиков.
         """
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        # Предзагрузка цен
-        queryset = queryset.prefetch_related(
-            Prefetch('pricealcohol_set', queryset=PriceAlcohol.objects.select_related('supplier'))
-        )
-        
+        queryset = self.with_prices_queryset()
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = AlcoholProductWithPricesSerializer(page, many=True, context=self.get_serializer_context())
@@ -122,10 +244,132 @@ class AlcoholProductViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = AlcoholProductWithPricesSerializer(queryset, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
 
-class SupplierViewSet(viewsets.ModelViewSet):
+    def with_prices_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        
+        # Предзагрузка цен
+        prices = access_scope(self.request.user).filter_suppliers(PriceAlcohol.objects.select_related('supplier'))
+        if latest_only(self.request):
+            prices = prices.filter(current_offer__isnull=False)
+        serializer = AlcoholProductWithPricesSerializer(context=self.get_serializer_context())
+        return with_prices_related(queryset, serializer, 'pricealcohol_set', prices)
+
+    @action(detail=False, methods=['get'], url_path='best-prices')
+    def best_prices(self, request):
+        """
+        Сравнение актуальных предложений по алкоголю.
+        """
+        result = compare_alcohol_prices(allowed_organization_ids(request.user), access_scope(request.user))
+        page = self.paginate_queryset(result)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(result)
+
+    @action(detail=True, methods=['get'], url_path='price-history')
+    def price_history(self, request, pk=None):
+        """
+        Динамика цен на алкоголь по поставщикам.
+        """
+        return price_history_response(request, self.get_object(), PriceAlcoholRollup)
+
+    @action(detail=False, methods=['get'])
+    def allocation(self, request):
+        """
+        План закупки алкоголя с минимальной общей стоимостью.
+        """
+        return allocation_response(request, allocate_alcohol)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Потоковая выгрузка алкоголя с ценами поставщиков (параметры как у продуктов).
+        """
+        return export_response(request, self, ('id', 'name', 'unit', 'quantity', 'excise_stamp_required'), 'pricealcohol')
+
+# Окно временного ряда по умолчанию, если не задан параметр from
+HISTORY_WINDOWS = {'day': timedelta(days=90), 'week': timedelta(weeks=52), 'month': timedelta(days=730)}
+
+def price_history_response(request, item, rollup_model):
+    """
+    Временной ряд цен товара из таблицы агрегатов: ?period=day|week|month,
+    from/to (ГГГГ-ММ-ДД), supplier. Объём чтения не зависит от глубины истории.
+    """
+    params = request.query_params
+    period = params.get('period', 'day')
+    if period not in HISTORY_WINDOWS:
+        return Response({'error': 'Неизвестный период.'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        date_to = date.fromisoformat(params['to']) if params.get('to') else timezone.localdate()
+        date_from = date.fromisoformat(params['from']) if params.get('from') else date_to - HISTORY_WINDOWS[period]
+        supplier = int(params['supplier']) if params.get('supplier') else None
+    except ValueError:
+        return Response({'error': 'Некорректные параметры.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    queryset = rollup_model.objects.filter(**{
+        rollup_model.item_field: item, 'period': period,
+        'period_start__gte': period_bounds(period, date_from)[0], 'period_start__lte': date_to,
+    }).select_related('supplier').order_by('period_start', 'supplier_id')
+    if supplier is not None:
+        queryset = queryset.filter(supplier_id=supplier)
+    return Response(PriceRollupSerializer(queryset, many=True).data)
+
+def export_response(request, view, item_columns, prices):
+    """
+    Выгрузка по той же выборке, что и список (организации пользователя и фильтры),
+    с предложениями только видимых пользователю поставщиков.
+    """
+    export_format = request.query_params.get('as', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return Response({'error': 'Неизвестный формат выгрузки.'}, status=status.HTTP_400_BAD_REQUEST)
+    if latest_only(request):
+        prices = 'current_prices'
+    queryset = view.filter_queryset(view.get_queryset())
+    return CatalogueExport(queryset, item_columns, prices, scope=access_scope(request.user)).response(
+        export_format, view.basename, asynchronous=isinstance(request._request, ASGIRequest))
+
+def allocation_response(request, allocate):
+    """
+    Разбирает параметры плана закупки и ограничивает его организациями пользователя
+    и поставщиками его городов.
+    """
+    params = request.query_params
+    organization_ids = allowed_organization_ids(request.user)
+    options = {}
+    try:
+        if params.get('organization'):
+            organization = int(params['organization'])
+            if organization_ids is not None and organization not in organization_ids:
+                return Response({'error': 'Нет доступа к организации.'}, status=status.HTTP_403_FORBIDDEN)
+            organization_ids = [organization]
+        if params.get('max_suppliers'):
+            options['max_suppliers'] = int(params['max_suppliers'])
+            if options['max_suppliers'] < 1:
+                raise ValueError
+        if params.get('city'):
+            options['city_id'] = int(params['city'])
+    except ValueError:
+        return Response({'error': 'Некорректные параметры.'}, status=status.HTTP_400_BAD_REQUEST)
+    if params.get('supplier_type'):
+        if params['supplier_type'] not in dict(Supplier.SUPPLIER_TYPE):
+            return Response({'error': 'Неизвестный тип поставщика.'}, status=status.HTTP_400_BAD_REQUEST)
+        options['supplier_type'] = params['supplier_type']
+    return Response(allocate(organization_ids=organization_ids, scope=access_scope(request.user), **options))
+
+class SupplierViewSet(SparseFieldsViewMixin, CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Supplier.objects.all()
     serializer_class = SupplierSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_models = (Supplier, City, Organization)
+    search_document = 'supplier' # название, ИНН, контакты
+
+    def get_queryset(self):
+        """
+        Закупщик видит поставщиков своих городов (и поставщиков без города).
+        Действие token доступно без авторизации и не ограничивается.
+        """
+        if self.action == 'token':
+            return Supplier.objects.all()
+        return access_scope(self.request.user).filter_suppliers(Supplier.objects.all(), field=None)
 
     @action(detail=True, methods=['get'], permission_classes=[])
     def token(self, request, pk=None):
@@ -133,15 +377,112 @@ class SupplierViewSet(viewsets.ModelViewSet):
         token = SupplierToken.get_or_create_token(supplier)
         return Response({'token': str(token)})
 
-class PriceViewSet(viewsets.ModelViewSet):
+    def catalogue_supplier(self, request):
+        """
+        Поставщик и вид каталога (?kind= или по типу поставщика) для сопоставления
+        названий; ошибка — готовый Response.
+        """
+        supplier = self.get_object()
+        if not access_scope(request.user).allows_organization(supplier.organization_id):
+            return None, None, Response(
+                {'error': 'Нет доступа к каталогу организации.'}, status=status.HTTP_403_FORBIDDEN,
+            )
+        kind = request.data.get('kind') or ('alcohol' if supplier.type == 'alco' else 'product')
+        if kind not in CATALOGUES:
+            return None, None, Response({'error': 'Неизвестный каталог.'}, status=status.HTTP_400_BAD_REQUEST)
+        return supplier, kind, None
+
+    @action(detail=True, methods=['post'])
+    def match(self, request, pk=None):
+        """
+        Кандидаты из каталога для названий прайс-листа поставщика:
+        {"names": [...], "kind": "product"|"alcohol", "limit": 3}. С ?async=1 — фоновая задача.
+        """
+        supplier, kind, error = self.catalogue_supplier(request)
+        if error:
+            return error
+        names = request.data.get('names')
+        try:
+            limit = min(int(request.data.get('limit', MATCH_LIMIT)), 20)
+        except (TypeError, ValueError):
+            limit = None
+        if (not isinstance(names, list) or not all(isinstance(name, str) for name in names)
+                or limit is None or limit < 1):
+            return Response({'error': 'Некорректные параметры.'}, status=status.HTTP_400_BAD_REQUEST)
+        if run_async(request):
+            job = enqueue('suppliers.match', {
+                'supplier_id': supplier.pk, 'names': names, 'kind': kind, 'limit': limit,
+            }, user=request.user, max_attempts=1)
+            return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+        return Response({'results': match_names(supplier, names, kind, limit)})
+
+    @action(detail=True, methods=['post'])
+    def mappings(self, request, pk=None):
+        """
+        Подтверждает сопоставления: {"kind": ..., "mappings": [{"name": ..., "item": id}]}.
+        Запомненные названия при следующем сопоставлении и импорте прайс-листа
+        разрешаются сразу.
+        """
+        supplier, kind, error = self.catalogue_supplier(request)
+        if error:
+            return error
+        try:
+            pairs = [(str(row['name']), int(row['item'])) for row in request.data.get('mappings', [])]
+        except (KeyError, TypeError, ValueError):
+            return Response({'error': 'Некорректные параметры.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            saved = confirm_mappings(supplier, pairs, kind, user=request.user)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'saved': saved}, status=status.HTTP_201_CREATED)
+
+class PriceViewSet(SparseFieldsViewMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = Price.objects.all()
     serializer_class = PriceSerializer
     permission_classes = [permissions.IsAuthenticated]
+    search_document = 'price' # по производителю
+    pagination_class = KeysetPagination # ?cursor= — постраничный вывод по ключу
+    keyset_fields = ('date_added', 'id')
+
+    def get_queryset(self):
+        """
+        Цены поставщиков из городов закупщика.
+        """
+        return access_scope(self.request.user).filter_suppliers(Price.objects.all())
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        """
+        Массовая загрузка прайс-листа поставщика из CSV (форма PriceBulkForm).
+        Возвращает отчёт с количеством созданных цен и ошибками по строкам.
+        """
+        form = PriceBulkForm(request.POST, request.FILES, user=request.user)
+        if not form.is_valid():
+            return Response(form.errors, status=status.HTTP_400_BAD_REQUEST)
+        if run_async(request):
+            # Файл сохраняется в хранилище, импорт выполнит обработчик run_jobs
+            path = default_storage.save(f"imports/{uuid.uuid4().hex}.csv", form.cleaned_data['price_file'])
+            job = enqueue('prices.import', {
+                'supplier_id': form.cleaned_data['supplier'].pk, 'path': path,
+                'encoding': form.cleaned_data['encoding'],
+            }, user=request.user, max_attempts=1)
+            return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+        try:
+            report = import_prices(form.cleaned_data['supplier'], form.cleaned_data['price_file'],
+                                   encoding=form.cleaned_data['encoding'])
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report.as_dict(), status=status.HTTP_201_CREATED)
 
 # Добавим ViewSet для получения цен по конкретному продукту/алкоголю
-class ProductPriceViewSet(viewsets.ReadOnlyModelViewSet):
+class ProductPriceViewSet(SparseFieldsViewMixin, ConditionalResponseMixin, ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = SupplierPriceSerializer
     permission_classes = [IsPurchaserOrHigher]
+    modified_field = 'date_updated'
+    modified_related = ('supplier__last_updated',)
+    pagination_class = KeysetPagination
+    keyset_fields = ('date_added', 'id')
+    search_document = 'price'
     
     def get_queryset(self):
         """
@@ -159,18 +500,28 @@ class ProductPriceViewSet(viewsets.ReadOnlyModelViewSet):
             return Price.objects.none()
             
         # Проверка доступа к продукту
-        if user.role == 'admin':
-            return Price.objects.filter(product=product)
-        elif hasattr(user, 'purchaser_profile'):
-            profile = user.purchaser_profile
-            if product.organization in profile.organizations.all():
-                return Price.objects.filter(product=product)
-                
+        if access_scope(user).allows_organization(product.organization_id):
+            return self.prices_for(product)
         return Price.objects.none()
 
-class AlcoholPriceViewSet(viewsets.ReadOnlyModelViewSet):
+    def prices_for(self, product):
+        """
+        История цен по продукту или, с ?latest=1, только актуальные предложения
+        (поиск по индексу таблицы CurrentPrice).
+        """
+        if latest_only(self.request):
+            prices = Price.objects.filter(current_offer__product=product)
+        else:
+            prices = Price.objects.filter(product=product)
+        return access_scope(self.request.user).filter_suppliers(prices.select_related('supplier'))
+
+class AlcoholPriceViewSet(SparseFieldsViewMixin, ConditionalResponseMixin, ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = SupplierPriceAlcoholSerializer
     permission_classes = [IsPurchaserOrHigher]
+    modified_field = 'date_updated'
+    modified_related = ('supplier__last_updated',)
+    pagination_class = KeysetPagination
+    keyset_fields = ('date_added', 'id')
     
     def get_queryset(self):
         """
@@ -188,19 +539,24 @@ class AlcoholPriceViewSet(viewsets.ReadOnlyModelViewSet):
             return PriceAlcohol.objects.none()
             
         # Проверка доступа к алкоголю
-        if user.role == 'admin':
-            return PriceAlcohol.objects.filter(alcohol=alcohol)
-        elif hasattr(user, 'purchaser_profile'):
-            profile = user.purchaser_profile
-            if alcohol.organization in profile.organizations.all():
-                return PriceAlcohol.objects.filter(alcohol=alcohol)
-                
+        if access_scope(user).allows_organization(alcohol.organization_id):
+            return self.prices_for(alcohol)
         return PriceAlcohol.objects.none()
+
+    def prices_for(self, alcohol):
+        if latest_only(self.request):
+            prices = PriceAlcohol.objects.filter(current_offer__alcohol=alcohol)
+        else:
+            prices = PriceAlcohol.objects.filter(alcohol=alcohol)
+        return access_scope(self.request.user).filter_suppliers(prices.select_related('supplier'))
     
-class PriceRequestViewSet(viewsets.ModelViewSet):
+class PriceRequestViewSet(SparseFieldsViewMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = PriceRequest.objects.all()
     serializer_class = PriceRequestSerializer
     permission_classes = [permissions.IsAuthenticated] # Используем базовое разрешение, логика фильтрации внутри
+    pagination_class = KeysetPagination
+    keyset_fields = ('created_at', 'id')
+    max_fan_out = 10000 # пар (поставщик, товар) в одном вызове bulk
     
     def get_queryset(self):
         """
@@ -221,6 +577,32 @@ class PriceRequestViewSet(viewsets.ModelViewSet):
         Автоматически устанавливаем закупщика при создании запроса.
         """
         serializer.save(purchaser=self.request.user)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Запросы цен на все товары у всех поставщиков одним вызовом:
+        {"suppliers": [...], "products": [...], "alcohol": [...], "message": "..."}.
+        Уже ожидающие ответа пары пропускаются.
+        """
+        params = PriceRequestBulkSerializer(data=request.data)
+        if not params.is_valid():
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        ids = params.validated_data
+        pairs = len(set(ids['suppliers'])) * (len(set(ids['products'])) + len(set(ids['alcohol'])))
+        if not pairs:
+            return Response({'error': 'Укажите поставщиков и товары.'}, status=status.HTTP_400_BAD_REQUEST)
+        if pairs > self.max_fan_out:
+            return Response({'error': f'Не более {self.max_fan_out} запросов за один вызов.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            result = PriceRequest.objects.fan_out(
+                request.user, ids['suppliers'], ids['products'], ids['alcohol'],
+                message=ids.get('message') or None,
+            )
+        except ValidationError as e:
+            return Response(e.message_dict, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_201_CREATED)
         
     def update(self, request, *args, **kwargs):
         """
@@ -263,4 +645,114 @@ class PriceRequestViewSet(viewsets.ModelViewSet):
             return Response(
                 {'error': 'У вас нет прав для отмены этого запроса.'}, 
                 status=status.HTTP_403_FORBIDDEN
-            )
\ No newline at end of file
+            )
+
+class JobViewSet(SparseFieldsViewMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Статус и прогресс фоновых задач. Пользователь видит только свои задачи.
+    """
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.role == 'admin':
+            return Job.objects.all()
+        return Job.objects.filter(created_by=user)
+
+    @action(detail=False, methods=['post'], url_path='rebuild-current-prices', permission_classes=[IsAdminOrStaff])
+    def rebuild_current_prices(self, request):
+        """
+        Ставит в очередь пересчёт таблиц актуальных предложений.
+        """
+        job = enqueue('prices.rebuild_current', user=request.user)
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+class CacheStatsView(generics.GenericAPIView):
+    """
+    Счётчики попаданий и промахов кэша ответов по эндпоинтам.
+    """
+    permission_classes = [IsAdminOrStaff]
+    basenames = ('organization', 'city', 'product', 'alcoholproduct', 'supplier')
+
+    def get(self, request):
+        return Response(cache_stats(self.basenames))
+
+
+class AutocompleteView(generics.GenericAPIView):
+    """
+    Подсказки для полей выбора в формате select2: ?kind=product|alcohol|supplier,
+    ?q= (или ?term=) — начало любого слова названия, ?organization= — одна
+    организация (по умолчанию все доступные). Ответ строится по индексу в памяти.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        params = request.query_params
+        kind = params.get('kind')
+        if kind not in autocomplete.sources:
+            return Response({'error': 'Неизвестный вид подсказок.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            organization = int(params['organization']) if params.get('organization') else None
+            limit = min(int(params.get('limit', AUTOCOMPLETE_LIMIT)), 50)
+        except ValueError:
+            return Response({'error': 'Некорректные параметры.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        scope = access_scope(request.user)
+        if organization is not None:
+            organization_ids = [organization] if scope.allows_organization(organization) else []
+        elif scope.unrestricted:
+            organization_ids = Organization.objects.values_list('pk', flat=True)
+        else:
+            organization_ids = sorted(scope.organization_ids)
+        # Поставщики, как и в списке, ограничены городами закупщика
+        city_ids = scope.city_ids if kind == 'supplier' and not scope.unrestricted and scope.city_ids else None
+
+        found = autocomplete.lookup(kind, organization_ids, params.get('q', params.get('term', '')), limit, city_ids)
+        return Response({
+            'results': [
+                {'id': pk, 'text': name, 'organization': organization_id}
+                for _, name, pk, organization_id in found
+            ],
+            'pagination': {'more': False},
+        })
+
+
+async def event_stream(request):
+    """
+    Поток событий (server-sent events): новые цены поставщиков видимых городов
+    (event: price) и изменения своих запросов цен (event: price_request)
+    организаций закупщика; ?organization= —
+    одна организация. event: reset — часть событий потеряна, данные нужно
+    перечитать. Работает только под ASGI (app.asgi:application).
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Поток событий доступен только при запуске через ASGI.'}, status=501)
+    user = await aauthenticate(request, query_token=True)
+    if user is None:
+        return JsonResponse({'error': 'Требуется аутентификация.'}, status=401)
+    scope = await aaccess_scope(user)
+    try:
+        organization = int(request.GET['organization']) if request.GET.get('organization') else None
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return JsonResponse({'error': 'Некорректные параметры.'}, status=400)
+    if organization is not None:
+        if not scope.allows_organization(organization):
+            return JsonResponse({'error': 'Нет доступа к организации.'}, status=403)
+        organization_ids = {organization}
+    else:
+        organization_ids = None if scope.unrestricted else scope.organization_ids
+
+    # Запросы цен — только свои, цены — поставщиков своих городов, как в API
+    subscription = events.broker.subscribe(
+        organization_ids, last_event_id,
+        user_id=None if scope.unrestricted else user.pk, city_ids=None if scope.unrestricted else scope.city_ids,
+    )
+    response = StreamingHttpResponse(events.EventStream(subscription), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx не должен буферизовать поток
+    return response
+